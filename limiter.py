@@ -20,6 +20,8 @@ from utils.get_logs import (
     init_node_status_message,
 )
 from utils.handel_dis_users import DisabledUsers
+from utils.http_client import close_http_client
+from utils.isp_detector import close_http_session
 from utils.logs import logger, log_startup_info, log_shutdown_info, get_logger
 from utils.panel_api import (
     enable_dis_user,
@@ -52,6 +54,17 @@ dis_obj = DisabledUsers()
 
 async def main():
     """Main function to run the limiter."""
+    try:
+        await _run()
+    finally:
+        # Shared HTTP clients are bound to this event loop; close them before
+        # it goes away (shutdown or restart)
+        await close_http_client()
+        await close_http_session()
+
+
+async def _run():
+    """Start the bot, node log tasks and the usage check loop."""
     log_startup_info("Limiter", f"v{VERSION}")
     main_logger.info(f"🚀 Starting Limiter v{VERSION}")
     main_logger.info("=" * 50)
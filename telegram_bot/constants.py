@@ -53,24 +53,28 @@ class CallbackData:
     GENERAL_LIMIT_CUSTOM = "general_limit_custom"
     
     # Country code options
+    COUNTRY_MENU = "country_menu"
     COUNTRY_IR = "country_ir"
     COUNTRY_RU = "country_ru"
     COUNTRY_CN = "country_cn"
     COUNTRY_NONE = "country_none"
     
     # Check interval options
+    INTERVAL_MENU = "interval_menu"
     INTERVAL_120 = "interval_120"
     INTERVAL_180 = "interval_180"
     INTERVAL_240 = "interval_240"
     INTERVAL_CUSTOM = "interval_custom"
     
     # Time to active options
+    TIME_MENU = "time_menu"
     TIME_300 = "time_300"
     TIME_600 = "time_600"
     TIME_900 = "time_900"
     TIME_CUSTOM = "time_custom"
     
     # Enhanced details toggle
+    ENHANCED_MENU = "enhanced_menu"
     ENHANCED_ON = "enhanced_on"
     ENHANCED_OFF = "enhanced_off"
     
@@ -5,6 +5,7 @@ Contains all command and callback handlers organized by functionality.
 
 from telegram_bot.handlers.admin import (
     add_admin,
+    admin_only,
     admins_list,
     check_admin_privilege,
     get_chat_id,
@@ -101,6 +102,7 @@ from telegram_bot.handlers.admin_filter import (
 __all__ = [
     # Admin handlers
     "add_admin",
+    "admin_only",
     "admins_list",
     "check_admin_privilege",
     "get_chat_id",
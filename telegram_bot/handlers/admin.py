@@ -3,6 +3,9 @@ Admin management handlers for the Telegram bot.
 Includes functions for adding, removing, and listing admins.
 """
 
+import time
+from functools import wraps
+
 from telegram import Update
 from telegram.ext import (
     ContextTypes,
@@ -12,6 +15,8 @@ from telegram.ext import (
 from telegram_bot.utils import (
     add_admin_to_config,
     check_admin,
+    escape_html,
+    get_admin_set,
     remove_admin_from_config,
 )
 from telegram_bot.constants import (
@@ -19,24 +24,52 @@ from telegram_bot.constants import (
     GET_CHAT_ID_TO_REMOVE,
 )
 
+_DENY_MESSAGE = "Sorry, you do not have permission to execute this command."
+
+# Non-admin chats are told at most once per cooldown, so spam can't
+# flood the bot's outbound queue (chat_id -> monotonic time of reply)
+_DENY_COOLDOWN = 30
+_MAX_DENIED_TRACKED = 1000
+_last_denied: dict[int, float] = {}
+
 
 async def check_admin_privilege(update: Update):
     """
     Checks if the user has admin privileges.
     Returns ConversationHandler.END if user is not admin, None otherwise.
     """
-    admins = await check_admin()
+    chat_id = update.effective_chat.id
+    admins = await get_admin_set()
     if not admins:
-        await add_admin_to_config(update.effective_chat.id)
-    admins = await check_admin()
-    if update.effective_chat.id not in admins:
-        await update.message.reply_html(
-            text="Sorry, you do not have permission to execute this command."
-        )
+        await add_admin_to_config(chat_id)
+        admins = await get_admin_set()
+    if chat_id not in admins:
+        now = time.monotonic()
+        last = _last_denied.get(chat_id)
+        if last is None or now - last >= _DENY_COOLDOWN:
+            if len(_last_denied) >= _MAX_DENIED_TRACKED:
+                _last_denied.clear()
+            _last_denied[chat_id] = now
+            await update.message.reply_html(text=_DENY_MESSAGE)
         return ConversationHandler.END
     return None
 
 
+def admin_only(func):
+    """
+    Decorator that runs check_admin_privilege before a command handler.
+    The lookup goes through get_admin_set(), whose short-lived cache is
+    the only caching layer, so removed admins lose access as soon as it expires.
+    """
+    @wraps(func)
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
+        check = await check_admin_privilege(update)
+        if check is not None:
+            return check
+        return await func(update, context, *args, **kwargs)
+    return wrapper
+
+
 async def add_admin(update: Update, _context: ContextTypes.DEFAULT_TYPE):
     """
     Adds an admin to the bot.
@@ -45,7 +78,7 @@ async def add_admin(update: Update, _context: ContextTypes.DEFAULT_TYPE):
     check = await check_admin_privilege(update)
     if check is not None:
         return check
-    if len(await check_admin()) > 5:
+    if len(await get_admin_set()) > 5:
         await update.message.reply_html(
             text="You set more than '5' admins you need to delete one of them to add a new admin\n"
             + "check your active admins with /admins_list\n"
@@ -64,15 +97,15 @@ async def get_chat_id(update: Update, _context: ContextTypes.DEFAULT_TYPE):
     try:
         if await add_admin_to_config(new_admin_id):
             await update.message.reply_html(
-                text=f"Admin <code>{new_admin_id}</code> added successfully!"
+                text=f"Admin <code>{escape_html(new_admin_id)}</code> added successfully!"
             )
         else:
             await update.message.reply_html(
-                text=f"Admin <code>{new_admin_id}</code> already exists!"
+                text=f"Admin <code>{escape_html(new_admin_id)}</code> already exists!"
             )
     except ValueError:
         await update.message.reply_html(
-            text=f"Wrong input: <code>{update.message.text.strip()}"
+            text=f"Wrong input: <code>{escape_html(update.message.text.strip())}"
             + "</code>\ntry again <b>/add_admin</b>"
         )
     return ConversationHandler.END
@@ -87,8 +120,8 @@ async def admins_list(update: Update, _context: ContextTypes.DEFAULT_TYPE):
         return check
     admins = await check_admin()
     if admins:
-        admins_str = "\n- ".join(map(str, admins))
-        await update.message.reply_html(text=f"Admins: \n- {admins_str}")
+        text = "Admins: \n" + "\n".join(f"- {admin}" for admin in admins)
+        await update.message.reply_html(text=text)
     else:
         await update.message.reply_html(text="No admins found!")
     return ConversationHandler.END
@@ -99,7 +132,7 @@ async def remove_admin(update: Update, _context: ContextTypes.DEFAULT_TYPE):
     check = await check_admin_privilege(update)
     if check is not None:
         return check
-    admins_count = len(await check_admin())
+    admins_count = len(await get_admin_set())
     if admins_count == 1:
         await update.message.reply_html(
             text="there is just <b>1</b> active admin remain."
@@ -116,7 +149,7 @@ async def get_chat_id_to_remove(update: Update, _context: ContextTypes.DEFAULT_T
         admin_id_to_remove = int(update.message.text.strip())
     except ValueError:
         await update.message.reply_html(
-            text=f"Wrong input: <code>{update.message.text.strip()}"
+            text=f"Wrong input: <code>{escape_html(update.message.text.strip())}"
             + "</code>\ntry again <b>/remove_admin</b>"
         )
         return ConversationHandler.END
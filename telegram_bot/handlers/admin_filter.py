@@ -6,35 +6,19 @@ Commands for managing admin-based user filtering.
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 
-from telegram_bot.utils import check_admin, add_admin_to_config, read_json_file, write_json_file
-from utils.read_config import read_config
+from telegram_bot.handlers.admin import admin_only
+from telegram_bot.utils import escape_html, read_json_file, write_json_file
+from utils.admin_filter import get_admin_filter_status_text, get_all_admins
+from utils.read_config import invalidate_config_cache, read_config, save_config_value
+from utils.types import PanelType
 
-
-async def check_admin_privilege(update: Update):
-    """
-    Checks if the user has admin privileges.
-    """
-    admins = await check_admin()
-    if not admins:
-        await add_admin_to_config(update.effective_chat.id)
-    admins = await check_admin()
-    if update.effective_chat.id not in admins:
-        await update.message.reply_html(
-            text="Sorry, you do not have permission to execute this command."
-        )
-        return ConversationHandler.END
+_FILTER_MODES = frozenset({"include", "exclude"})
 
 
+@admin_only
 async def admin_filter_status(update: Update, _context: ContextTypes.DEFAULT_TYPE):
     """Show the current admin filter configuration."""
-    check = await check_admin_privilege(update)
-    if check:
-        return check
-    
     try:
-        from utils.admin_filter import get_admin_filter_status_text, get_all_admins
-        from utils.types import PanelType
-        
         config_data = await read_config()
         
         # Get panel data for admin lookup
@@ -57,7 +41,7 @@ async def admin_filter_status(update: Update, _context: ContextTypes.DEFAULT_TYP
             username = admin.get("username", "?")
             is_sudo = "👑" if admin.get("is_sudo", False) else ""
             is_disabled = "🔒" if admin.get("is_disabled", False) else ""
-            admins_list.append(f"  • <code>{username}</code> {is_sudo}{is_disabled}")
+            admins_list.append(f"  • <code>{escape_html(username)}</code> {is_sudo}{is_disabled}")
         
         admins_display = "\n".join(admins_list) if admins_list else "  No admins found"
         
@@ -76,20 +60,15 @@ async def admin_filter_status(update: Update, _context: ContextTypes.DEFAULT_TYP
         await update.message.reply_html(text=message)
         
     except Exception as e:
-        await update.message.reply_html(text=f"❌ Error: {str(e)}")
+        await update.message.reply_html(text=f"❌ Error: {escape_html(e)}")
     
     return ConversationHandler.END
 
 
+@admin_only
 async def admin_filter_toggle(update: Update, _context: ContextTypes.DEFAULT_TYPE):
     """Toggle admin filter on/off."""
-    check = await check_admin_privilege(update)
-    if check:
-        return check
-    
     try:
-        from utils.read_config import save_config_value, invalidate_config_cache
-        
         config_data = await read_config()
         filter_config = config_data.get("admin_filter", {})
         current_state = filter_config.get("enabled", False)
@@ -104,28 +83,23 @@ async def admin_filter_toggle(update: Update, _context: ContextTypes.DEFAULT_TYP
         )
         
     except Exception as e:
-        await update.message.reply_html(text=f"❌ Error: {str(e)}")
+        await update.message.reply_html(text=f"❌ Error: {escape_html(e)}")
     
     return ConversationHandler.END
 
 
+@admin_only
 async def admin_filter_mode(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Set admin filter mode (include/exclude)."""
-    check = await check_admin_privilege(update)
-    if check:
-        return check
-    
     if context.args:
         mode = context.args[0].lower()
-        if mode not in ["include", "exclude"]:
+        if mode not in _FILTER_MODES:
             await update.message.reply_html(
                 text="❌ Invalid mode. Use <code>include</code> or <code>exclude</code>"
             )
             return ConversationHandler.END
         
         try:
-            from utils.read_config import save_config_value, invalidate_config_cache
-            
             await save_config_value("admin_filter_mode", mode)
             await invalidate_config_cache()
             
@@ -139,7 +113,7 @@ async def admin_filter_mode(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             
         except Exception as e:
-            await update.message.reply_html(text=f"❌ Error: {str(e)}")
+            await update.message.reply_html(text=f"❌ Error: {escape_html(e)}")
         
         return ConversationHandler.END
     
@@ -153,16 +127,11 @@ async def admin_filter_mode(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ConversationHandler.END
 
 
+@admin_only
 async def admin_filter_set(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Set the list of admin usernames for filtering."""
-    check = await check_admin_privilege(update)
-    if check:
-        return check
-    
     if context.args:
         try:
-            from utils.read_config import save_config_value, invalidate_config_cache
-            
             # Parse admin usernames from arguments
             admin_usernames = []
             for arg in context.args:
@@ -177,11 +146,11 @@ async def admin_filter_set(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await invalidate_config_cache()
             
             await update.message.reply_html(
-                text=f"✅ Admin filter set to: <code>{admin_usernames}</code>"
+                text=f"✅ Admin filter set to: <code>{escape_html(', '.join(admin_usernames))}</code>"
             )
             
         except Exception as e:
-            await update.message.reply_html(text=f"❌ Error: {str(e)}")
+            await update.message.reply_html(text=f"❌ Error: {escape_html(e)}")
         
         return ConversationHandler.END
     
@@ -194,12 +163,9 @@ async def admin_filter_set(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ConversationHandler.END
 
 
+@admin_only
 async def admin_filter_add(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Add an admin username to the filter."""
-    check = await check_admin_privilege(update)
-    if check:
-        return check
-    
     if not context.args:
         await update.message.reply_html(
             text="❌ Please provide an admin username.\n"
@@ -208,17 +174,15 @@ async def admin_filter_add(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return ConversationHandler.END
     
     try:
-        from utils.read_config import save_config_value, invalidate_config_cache
-        
         admin_username = context.args[0].strip()
         
         config_data = await read_config()
         filter_config = config_data.get("admin_filter", {})
-        current_admins = filter_config.get("admin_usernames", [])
+        current_admins = list(filter_config.get("admin_usernames", []))
         
         if admin_username in current_admins:
             await update.message.reply_html(
-                text=f"ℹ️ Admin <code>{admin_username}</code> is already in the filter."
+                text=f"ℹ️ Admin <code>{escape_html(admin_username)}</code> is already in the filter."
             )
             return ConversationHandler.END
         
@@ -227,22 +191,19 @@ async def admin_filter_add(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await invalidate_config_cache()
         
         await update.message.reply_html(
-            text=f"✅ Added admin <code>{admin_username}</code> to filter.\n"
-                 f"Current admins: <code>{current_admins}</code>"
+            text=f"✅ Added admin <code>{escape_html(admin_username)}</code> to filter.\n"
+                 f"Current admins: <code>{escape_html(', '.join(current_admins))}</code>"
         )
         
     except Exception as e:
-        await update.message.reply_html(text=f"❌ Error: {str(e)}")
+        await update.message.reply_html(text=f"❌ Error: {escape_html(e)}")
     
     return ConversationHandler.END
 
 
+@admin_only
 async def admin_filter_remove(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Remove an admin username from the filter."""
-    check = await check_admin_privilege(update)
-    if check:
-        return check
-    
     if not context.args:
         await update.message.reply_html(
             text="❌ Please provide an admin username.\n"
@@ -251,17 +212,15 @@ async def admin_filter_remove(update: Update, context: ContextTypes.DEFAULT_TYPE
         return ConversationHandler.END
     
     try:
-        from utils.read_config import save_config_value, invalidate_config_cache
-        
         admin_username = context.args[0].strip()
         
         config_data = await read_config()
         filter_config = config_data.get("admin_filter", {})
-        current_admins = filter_config.get("admin_usernames", [])
+        current_admins = list(filter_config.get("admin_usernames", []))
         
         if admin_username not in current_admins:
             await update.message.reply_html(
-                text=f"ℹ️ Admin <code>{admin_username}</code> is not in the filter."
+                text=f"ℹ️ Admin <code>{escape_html(admin_username)}</code> is not in the filter."
             )
             return ConversationHandler.END
         
@@ -270,11 +229,11 @@ async def admin_filter_remove(update: Update, context: ContextTypes.DEFAULT_TYPE
         await invalidate_config_cache()
         
         await update.message.reply_html(
-            text=f"✅ Removed admin <code>{admin_username}</code> from filter.\n"
-                 f"Remaining admins: <code>{current_admins}</code>"
+            text=f"✅ Removed admin <code>{escape_html(admin_username)}</code> from filter.\n"
+                 f"Remaining admins: <code>{escape_html(', '.join(current_admins))}</code>"
         )
         
     except Exception as e:
-        await update.message.reply_html(text=f"❌ Error: {str(e)}")
+        await update.message.reply_html(text=f"❌ Error: {escape_html(e)}")
     
     return ConversationHandler.END
@@ -3,10 +3,11 @@ Backup and restore handlers for the Telegram bot.
 Includes functions for creating and restoring backups.
 """
 
+import asyncio
+import io
 import json
 import os
-import shutil
-import tempfile
+import time
 import zipfile
 from datetime import datetime
 
@@ -18,104 +19,183 @@ from telegram.ext import (
 
 from telegram_bot.constants import RESTORE_CONFIG
 from telegram_bot.handlers.admin import check_admin_privilege
+from telegram_bot.keyboards import create_back_to_main_keyboard
+from telegram_bot.send_message import edit_query_message
+from telegram_bot.utils import escape_html, read_json_file
 
+# orjson parses bytes directly and is much faster than the stdlib parser
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
-async def send_backup(update: Update, _context: ContextTypes.DEFAULT_TYPE):
-    """Send a comprehensive backup zip file to the user."""
-    check = await check_admin_privilege(update)
-    if check is not None:
-        return check
-    
-    try:
-        await update.message.reply_text("📦 Creating backup... Please wait.")
+# Needed only to import legacy JSON configs into the database
+try:
+    from db import get_db, ConfigCRUD, UserLimitCRUD, ExceptUserCRUD
+    DB_AVAILABLE = True
+except ImportError:
+    DB_AVAILABLE = False
+
+_RESTORE_PROMPT = (
+    "📥 <b>Restore from Backup</b>\n\n"
+    "Please send your backup file (zip or json format).\n\n"
+    "<b>⚠️ Warning:</b> This will replace your current data!"
+)
+
+
+def _write_atomic(path: str, data: bytes):
+    """Write bytes to path via a temp file and rename, so it is never half-written."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        # Make sure the data is on disk before the rename makes it visible
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _build_backup_zip(config_json: str | None) -> bytes:
+    """Collect config, data and legacy files into an in-memory backup zip (blocking)."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        # Check standard Docker paths first
+        docker_config_dir = "/etc/opt/pg-limiter"
+        if os.path.exists(docker_config_dir):
+            for filename in os.listdir(docker_config_dir):
+                filepath = os.path.join(docker_config_dir, filename)
+                if os.path.isfile(filepath):
+                    zipf.write(filepath, f"config/{filename}")
         
-        # Create temp directory for backup
-        temp_dir = tempfile.mkdtemp()
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        zip_name = f"pg-limiter-backup-{timestamp}.zip"
-        zip_path = os.path.join(temp_dir, zip_name)
-        
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            # Check standard Docker paths first
-            docker_config_dir = "/etc/opt/pg-limiter"
-            if os.path.exists(docker_config_dir):
-                for filename in os.listdir(docker_config_dir):
-                    filepath = os.path.join(docker_config_dir, filename)
-                    if os.path.isfile(filepath):
-                        zipf.write(filepath, f"config/{filename}")
-            
-            # Also check local .env
-            if os.path.exists(".env"):
-                zipf.write(".env", "config/.env")
-            
-            # Add data files from /var/lib/pg-limiter/ (or local data/)
-            data_dirs = [
-                "/var/lib/pg-limiter/data",
-                "data",
-            ]
-            for data_dir in data_dirs:
-                if os.path.exists(data_dir) and os.path.isdir(data_dir):
-                    for root, dirs, files in os.walk(data_dir):
-                        for file in files:
-                            filepath = os.path.join(root, file)
-                            arcname = os.path.join("data", os.path.relpath(filepath, data_dir))
-                            zipf.write(filepath, arcname)
-                    break
-            
-            # Add legacy JSON files if they exist
-            legacy_files = [
-                ".disable_users.json",
-                ".violation_history.json",
-                ".user_groups_backup.json",
-            ]
-            for legacy_file in legacy_files:
-                if os.path.exists(legacy_file):
-                    zipf.write(legacy_file, f"legacy/{legacy_file}")
-            
-            # Add backup info
-            hostname = "unknown"
-            try:
-                hostname = os.uname().nodename
-            except AttributeError:
-                pass
-            
-            backup_info = f"""PG-Limiter Backup
+        # Also check local .env
+        if os.path.exists(".env"):
+            zipf.write(".env", "config/.env")
+        
+        # Add data files from /var/lib/pg-limiter/ (or local data/)
+        data_dirs = [
+            "/var/lib/pg-limiter/data",
+            "data",
+        ]
+        for data_dir in data_dirs:
+            if os.path.exists(data_dir) and os.path.isdir(data_dir):
+                for root, dirs, files in os.walk(data_dir):
+                    for file in files:
+                        filepath = os.path.join(root, file)
+                        arcname = os.path.join("data", os.path.relpath(filepath, data_dir))
+                        zipf.write(filepath, arcname)
+                break
+        
+        # Add legacy JSON files if they exist
+        legacy_files = [
+            ".disable_users.json",
+            ".violation_history.json",
+            ".user_groups_backup.json",
+        ]
+        for legacy_file in legacy_files:
+            if os.path.exists(legacy_file):
+                zipf.write(legacy_file, f"legacy/{legacy_file}")
+        
+        if config_json is not None:
+            zipf.writestr("legacy/config.json", config_json)
+        
+        # Add backup info
+        hostname = "unknown"
+        try:
+            hostname = os.uname().nodename
+        except AttributeError:
+            pass
+        
+        backup_info = f"""PG-Limiter Backup
 Created: {datetime.now().isoformat()}
 Hostname: {hostname}
 
 Contents:
 - config/: Configuration files (.env)
 - data/: Database and persistent data
-- legacy/: Legacy JSON files (if any)
+- legacy/: Legacy JSON files and config.json (if any)
 
 To restore:
 1. Send this zip file to the bot with /restore command
 2. Or use: pg-limiter restore <this-file.zip>
 """
-            zipf.writestr("backup_info.txt", backup_info)
+        zipf.writestr("backup_info.txt", backup_info)
+    return buffer.getvalue()
+
+
+def _restore_backup_zip(buffer: io.BytesIO) -> bool:
+    """
+    Write the members of a backup zip back to their locations (blocking).
+    Returns whether an .env file was restored.
+    """
+    env_restored = False
+    # Members are written straight from the archive instead of
+    # extracting to a temp dir and copying
+    with zipfile.ZipFile(buffer, 'r') as zipf:
+        members = set(zipf.namelist())
+        
+        # Restore .env file if present
+        for env_name in ["config/.env", ".env"]:
+            if env_name in members:
+                env_dst = "/etc/opt/pg-limiter/.env" if os.path.exists("/etc/opt/pg-limiter") else ".env"
+                _write_atomic(env_dst, zipf.read(env_name))
+                env_restored = True
+                break
+        
+        data_dst = "/var/lib/pg-limiter/data" if os.path.exists("/var/lib/pg-limiter") else "data"
+        for member in members:
+            folder, _, item = member.partition("/")
+            # Only top-level files of data/ and legacy/ are restored
+            if item in ("", ".", "..") or "/" in item:
+                continue
+            if folder == "data":
+                # Restore database files
+                os.makedirs(data_dst, exist_ok=True)
+                _write_atomic(os.path.join(data_dst, item), zipf.read(member))
+            elif folder == "legacy":
+                # Restore legacy files (for migration)
+                _write_atomic(item, zipf.read(member))
+    return env_restored
+
+
+async def send_backup(update: Update, _context: ContextTypes.DEFAULT_TYPE):
+    """Send a comprehensive backup zip file to the user."""
+    check = await check_admin_privilege(update)
+    if check is not None:
+        return check
+    
+    try:
+        await update.message.reply_text("📦 Creating backup... Please wait.")
+        
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        zip_name = f"pg-limiter-backup-{timestamp}.zip"
+        
+        # Zipping and reading files is blocking disk I/O; keep it off the event
+        # loop and build the archive in memory so there is no temp file to open
+        # config.json comes from the parsed-config cache rather than a re-read.
+        # It is stored compact, so the backup copy is pretty-printed here and
+        # handed to the worker thread as a finished string
+        config_json = None
+        if os.path.exists("config.json"):
+            config_json = json.dumps(await read_json_file(), indent=2, ensure_ascii=False)
+        zip_data = await asyncio.to_thread(_build_backup_zip, config_json)
         
         # Send the zip file
-        with open(zip_path, 'rb') as f:
-            await update.message.reply_document(
-                document=f,
-                filename=zip_name,
-                caption=(
-                    "✅ <b>Backup created successfully!</b>\n\n"
-                    "📁 This backup includes:\n"
-                    "• Configuration files\n"
-                    "• Database (SQLite)\n"
-                    "• Legacy JSON files (if any)\n\n"
-                    "💡 To restore, use /restore command and send this file."
-                ),
-                parse_mode="HTML",
+        await update.message.reply_document(
+            document=zip_data,
+            filename=zip_name,
+            caption=(
+                "✅ <b>Backup created successfully!</b>\n\n"
+                "📁 This backup includes:\n"
+                "• Configuration files\n"
+                "• Database (SQLite)\n"
+                "• Legacy JSON files (if any)\n\n"
+                "💡 To restore, use /restore command and send this file."
             )
-        
-        # Cleanup
-        shutil.rmtree(temp_dir)
+        )
         
     except Exception as e:
         await update.message.reply_html(
-            f"❌ <b>Error creating backup:</b>\n<code>{str(e)}</code>"
+            f"❌ <b>Error creating backup:</b>\n<code>{escape_html(e)}</code>"
         )
 
 
@@ -125,14 +205,21 @@ async def restore_config(update: Update, _context: ContextTypes.DEFAULT_TYPE):
     if check is not None:
         return check
     
-    await update.message.reply_html(
-        "📥 <b>Restore from Backup</b>\n\n"
-        "Please send your backup file (zip or json format).\n\n"
-        "<b>⚠️ Warning:</b> This will replace your current data!"
-    )
+    await update.message.reply_html(_RESTORE_PROMPT)
     return RESTORE_CONFIG
 
 
+async def handle_restore_callback(query, context: ContextTypes.DEFAULT_TYPE):
+    """Ask for a backup file from the main menu's Restore button."""
+    # The upload is picked up by document_message_handler
+    context.user_data["waiting_for"] = "restore"
+    await edit_query_message(
+        query,
+        text=_RESTORE_PROMPT,
+        reply_markup=create_back_to_main_keyboard()
+    )
+
+
 async def restore_config_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle the uploaded backup file and restore it."""
     try:
@@ -146,54 +233,16 @@ async def restore_config_handler(update: Update, context: ContextTypes.DEFAULT_T
         
         file_name = update.message.document.file_name
         
-        # Download the file
+        # Download the file straight into memory
         file = await update.message.document.get_file()
-        file_content = await file.download_as_bytearray()
+        buffer = io.BytesIO()
+        await file.download_to_memory(buffer)
         
         if file_name.endswith('.zip'):
-            # Handle zip backup (new format)
-            temp_dir = tempfile.mkdtemp()
-            zip_path = os.path.join(temp_dir, "backup.zip")
-            
-            with open(zip_path, 'wb') as f:
-                f.write(file_content)
-            
-            with zipfile.ZipFile(zip_path, 'r') as zipf:
-                zipf.extractall(temp_dir)
-            
-            # Restore .env file if present
-            env_restored = False
-            for env_name in ["config/.env", ".env"]:
-                src_path = os.path.join(temp_dir, env_name)
-                if os.path.exists(src_path):
-                    env_dst = "/etc/opt/pg-limiter/.env" if os.path.exists("/etc/opt/pg-limiter") else ".env"
-                    shutil.copy(src_path, env_dst)
-                    env_restored = True
-                    break
-            
-            # Restore data files
-            data_src = os.path.join(temp_dir, "data")
-            if os.path.exists(data_src):
-                data_dst = "/var/lib/pg-limiter/data" if os.path.exists("/var/lib/pg-limiter") else "data"
-                
-                # Copy database files
-                for item in os.listdir(data_src):
-                    src = os.path.join(data_src, item)
-                    dst = os.path.join(data_dst, item)
-                    if os.path.isfile(src):
-                        os.makedirs(data_dst, exist_ok=True)
-                        shutil.copy2(src, dst)
-            
-            # Restore legacy files (for migration)
-            legacy_src = os.path.join(temp_dir, "legacy")
-            if os.path.exists(legacy_src):
-                for item in os.listdir(legacy_src):
-                    src = os.path.join(legacy_src, item)
-                    if os.path.isfile(src):
-                        shutil.copy2(src, item)
-            
-            # Cleanup
-            shutil.rmtree(temp_dir)
+            # Handle zip backup (new format); decompressing and writing the
+            # files is blocking disk I/O, so it runs in a worker thread
+            buffer.seek(0)
+            env_restored = await asyncio.to_thread(_restore_backup_zip, buffer)
             
             await update.message.reply_html(
                 "✅ <b>Backup restored successfully!</b>\n\n"
@@ -205,9 +254,14 @@ async def restore_config_handler(update: Update, context: ContextTypes.DEFAULT_T
         elif file_name.endswith('.json'):
             # Handle legacy JSON config - migrate to database
             try:
-                config_data = json.loads(file_content.decode('utf-8'))
+                # orjson.JSONDecodeError subclasses json.JSONDecodeError
+                if ORJSON_AVAILABLE:
+                    config_data = orjson.loads(buffer.getbuffer())
+                else:
+                    config_data = json.loads(buffer.getvalue())
                 
-                from db import get_db, ConfigCRUD, UserLimitCRUD, ExceptUserCRUD
+                if not DB_AVAILABLE:
+                    raise RuntimeError("database module is not available")
                 
                 async with get_db() as db:
                     # Import settings to database
@@ -236,7 +290,7 @@ async def restore_config_handler(update: Update, context: ContextTypes.DEFAULT_T
                 
             except json.JSONDecodeError as e:
                 await update.message.reply_html(
-                    f"❌ Invalid JSON format: {str(e)}\nUse /restore to try again."
+                    f"❌ Invalid JSON format: {escape_html(e)}\nUse /restore to try again."
                 )
                 return ConversationHandler.END
         else:
@@ -248,7 +302,7 @@ async def restore_config_handler(update: Update, context: ContextTypes.DEFAULT_T
         
     except Exception as e:
         await update.message.reply_html(
-            f"❌ <b>Error during restore:</b>\n<code>{str(e)}</code>\n\nUse /restore to try again."
+            f"❌ <b>Error during restore:</b>\n<code>{escape_html(e)}</code>\n\nUse /restore to try again."
         )
     
     context.user_data["waiting_for"] = None
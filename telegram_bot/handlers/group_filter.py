@@ -3,88 +3,92 @@ Group filter handlers for the Telegram bot.
 Includes functions for managing group-based user filtering.
 """
 
+import asyncio
+import copy
+
 from telegram import Update
 from telegram.ext import (
     ContextTypes,
     ConversationHandler,
 )
 
-from telegram_bot.handlers.admin import check_admin_privilege
-from telegram_bot.utils import write_json_file
-from utils.read_config import read_config
+from telegram_bot.handlers.admin import admin_only
+from telegram_bot.utils import config_lock, escape_html, schedule_json_write
+from utils.read_config import load_env_config, read_config
+from utils.types import PanelType
+from utils.user_group_filter import get_all_groups, get_filter_status_text
+
+_FILTER_MODES = frozenset({"include", "exclude"})
+
+# Panel groups listed by /group_filter_status before the rest are summarized
+_MAX_LISTED_GROUPS = 50
+
+# Message template for /group_filter_status, filled in with str.format
+_STATUS_TEMPLATE = (
+    "🔍 <b>Group Filter Status</b>\n\n"
+    "{status}\n\n"
+    "<b>Available Groups:</b>\n{groups}\n\n"
+    "<b>Commands:</b>\n"
+    "/group_filter_toggle - Enable/disable\n"
+    "/group_filter_mode - Set include/exclude\n"
+    "/group_filter_set - Set groups\n"
+    "/group_filter_add - Add group\n"
+    "/group_filter_remove - Remove group"
+)
 
 
+@admin_only
 async def group_filter_status(update: Update, _context: ContextTypes.DEFAULT_TYPE):
     """Show the current group filter configuration."""
-    check = await check_admin_privilege(update)
-    if check:
-        return check
-    
     try:
-        from utils.user_group_filter import get_filter_status_text, get_all_groups
-        from utils.types import PanelType
-        
-        config_data = await read_config()
-        
-        # Get panel data for group lookup
-        panel_config = config_data.get("panel", {})
+        # Panel credentials come from ENV only, so the panel request for
+        # group names can run alongside the (DB-backed) config read
+        panel_config = load_env_config()["panel"]
         panel_data = PanelType(
             panel_config.get("username", ""),
             panel_config.get("password", ""),
             panel_config.get("domain", "")
         )
         
-        # Get all groups for name lookup
-        groups = await get_all_groups(panel_data)
+        config_data, groups = await asyncio.gather(
+            read_config(),
+            get_all_groups(panel_data),
+        )
         
         # Get filter status
         status_text = get_filter_status_text(config_data, groups)
         
-        # Build groups list
-        groups_list = []
-        for group in groups:
-            gid = group.get("id", "?")
-            name = group.get("name", "Unknown")
-            groups_list.append(f"  • <code>{gid}</code> - {name}")
+        # Build groups list, capped so the message stays under Telegram's limit
+        groups_display = "\n".join(
+            f"  • <code>{group.get('id', '?')}</code> - {escape_html(group.get('name', 'Unknown'))}"
+            for group in groups[:_MAX_LISTED_GROUPS]
+        ) or "  No groups found"
+        if len(groups) > _MAX_LISTED_GROUPS:
+            groups_display += f"\n  ... and {len(groups) - _MAX_LISTED_GROUPS} more"
         
-        groups_display = "\n".join(groups_list) if groups_list else "  No groups found"
-        
-        message = (
-            f"🔍 <b>Group Filter Status</b>\n\n"
-            f"{status_text}\n\n"
-            f"<b>Available Groups:</b>\n{groups_display}\n\n"
-            f"<b>Commands:</b>\n"
-            f"/group_filter_toggle - Enable/disable\n"
-            f"/group_filter_mode - Set include/exclude\n"
-            f"/group_filter_set - Set groups\n"
-            f"/group_filter_add - Add group\n"
-            f"/group_filter_remove - Remove group"
-        )
+        message = _STATUS_TEMPLATE.format(status=status_text, groups=groups_display)
         
         await update.message.reply_html(text=message)
         
     except Exception as e:
-        await update.message.reply_html(text=f"❌ Error: {str(e)}")
+        await update.message.reply_html(text=f"❌ Error: {escape_html(e)}")
     
     return ConversationHandler.END
 
 
+@admin_only
 async def group_filter_toggle(update: Update, _context: ContextTypes.DEFAULT_TYPE):
     """Toggle group filter on/off."""
-    check = await check_admin_privilege(update)
-    if check:
-        return check
-    
     try:
-        config_data = await read_config()
-        
-        if "group_filter" not in config_data:
-            config_data["group_filter"] = {"enabled": True, "mode": "include", "group_ids": []}
-        
-        current_state = config_data["group_filter"].get("enabled", False)
-        config_data["group_filter"]["enabled"] = not current_state
-        
-        await write_json_file(config_data)
+        async with config_lock:
+            config_data = copy.deepcopy(await read_config())
+            group_filter = config_data.setdefault(
+                "group_filter", {"enabled": True, "mode": "include", "group_ids": []}
+            )
+            current_state = group_filter.get("enabled", False)
+            group_filter["enabled"] = not current_state
+            pending_write = schedule_json_write(config_data)
+        await pending_write
         
         new_state = "✅ Enabled" if not current_state else "❌ Disabled"
         await update.message.reply_html(
@@ -92,34 +96,31 @@ async def group_filter_toggle(update: Update, _context: ContextTypes.DEFAULT_TYP
         )
         
     except Exception as e:
-        await update.message.reply_html(text=f"❌ Error: {str(e)}")
+        await update.message.reply_html(text=f"❌ Error: {escape_html(e)}")
     
     return ConversationHandler.END
 
 
+@admin_only
 async def group_filter_mode(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Set group filter mode (include/exclude)."""
-    check = await check_admin_privilege(update)
-    if check:
-        return check
-    
     if context.args:
         mode = context.args[0].lower()
-        if mode not in ["include", "exclude"]:
+        if mode not in _FILTER_MODES:
             await update.message.reply_html(
                 text="❌ Invalid mode. Use <code>include</code> or <code>exclude</code>"
             )
             return ConversationHandler.END
         
         try:
-            config_data = await read_config()
-            
-            if "group_filter" not in config_data:
-                config_data["group_filter"] = {"enabled": False, "mode": mode, "group_ids": []}
-            else:
-                config_data["group_filter"]["mode"] = mode
-            
-            await write_json_file(config_data)
+            async with config_lock:
+                config_data = copy.deepcopy(await read_config())
+                if "group_filter" not in config_data:
+                    config_data["group_filter"] = {"enabled": False, "mode": mode, "group_ids": []}
+                else:
+                    config_data["group_filter"]["mode"] = mode
+                pending_write = schedule_json_write(config_data)
+            await pending_write
             
             if mode == "include":
                 desc = "Only users in specified groups will be monitored"
@@ -131,7 +132,7 @@ async def group_filter_mode(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             
         except Exception as e:
-            await update.message.reply_html(text=f"❌ Error: {str(e)}")
+            await update.message.reply_html(text=f"❌ Error: {escape_html(e)}")
         
         return ConversationHandler.END
     
@@ -145,12 +146,9 @@ async def group_filter_mode(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ConversationHandler.END
 
 
+@admin_only
 async def group_filter_set(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Set the list of group IDs for filtering."""
-    check = await check_admin_privilege(update)
-    if check:
-        return check
-    
     if context.args:
         try:
             # Parse group IDs from arguments
@@ -162,14 +160,14 @@ async def group_filter_set(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     if gid:
                         group_ids.append(int(gid))
             
-            config_data = await read_config()
-            
-            if "group_filter" not in config_data:
-                config_data["group_filter"] = {"enabled": False, "mode": "include", "group_ids": group_ids}
-            else:
-                config_data["group_filter"]["group_ids"] = group_ids
-            
-            await write_json_file(config_data)
+            async with config_lock:
+                config_data = copy.deepcopy(await read_config())
+                if "group_filter" not in config_data:
+                    config_data["group_filter"] = {"enabled": False, "mode": "include", "group_ids": group_ids}
+                else:
+                    config_data["group_filter"]["group_ids"] = group_ids
+                pending_write = schedule_json_write(config_data)
+            await pending_write
             
             await update.message.reply_html(
                 text=f"✅ Group filter set to IDs: <code>{group_ids}</code>"
@@ -180,7 +178,7 @@ async def group_filter_set(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 text="❌ Invalid group ID. Please provide numeric IDs."
             )
         except Exception as e:
-            await update.message.reply_html(text=f"❌ Error: {str(e)}")
+            await update.message.reply_html(text=f"❌ Error: {escape_html(e)}")
         
         return ConversationHandler.END
     
@@ -193,12 +191,9 @@ async def group_filter_set(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ConversationHandler.END
 
 
+@admin_only
 async def group_filter_add(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Add a group ID to the filter."""
-    check = await check_admin_privilege(update)
-    if check:
-        return check
-    
     if not context.args:
         await update.message.reply_html(
             text="❌ Please provide a group ID.\n"
@@ -209,42 +204,41 @@ async def group_filter_add(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         group_id = int(context.args[0])
         
-        config_data = await read_config()
-        
-        if "group_filter" not in config_data:
-            config_data["group_filter"] = {"enabled": False, "mode": "include", "group_ids": [group_id]}
-        else:
-            current_ids = config_data["group_filter"].get("group_ids", [])
-            if group_id not in current_ids:
-                current_ids.append(group_id)
-                config_data["group_filter"]["group_ids"] = current_ids
-            else:
-                await update.message.reply_html(
-                    text=f"ℹ️ Group ID <code>{group_id}</code> is already in the filter."
-                )
-                return ConversationHandler.END
+        async with config_lock:
+            config_data = copy.deepcopy(await read_config())
+            group_filter = config_data.setdefault(
+                "group_filter", {"enabled": False, "mode": "include", "group_ids": []}
+            )
+            current_ids = set(group_filter.get("group_ids", []))
+            added = group_id not in current_ids
+            if added:
+                current_ids.add(group_id)
+                group_filter["group_ids"] = group_ids = sorted(current_ids)
+                pending_write = schedule_json_write(config_data)
         
-        await write_json_file(config_data)
+        if not added:
+            await update.message.reply_html(
+                text=f"ℹ️ Group ID <code>{group_id}</code> is already in the filter."
+            )
+            return ConversationHandler.END
         
+        await pending_write
         await update.message.reply_html(
             text=f"✅ Added group ID <code>{group_id}</code> to filter.\n"
-                 f"Current groups: <code>{config_data['group_filter']['group_ids']}</code>"
+                 f"Current groups: <code>{group_ids}</code>"
         )
         
     except ValueError:
         await update.message.reply_html(text="❌ Invalid group ID. Please provide a number.")
     except Exception as e:
-        await update.message.reply_html(text=f"❌ Error: {str(e)}")
+        await update.message.reply_html(text=f"❌ Error: {escape_html(e)}")
     
     return ConversationHandler.END
 
 
+@admin_only
 async def group_filter_remove(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Remove a group ID from the filter."""
-    check = await check_admin_privilege(update)
-    if check:
-        return check
-    
     if not context.args:
         await update.message.reply_html(
             text="❌ Please provide a group ID.\n"
@@ -255,23 +249,27 @@ async def group_filter_remove(update: Update, context: ContextTypes.DEFAULT_TYPE
     try:
         group_id = int(context.args[0])
         
-        config_data = await read_config()
+        async with config_lock:
+            config_data = copy.deepcopy(await read_config())
+            group_filter = config_data.get("group_filter")
+            current_ids = set(group_filter.get("group_ids", [])) if group_filter else set()
+            removed = group_id in current_ids
+            if removed:
+                current_ids.discard(group_id)
+                group_filter["group_ids"] = group_ids = sorted(current_ids)
+                pending_write = schedule_json_write(config_data)
         
-        if "group_filter" not in config_data:
+        if group_filter is None:
             await update.message.reply_html(
                 text="❌ No group filter configured."
             )
             return ConversationHandler.END
         
-        current_ids = config_data["group_filter"].get("group_ids", [])
-        if group_id in current_ids:
-            current_ids.remove(group_id)
-            config_data["group_filter"]["group_ids"] = current_ids
-            await write_json_file(config_data)
-            
+        if removed:
+            await pending_write
             await update.message.reply_html(
                 text=f"✅ Removed group ID <code>{group_id}</code> from filter.\n"
-                     f"Remaining groups: <code>{current_ids}</code>"
+                     f"Remaining groups: <code>{group_ids}</code>"
             )
         else:
             await update.message.reply_html(
@@ -281,6 +279,6 @@ async def group_filter_remove(update: Update, context: ContextTypes.DEFAULT_TYPE
     except ValueError:
         await update.message.reply_html(text="❌ Invalid group ID. Please provide a number.")
     except Exception as e:
-        await update.message.reply_html(text=f"❌ Error: {str(e)}")
+        await update.message.reply_html(text=f"❌ Error: {escape_html(e)}")
     
     return ConversationHandler.END
@@ -18,6 +18,7 @@ from telegram_bot.constants import (
 from telegram_bot.utils import (
     check_admin,
     add_admin_to_config,
+    escape_html,
     get_special_limit_list,
     handel_special_limit,
     save_general_limit,
@@ -29,9 +30,28 @@ from telegram_bot.keyboards import (
     create_limits_menu_keyboard,
 )
 from telegram_bot.handlers.admin import check_admin_privilege
+from telegram_bot.send_message import callback_action
 from utils.read_config import read_config
 
 
+# ═══════════════════════════════════════════════════════════════════════════════
+# MESSAGE TEMPLATES
+# ═══════════════════════════════════════════════════════════════════════════════
+
+_SET_SPECIAL_LIMIT_TEXT = "🎯 <b>Set Special Limit</b>\n\nSend the username (e.g., <code>Test_User</code>):"
+_CUSTOM_GENERAL_LIMIT_TEXT = "🔢 <b>Custom General Limit</b>\n\nSend the limit number (e.g., <code>5</code>):"
+_CUSTOM_SPECIAL_LIMIT_TEMPLATE = "🎯 <b>Custom Limit for {user}</b>\n\nSend the limit number (e.g., <code>5</code>):"
+_SPECIAL_LIMIT_SET_TEMPLATE = "✅ Special limit for <b>{user}</b> set to <b>{limit}</b>"
+_SPECIAL_LIMIT_UPDATED_TEMPLATE = "✅ Updated <b>{user}</b> limit to <b>{limit}</b>"
+_GENERAL_LIMIT_SET_TEMPLATE = "✅ General limit set to <b>{limit}</b>"
+
+
+def _special_limit_message(username: str, limit, updated: bool) -> str:
+    """Confirmation text for a saved special limit."""
+    template = _SPECIAL_LIMIT_UPDATED_TEMPLATE if updated else _SPECIAL_LIMIT_SET_TEMPLATE
+    return template.format(user=escape_html(username), limit=limit)
+
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # COMMAND HANDLERS (for /command style usage)
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -140,8 +160,7 @@ async def handle_limits_menu_callback(query, context: ContextTypes.DEFAULT_TYPE)
     """Handle callback for limits menu display."""
     await query.edit_message_text(
         text="🎯 <b>Limits Menu</b>\n\nManage user connection limits:",
-        reply_markup=create_limits_menu_keyboard(),
-        parse_mode="HTML"
+        reply_markup=create_limits_menu_keyboard()
     )
 
 
@@ -149,8 +168,7 @@ async def handle_set_special_limit_callback(query, context: ContextTypes.DEFAULT
     """Handle callback for initiating special limit setting."""
     context.user_data["waiting_for"] = "special_limit_username"
     await query.edit_message_text(
-        text="🎯 <b>Set Special Limit</b>\n\nSend the username (e.g., <code>Test_User</code>):",
-        parse_mode="HTML"
+        text=_SET_SPECIAL_LIMIT_TEXT
     )
 
 
@@ -159,13 +177,9 @@ async def handle_special_limit_1_callback(query, context: ContextTypes.DEFAULT_T
     if "selected_user" in context.user_data:
         username = context.user_data["selected_user"]
         out_put = await handel_special_limit(username, 1)
-        msg = f"✅ Special limit for <b>{username}</b> set to <b>1 device</b>"
-        if out_put[0]:
-            msg = f"✅ Updated <b>{username}</b> limit to <b>1 device</b>"
         await query.edit_message_text(
-            text=msg,
-            reply_markup=create_back_to_main_keyboard(),
-            parse_mode="HTML"
+            text=_special_limit_message(username, "1 device", out_put[0]),
+            reply_markup=create_back_to_main_keyboard()
         )
         context.user_data.pop("selected_user", None)
 
@@ -175,13 +189,9 @@ async def handle_special_limit_2_callback(query, context: ContextTypes.DEFAULT_T
     if "selected_user" in context.user_data:
         username = context.user_data["selected_user"]
         out_put = await handel_special_limit(username, 2)
-        msg = f"✅ Special limit for <b>{username}</b> set to <b>2 devices</b>"
-        if out_put[0]:
-            msg = f"✅ Updated <b>{username}</b> limit to <b>2 devices</b>"
         await query.edit_message_text(
-            text=msg,
-            reply_markup=create_back_to_main_keyboard(),
-            parse_mode="HTML"
+            text=_special_limit_message(username, "2 devices", out_put[0]),
+            reply_markup=create_back_to_main_keyboard()
         )
         context.user_data.pop("selected_user", None)
 
@@ -190,12 +200,23 @@ async def handle_special_limit_custom_callback(query, context: ContextTypes.DEFA
     """Handle callback for setting a custom special limit."""
     context.user_data["waiting_for"] = "special_limit_number"
     await query.edit_message_text(
-        text=f"🎯 <b>Custom Limit for {context.user_data.get('selected_user', 'user')}</b>\n\n"
-             + "Send the limit number (e.g., <code>5</code>):",
-        parse_mode="HTML"
+        text=_CUSTOM_SPECIAL_LIMIT_TEMPLATE.format(
+            user=escape_html(context.user_data.get("selected_user", "user"))
+        )
     )
 
 
+@callback_action(create_back_to_main_keyboard, "❌ Error setting limit")
+async def handle_set_limit_callback(query, _context: ContextTypes.DEFAULT_TYPE, payload: str):
+    """Handle the "Set N limit" button on a user report (set_limit:<username>:<limit>)."""
+    # The limit is always the last field, so rpartition keeps the username whole
+    username, _, limit = payload.rpartition(":")
+    out_put = await handel_special_limit(username, int(limit))
+    # Drop the buttons so the same report can't be acted on twice
+    await query.edit_message_reply_markup(reply_markup=None)
+    await query.message.reply_html(text=_special_limit_message(username, limit, out_put[0]))
+
+
 async def handle_show_special_limit_callback(query, _context: ContextTypes.DEFAULT_TYPE):
     """Handle callback for showing all special limits."""
     out_put = await get_special_limit_list()
@@ -205,8 +226,7 @@ async def handle_show_special_limit_callback(query, _context: ContextTypes.DEFAU
         text = "📋 No special limits found!"
     await query.edit_message_text(
         text=text,
-        reply_markup=create_back_to_main_keyboard(),
-        parse_mode="HTML"
+        reply_markup=create_back_to_main_keyboard()
     )
 
 
@@ -219,8 +239,7 @@ async def handle_general_limit_menu_callback(query, _context: ContextTypes.DEFAU
         current = 2
     await query.edit_message_text(
         text=f"🔢 <b>General Limit</b>\n\nCurrent: <b>{current}</b>\n\nSelect new limit:",
-        reply_markup=create_general_limit_keyboard(),
-        parse_mode="HTML"
+        reply_markup=create_general_limit_keyboard()
     )
 
 
@@ -228,9 +247,8 @@ async def handle_general_limit_preset_callback(query, _context: ContextTypes.DEF
     """Handle callback for setting a preset general limit (2, 3, or 4)."""
     await save_general_limit(limit)
     await query.edit_message_text(
-        text=f"✅ General limit set to <b>{limit}</b>",
-        reply_markup=create_back_to_main_keyboard(),
-        parse_mode="HTML"
+        text=_GENERAL_LIMIT_SET_TEMPLATE.format(limit=limit),
+        reply_markup=create_back_to_main_keyboard()
     )
 
 
@@ -238,8 +256,7 @@ async def handle_general_limit_custom_callback(query, context: ContextTypes.DEFA
     """Handle callback for initiating custom general limit setting."""
     context.user_data["waiting_for"] = "general_limit"
     await query.edit_message_text(
-        text="🔢 <b>Custom General Limit</b>\n\nSend the limit number (e.g., <code>5</code>):",
-        parse_mode="HTML"
+        text=_CUSTOM_GENERAL_LIMIT_TEXT
     )
 
 
@@ -255,10 +272,9 @@ async def handle_special_limit_username_input(update: Update, context: ContextTy
     """
     text = update.message.text.strip()
     context.user_data["selected_user"] = text
-    context.user_data["waiting_for"] = None
-    await update.message.reply_html(
-        text=f"🎯 <b>Set limit for: {text}</b>\n\nChoose the device limit:",
-        reply_markup=create_special_limit_options_keyboard()
+    return (
+        f"🎯 <b>Set limit for: {escape_html(text)}</b>\n\nChoose the device limit:",
+        create_special_limit_options_keyboard(),
     )
 
 
@@ -270,23 +286,11 @@ async def handle_special_limit_number_input(update: Update, context: ContextType
     text = update.message.text.strip()
     try:
         limit = int(text)
-        username = context.user_data.get("selected_user", "user")
-        out_put = await handel_special_limit(username, limit)
-        msg = f"✅ Special limit for <b>{username}</b> set to <b>{limit}</b>"
-        if out_put[0]:
-            msg = f"✅ Updated <b>{username}</b> limit to <b>{limit}</b>"
-        await update.message.reply_html(
-            text=msg,
-            reply_markup=create_back_to_main_keyboard()
-        )
-        context.user_data.pop("selected_user", None)
-        context.user_data["waiting_for"] = None
     except ValueError:
-        await update.message.reply_html(
-            text="❌ Invalid number. Please send a valid number.",
-            reply_markup=create_back_to_main_keyboard()
-        )
-        context.user_data["waiting_for"] = None
+        return "❌ Invalid number. Please send a valid number."
+    username = context.user_data.pop("selected_user", "user")
+    out_put = await handel_special_limit(username, limit)
+    return _special_limit_message(username, limit, out_put[0])
 
 
 async def handle_general_limit_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -297,14 +301,7 @@ async def handle_general_limit_input(update: Update, context: ContextTypes.DEFAU
     text = update.message.text.strip()
     try:
         limit = int(text)
-        await save_general_limit(limit)
-        await update.message.reply_html(
-            text=f"✅ General limit set to <b>{limit}</b>",
-            reply_markup=create_back_to_main_keyboard()
-        )
     except ValueError:
-        await update.message.reply_html(
-            text="❌ Invalid number.",
-            reply_markup=create_back_to_main_keyboard()
-        )
-    context.user_data["waiting_for"] = None
+        return "❌ Invalid number."
+    await save_general_limit(limit)
+    return _GENERAL_LIMIT_SET_TEMPLATE.format(limit=limit)
@@ -3,6 +3,7 @@ Punishment system handlers for the Telegram bot.
 Includes functions for managing the smart punishment system.
 """
 
+import copy
 import json
 
 from telegram import Update
@@ -11,70 +12,110 @@ from telegram.ext import (
     ConversationHandler,
 )
 
-from telegram_bot.handlers.admin import check_admin_privilege
-from telegram_bot.utils import write_json_file
-from utils.read_config import read_config
+from telegram_bot.handlers.admin import admin_only
+from telegram_bot.utils import config_lock, escape_html, run_in_background, write_json_file
+from utils.punishment_system import get_punishment_system, validate_steps
+from utils.read_config import get_config_version, invalidate_config_cache, read_config
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Message templates, filled in with str.format
+_STATUS_TEMPLATE = (
+    "⚖️ <b>Smart Punishment System</b>\n\n"
+    "Status: {enabled}\n"
+    "Time Window: <code>{window_hours} hours</code>\n\n"
+    "<b>Punishment Steps:</b>\n"
+    "{steps}\n\n"
+    "<b>Commands:</b>\n"
+    "/punishment_toggle - Enable/disable\n"
+    "/punishment_set_window - Set time window\n"
+    "/punishment_set_steps - Configure steps\n"
+    "/user_violations &lt;username&gt; - Check user\n"
+    "/clear_user_violations &lt;username&gt; - Clear history"
+)
+
+# Step display lines keyed by (type, is_unlimited)
+_STEP_FORMATS = {
+    ("warning", True): "  {i}. ⚠️ Warning",
+    ("warning", False): "  {i}. ⚠️ Warning",
+    ("disable", True): "  {i}. 🚫 Unlimited disable",
+    ("disable", False): "  {i}. 🔒 {d} min disable",
+}
+
+_VIOLATIONS_TEMPLATE = (
+    "⚖️ <b>Violation History: {username}</b>\n\n"
+    "Total violations: <code>{violation_count}</code>\n"
+    "Window: <code>{window_hours} hours</code>\n\n"
+    "<b>Recent Violations:</b>\n"
+    "{violations}\n\n"
+    "<b>Next Punishment:</b>\n"
+    "  {next_punishment}"
+)
+
 
+def _violation_label(violation: dict) -> str:
+    """Short label for the punishment applied by a recorded violation."""
+    duration = violation["duration"]
+    if duration == 0 and violation["step"] == 0:
+        return "⚠️ Warning"
+    if duration > 0:
+        return f"🔒 {duration}m"
+    return "🚫 Unlimited"
+
+
+async def _save_config(config_data: dict):
+    """Write an edited copy of the config, dropping cached state if the write fails."""
+    try:
+        await write_json_file(config_data)
+    except Exception:
+        await invalidate_config_cache()
+        raise
 
+
+@admin_only
 async def punishment_status(update: Update, _context: ContextTypes.DEFAULT_TYPE):
     """
     Shows the current punishment system configuration and status.
     """
-    check = await check_admin_privilege(update)
-    if check:
-        return check
-
     try:
-        from utils.punishment_system import get_punishment_system
-
         config_data = await read_config()
         system = get_punishment_system()
-        system.load_config(config_data)
+        system.load_config(config_data, get_config_version())
 
         enabled_text = "✅ Enabled" if system.enabled else "❌ Disabled"
 
-        steps_text = []
-        for i, step in enumerate(system.steps, 1):
-            steps_text.append(f"  {i}. {step.get_display_text()}")
-
-        message = (
-            f"⚖️ <b>Smart Punishment System</b>\n\n"
-            f"Status: {enabled_text}\n"
-            f"Time Window: <code>{system.window_hours} hours</code>\n\n"
-            f"<b>Punishment Steps:</b>\n"
-            f"{chr(10).join(steps_text)}\n\n"
-            f"<b>Commands:</b>\n"
-            f"/punishment_toggle - Enable/disable\n"
-            f"/punishment_set_window - Set time window\n"
-            f"/punishment_set_steps - Configure steps\n"
-            f"/user_violations &lt;username&gt; - Check user\n"
-            f"/clear_user_violations &lt;username&gt; - Clear history"
+        message = _STATUS_TEMPLATE.format(
+            enabled=enabled_text,
+            window_hours=system.window_hours,
+            steps="\n".join(
+                f"  {i}. {step.get_display_text()}" for i, step in enumerate(system.steps, 1)
+            ),
         )
 
         await update.message.reply_html(text=message)
 
     except Exception as e:
-        await update.message.reply_html(text=f"❌ Error: {str(e)}")
+        await update.message.reply_html(text=f"❌ Error: {escape_html(e)}")
 
     return ConversationHandler.END
 
 
+@admin_only
 async def punishment_toggle(update: Update, _context: ContextTypes.DEFAULT_TYPE):
     """Toggle the punishment system on/off."""
-    check = await check_admin_privilege(update)
-    if check:
-        return check
-
     try:
-        config_data = await read_config()
-
-        if "punishment" not in config_data:
-            config_data["punishment"] = {"enabled": True, "window_hours": 72, "steps": []}
-
-        current_state = config_data["punishment"].get("enabled", True)
-        config_data["punishment"]["enabled"] = not current_state
-
-        await write_json_file(config_data)
+        async with config_lock:
+            config_data = copy.deepcopy(await read_config())
+            punishment = config_data.setdefault(
+                "punishment", {"enabled": True, "window_hours": 72, "steps": []}
+            )
+            current_state = punishment.get("enabled", True)
+            punishment["enabled"] = not current_state
+            await _save_config(config_data)
 
         new_state = "✅ Enabled" if not current_state else "❌ Disabled"
         await update.message.reply_html(
@@ -82,17 +123,14 @@ async def punishment_toggle(update: Update, _context: ContextTypes.DEFAULT_TYPE)
         )
 
     except Exception as e:
-        await update.message.reply_html(text=f"❌ Error: {str(e)}")
+        await update.message.reply_html(text=f"❌ Error: {escape_html(e)}")
 
     return ConversationHandler.END
 
 
+@admin_only
 async def punishment_set_window(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Set the punishment time window."""
-    check = await check_admin_privilege(update)
-    if check:
-        return check
-
     # Check if hours provided as argument
     if context.args:
         try:
@@ -103,13 +141,14 @@ async def punishment_set_window(update: Update, context: ContextTypes.DEFAULT_TY
                 )
                 return ConversationHandler.END
 
-            config_data = await read_config()
-            if "punishment" not in config_data:
-                config_data["punishment"] = {"enabled": True, "window_hours": hours, "steps": []}
-            else:
-                config_data["punishment"]["window_hours"] = hours
+            async with config_lock:
+                config_data = copy.deepcopy(await read_config())
+                if "punishment" not in config_data:
+                    config_data["punishment"] = {"enabled": True, "window_hours": hours, "steps": []}
+                else:
+                    config_data["punishment"]["window_hours"] = hours
+                await _save_config(config_data)
 
-            await write_json_file(config_data)
             await update.message.reply_html(
                 text=f"✅ Punishment time window set to <code>{hours} hours</code>\n"
                      f"Violations older than this will be forgotten."
@@ -127,55 +166,40 @@ async def punishment_set_window(update: Update, context: ContextTypes.DEFAULT_TY
     return ConversationHandler.END
 
 
+@admin_only
 async def punishment_set_steps(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Configure punishment steps."""
-    check = await check_admin_privilege(update)
-    if check:
-        return check
-
     # Check if JSON provided as argument
     if context.args:
         try:
             steps_json = " ".join(context.args)
-            steps_data = json.loads(steps_json)
-
-            if not isinstance(steps_data, list) or len(steps_data) == 0:
-                raise ValueError("Steps must be a non-empty array")
-
-            # Validate each step
-            validated_steps = []
-            for step in steps_data:
-                step_type = step.get("type", "disable")
-                duration = step.get("duration", 0)
-                if step_type not in ["warning", "disable"]:
-                    raise ValueError(f"Invalid step type: {step_type}")
-                if not isinstance(duration, int) or duration < 0:
-                    raise ValueError(f"Invalid duration: {duration}")
-                validated_steps.append({"type": step_type, "duration": duration})
-
-            config_data = await read_config()
-            if "punishment" not in config_data:
-                config_data["punishment"] = {"enabled": True, "window_hours": 72, "steps": validated_steps}
+            # orjson.JSONDecodeError subclasses json.JSONDecodeError
+            if ORJSON_AVAILABLE:
+                steps_data = orjson.loads(steps_json)
             else:
-                config_data["punishment"]["steps"] = validated_steps
+                steps_data = json.loads(steps_json)
 
-            await write_json_file(config_data)
+            validated_steps = validate_steps(steps_data)
 
-            steps_display = []
-            for i, s in enumerate(validated_steps, 1):
-                if s["type"] == "warning":
-                    steps_display.append(f"  {i}. ⚠️ Warning")
-                elif s["duration"] == 0:
-                    steps_display.append(f"  {i}. 🚫 Unlimited disable")
+            async with config_lock:
+                config_data = copy.deepcopy(await read_config())
+                if "punishment" not in config_data:
+                    config_data["punishment"] = {"enabled": True, "window_hours": 72, "steps": validated_steps}
                 else:
-                    steps_display.append(f"  {i}. 🔒 {s['duration']} min disable")
+                    config_data["punishment"]["steps"] = validated_steps
+                await _save_config(config_data)
+
+            steps_display = "\n".join(
+                _STEP_FORMATS[(step["type"], step["duration"] == 0)].format(i=i, d=step["duration"])
+                for i, step in enumerate(validated_steps, 1)
+            )
 
             await update.message.reply_html(
-                text=f"✅ Punishment steps updated:\n\n{chr(10).join(steps_display)}"
+                text="✅ Punishment steps updated:\n\n" + steps_display
             )
             return ConversationHandler.END
         except (json.JSONDecodeError, ValueError) as e:
-            await update.message.reply_html(text=f"❌ Invalid format: {str(e)}")
+            await update.message.reply_html(text=f"❌ Invalid format: {escape_html(e)}")
             return ConversationHandler.END
 
     await update.message.reply_html(
@@ -194,12 +218,9 @@ async def punishment_set_steps(update: Update, context: ContextTypes.DEFAULT_TYP
     return ConversationHandler.END
 
 
+@admin_only
 async def user_violations(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Check violation history for a specific user."""
-    check = await check_admin_privilege(update)
-    if check:
-        return check
-
     if not context.args:
         await update.message.reply_html(
             text="❌ Please provide a username.\n"
@@ -210,49 +231,40 @@ async def user_violations(update: Update, context: ContextTypes.DEFAULT_TYPE):
     username = context.args[0]
 
     try:
-        from utils.punishment_system import get_punishment_system
-
         config_data = await read_config()
         system = get_punishment_system()
-        system.load_config(config_data)
+        system.load_config(config_data, get_config_version())
 
         status = system.get_user_status(username)
 
         if status["violation_count"] == 0:
             await update.message.reply_html(
-                text=f"✅ User <code>{username}</code> has no violations in the last {status['window_hours']} hours."
+                text=f"✅ User <code>{escape_html(username)}</code> has no violations in the last {status['window_hours']} hours."
             )
             return ConversationHandler.END
 
-        violations_text = []
-        for v in status["recent_violations"]:
-            step_type = "⚠️ Warning" if v["duration"] == 0 and v["step"] == 0 else f"🔒 {v['duration']}m" if v["duration"] > 0 else "🚫 Unlimited"
-            violations_text.append(f"  • {v['time_ago']} - Step {v['step'] + 1} ({step_type})")
-
-        message = (
-            f"⚖️ <b>Violation History: {username}</b>\n\n"
-            f"Total violations: <code>{status['violation_count']}</code>\n"
-            f"Window: <code>{status['window_hours']} hours</code>\n\n"
-            f"<b>Recent Violations:</b>\n"
-            f"{chr(10).join(violations_text)}\n\n"
-            f"<b>Next Punishment:</b>\n"
-            f"  {status['next_punishment']}"
+        message = _VIOLATIONS_TEMPLATE.format(
+            username=escape_html(username),
+            violation_count=status["violation_count"],
+            window_hours=status["window_hours"],
+            violations="\n".join(
+                f"  • {v['time_ago']} - Step {v['step'] + 1} ({_violation_label(v)})"
+                for v in status["recent_violations"]
+            ),
+            next_punishment=status["next_punishment"],
         )
 
         await update.message.reply_html(text=message)
 
     except Exception as e:
-        await update.message.reply_html(text=f"❌ Error: {str(e)}")
+        await update.message.reply_html(text=f"❌ Error: {escape_html(e)}")
 
     return ConversationHandler.END
 
 
+@admin_only
 async def clear_user_violations(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Clear violation history for a specific user."""
-    check = await check_admin_privilege(update)
-    if check:
-        return check
-
     if not context.args:
         await update.message.reply_html(
             text="❌ Please provide a username.\n"
@@ -264,22 +276,29 @@ async def clear_user_violations(update: Update, context: ContextTypes.DEFAULT_TY
     username = context.args[0]
 
     try:
-        from utils.punishment_system import get_punishment_system
-
         system = get_punishment_system()
 
+        # The clear takes effect in memory at once; only the save to disk
+        # runs in the background so the reply is not held up by it
         if username.upper() == "ALL":
-            await system.clear_all_history()
+            count = len(system.violations)
+            if count:
+                system.violations.clear()
+                run_in_background(system.save_violations(), "save_violations")
+            await update.message.reply_html(
+                text=f"✅ Cleared violation history for {count} users."
+            )
+        elif system.violations.pop(username, None) is not None:
+            run_in_background(system.save_violations(), "save_violations")
             await update.message.reply_html(
-                text="✅ Cleared all violation history."
+                text=f"✅ Cleared violation history for <code>{escape_html(username)}</code>"
             )
         else:
-            await system.clear_user_history(username)
             await update.message.reply_html(
-                text=f"✅ Cleared violation history for <code>{username}</code>"
+                text=f"ℹ️ No violation history for <code>{escape_html(username)}</code>"
             )
 
     except Exception as e:
-        await update.message.reply_html(text=f"❌ Error: {str(e)}")
+        await update.message.reply_html(text=f"❌ Error: {escape_html(e)}")
 
     return ConversationHandler.END
@@ -4,12 +4,26 @@ Contains commands for generating various reports and analytics.
 """
 
 import asyncio
+import html
+import io
+import re
+import time
+import traceback
 
-from telegram import Update
-from telegram.ext import ContextTypes, ConversationHandler
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.error import RetryAfter
+from telegram.ext import ContextTypes
 
-from telegram_bot.utils import check_admin, add_admin_to_config
-from utils.read_config import read_config
+from telegram_bot.handlers.admin import admin_only
+from telegram_bot.utils import escape_html
+from utils.read_config import get_config_version, read_config
+from utils.ip_history_tracker import ip_history_tracker
+from utils.isp_detector import (
+    NULL_ISP_DETECTOR,
+    ISPDetector,
+    NullISPDetector,
+    get_shared_isp_detector,
+)
 from utils.connection_analyzer import (
     generate_connection_report,
     generate_node_usage_report,
@@ -19,92 +33,139 @@ from utils.connection_analyzer import (
 )
 
 
-async def check_admin_privilege(update: Update):
+def _get_isp_detector(config_data: dict) -> ISPDetector | NullISPDetector:
+    """
+    Returns the shared ISP detector for the configured token, or
+    NULL_ISP_DETECTOR if ISP lookups are not configured.
+    """
+    ipinfo_token = config_data.get("IPINFO_TOKEN", "")
+    use_fallback_api = config_data.get("USE_FALLBACK_ISP_API", False)
+    if not (ipinfo_token or use_fallback_api):
+        return NULL_ISP_DETECTOR
+    return get_shared_isp_detector(ipinfo_token, use_fallback_api)
+
+
+# Multi-device users listed per message; the rest are reached with Prev/Next
+_MULTI_DEVICE_PAGE_SIZE = 20
+
+
+def _multi_device_page(multi_device_users: list, page: int) -> tuple[str, InlineKeyboardMarkup | None]:
+    """Format one page of the multi-device report and its navigation keyboard."""
+    total_pages = max(1, -(-len(multi_device_users) // _MULTI_DEVICE_PAGE_SIZE))
+    page = min(max(page, 0), total_pages - 1)
+    start = page * _MULTI_DEVICE_PAGE_SIZE
+    
+    header = "<b>Multi-Device Users:</b>"
+    if total_pages > 1:
+        header += f" (page {page + 1}/{total_pages}, {len(multi_device_users)} users)"
+    report_lines = [header + "\n\n"]
+    report_lines.extend(
+        f"<code>{escape_html(username)}</code>\n"
+        f"  • {ip_count} unique IPs\n"
+        f"  • {node_count} different nodes\n"
+        f"  • Protocols: {escape_html(', '.join(protocols))}\n\n"
+        for username, ip_count, node_count, protocols
+        in multi_device_users[start:start + _MULTI_DEVICE_PAGE_SIZE]
+    )
+    
+    nav_buttons = []
+    if page > 0:
+        nav_buttons.append(InlineKeyboardButton("⬅️ Prev", callback_data=f"multi_device_page:{page - 1}"))
+    if page < total_pages - 1:
+        nav_buttons.append(InlineKeyboardButton("Next ➡️", callback_data=f"multi_device_page:{page + 1}"))
+    keyboard = InlineKeyboardMarkup((tuple(nav_buttons),)) if nav_buttons else None
+    return "".join(report_lines), keyboard
+
+
+# Reports longer than this are uploaded as one .txt file instead of
+# being split across several messages
+_DOCUMENT_THRESHOLD = 8000
+_HTML_TAG = re.compile(r"<[^>]+>")
+
+
+async def _reply_report_document(update: Update, report: str, filename: str):
+    """Upload a report as a plain-text document in a single request."""
+    await update.message.reply_document(
+        document=io.BytesIO(report.encode("utf-8")),
+        filename=filename,
+    )
+
+
+def _html_to_text(report: str) -> str:
+    """Strip the HTML markup of a report so it reads well as a .txt file."""
+    return html.unescape(_HTML_TAG.sub("", report))
+
+
+async def _send_report(update: Update, report: str, filename: str = "report.txt", max_length: int = 4000):
     """
-    Checks if the user has admin privileges.
+    Reply with a plain-text report in <code> blocks, split into parts that
+    fit Telegram's message length limit, or as a document if it is long.
+    Parts are sent one after another on purpose: concurrent sends to the
+    same chat can arrive out of order and hit the per-chat flood limit.
     """
-    admins = await check_admin()
-    if not admins:
-        await add_admin_to_config(update.effective_chat.id)
-    admins = await check_admin()
-    if update.effective_chat.id not in admins:
-        await update.message.reply_html(
-            text="Sorry, you do not have permission to execute this command."
+    if len(report) > _DOCUMENT_THRESHOLD:
+        await _reply_report_document(update, report, filename)
+        return
+    if len(report) <= max_length:
+        await update.message.reply_text(f"<code>{report}</code>")
+        return
+    total = (len(report) + max_length - 1) // max_length
+    for i, start in enumerate(range(0, len(report), max_length), 1):
+        await update.message.reply_text(
+            f"<code>Part {i}/{total}:\n{report[start:start + max_length]}</code>"
         )
-        return ConversationHandler.END
 
 
+@admin_only
 async def connection_report_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Generate and send connection analysis report."""
-    check = await check_admin_privilege(update)
-    if check:
-        return check
-    
     try:
         report = await generate_connection_report()
-        # Split long messages to avoid Telegram's message length limit
-        max_length = 4000
-        if len(report) <= max_length:
-            await update.message.reply_text(f"<code>{report}</code>", parse_mode="HTML")
-        else:
-            # Split the report into smaller chunks
-            chunks = [report[i:i+max_length] for i in range(0, len(report), max_length)]
-            for i, chunk in enumerate(chunks):
-                await update.message.reply_text(
-                    f"<code>Part {i+1}/{len(chunks)}:\n{chunk}</code>", 
-                    parse_mode="HTML"
-                )
+        await _send_report(update, report, "connection_report.txt")
     except Exception as e:
-        await update.message.reply_text(f"Error generating report: {str(e)}")
+        await update.message.reply_text(f"Error generating report: {escape_html(e)}")
 
 
+@admin_only
 async def node_usage_report_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Generate and send node usage report."""
-    check = await check_admin_privilege(update)
-    if check:
-        return check
-    
     try:
         report = await generate_node_usage_report()
-        await update.message.reply_text(f"<code>{report}</code>", parse_mode="HTML")
+        await _send_report(update, report, "node_usage_report.txt")
     except Exception as e:
-        await update.message.reply_text(f"Error generating report: {str(e)}")
+        await update.message.reply_text(f"Error generating report: {escape_html(e)}")
 
 
+@admin_only
 async def multi_device_users_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Show users identified as using multiple devices."""
-    check = await check_admin_privilege(update)
-    if check:
-        return check
-    
     try:
         multi_device_users = await get_multi_device_users()
         if not multi_device_users:
             await update.message.reply_text("No multi-device users detected.")
             return
         
-        report_lines = ["<b>Multi-Device Users:</b>\n"]
-        for username, ip_count, node_count, protocols in multi_device_users:
-            report_lines.append(f"<code>{username}</code>")
-            report_lines.append(f"  • {ip_count} unique IPs")
-            report_lines.append(f"  • {node_count} different nodes")
-            report_lines.append(f"  • Protocols: {', '.join(protocols)}")
-            report_lines.append("")
-        
-        report = "\n".join(report_lines)
-        await update.message.reply_text(report, parse_mode="HTML")
+        text, keyboard = _multi_device_page(multi_device_users, 0)
+        await update.message.reply_text(text, reply_markup=keyboard)
     except Exception as e:
-        await update.message.reply_text(f"Error generating report: {str(e)}")
+        await update.message.reply_text(f"Error generating report: {escape_html(e)}")
 
 
+async def handle_multi_device_page_callback(query, _context: ContextTypes.DEFAULT_TYPE, page: str):
+    """Show another page of the multi-device report."""
+    multi_device_users = await get_multi_device_users()
+    if not multi_device_users:
+        await query.edit_message_text(text="No multi-device users detected.")
+        return
+    text, keyboard = _multi_device_page(multi_device_users, int(page))
+    await query.edit_message_text(text=text, reply_markup=keyboard)
+
+
+@admin_only
 async def users_by_node_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Show users by node. Usage: /users_by_node <node_id>"""
-    check = await check_admin_privilege(update)
-    if check:
-        return check
-    
     if not context.args:
-        await update.message.reply_text("Usage: /users_by_node <node_id>")
+        await update.message.reply_text("Usage: /users_by_node &lt;node_id&gt;")
         return
     
     try:
@@ -115,29 +176,23 @@ async def users_by_node_command(update: Update, context: ContextTypes.DEFAULT_TY
             await update.message.reply_text(f"No users found on node {node_id}.")
             return
         
-        report_lines = [f"<b>Users on Node {node_id}:</b>\n"]
-        for username, ip, protocol in users_on_node:
-            report_lines.append(f"<code>{username}</code>")
-            report_lines.append(f"  • IP: {ip}")
-            report_lines.append(f"  • Protocol: {protocol}")
-            report_lines.append("")
-        
-        report = "\n".join(report_lines)
-        await update.message.reply_text(report, parse_mode="HTML")
+        report_lines = [f"<b>Users on Node {node_id}:</b>\n\n"]
+        report_lines.extend(
+            f"<code>{escape_html(username)}</code>\n  • IP: {ip}\n  • Protocol: {escape_html(protocol)}\n\n"
+            for username, ip, protocol in users_on_node
+        )
+        await update.message.reply_text("".join(report_lines))
     except ValueError:
         await update.message.reply_text("Invalid node ID. Please provide a valid number.")
     except Exception as e:
-        await update.message.reply_text(f"Error generating report: {str(e)}")
+        await update.message.reply_text(f"Error generating report: {escape_html(e)}")
 
 
+@admin_only
 async def users_by_protocol_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Show users by inbound protocol. Usage: /users_by_protocol <protocol>"""
-    check = await check_admin_privilege(update)
-    if check:
-        return check
-    
     if not context.args:
-        await update.message.reply_text("Usage: /users_by_protocol <protocol>\nExample: /users_by_protocol \"Vless Direct\"")
+        await update.message.reply_text("Usage: /users_by_protocol &lt;protocol&gt;\nExample: /users_by_protocol \"Vless Direct\"")
         return
     
     try:
@@ -145,137 +200,89 @@ async def users_by_protocol_command(update: Update, context: ContextTypes.DEFAUL
         users_with_protocol = await get_users_by_inbound_protocol(protocol)
         
         if not users_with_protocol:
-            await update.message.reply_text(f"No users found using protocol '{protocol}'.")
+            await update.message.reply_text(f"No users found using protocol '{escape_html(protocol)}'.")
             return
         
-        report_lines = [f"<b>Users using protocol '{protocol}':</b>\n"]
-        for username, ip, node_name in users_with_protocol:
-            report_lines.append(f"<code>{username}</code>")
-            report_lines.append(f"  • IP: {ip}")
-            report_lines.append(f"  • Node: {node_name}")
-            report_lines.append("")
-        
-        report = "\n".join(report_lines)
-        await update.message.reply_text(report, parse_mode="HTML")
+        report_lines = [f"<b>Users using protocol '{escape_html(protocol)}':</b>\n\n"]
+        report_lines.extend(
+            f"<code>{escape_html(username)}</code>\n  • IP: {ip}\n  • Node: {escape_html(node_name)}\n\n"
+            for username, ip, node_name in users_with_protocol
+        )
+        await update.message.reply_text("".join(report_lines))
     except Exception as e:
-        await update.message.reply_text(f"Error generating report: {str(e)}")
+        await update.message.reply_text(f"Error generating report: {escape_html(e)}")
 
 
-async def ip_history_12h_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Show users exceeding limits in last 12 hours"""
-    check = await check_admin_privilege(update)
-    if check:
-        return check
-    
+async def _send_report_parts(update: Update, parts: list[str]):
+    """Reply with a report that was already split into message-sized parts."""
+    # Parts go out back to back; only back off when Telegram asks us to
+    for i, part in enumerate(parts):
+        if i > 0:
+            part = f"<b>Part {i+1}/{len(parts)}</b>\n\n" + part
+        try:
+            await update.message.reply_text(part)
+        except RetryAfter as e:
+            await asyncio.sleep(e.retry_after)
+            await update.message.reply_text(part)
+
+
+# Recently generated IP history reports, so repeated requests don't redo
+# the ISP lookups: (hours, config version, history version) -> (parts, time)
+_REPORT_CACHE_TTL = 30
+_report_cache: dict[tuple, tuple[list[str], float]] = {}
+
+
+async def _cached_ip_history_report(hours: int, config_data: dict, isp_detector) -> list[str]:
+    """Returns the IP history report, reusing one built in the last _REPORT_CACHE_TTL seconds."""
+    key = (hours, get_config_version(), ip_history_tracker.version)
+    now = time.monotonic()
+    cached = _report_cache.get(key)
+    if cached is not None and now - cached[1] < _REPORT_CACHE_TTL:
+        return cached[0]
+    parts = await ip_history_tracker.generate_report(hours, config_data, isp_detector)
+    # Only the latest report per period is worth keeping
+    for stale in [k for k in _report_cache if k[0] == hours]:
+        del _report_cache[stale]
+    _report_cache[key] = (parts, now)
+    return parts
+
+
+async def _send_ip_history_report(update: Update, hours: int):
+    """Generate the IP history report for the given period and send it."""
+    # The placeholder goes out while the report is generated; it is awaited
+    # before any further reply so messages never arrive out of order
+    placeholder = asyncio.create_task(
+        update.message.reply_text(f"⏳ Generating {hours}-hour IP history report...")
+    )
     try:
-        await update.message.reply_text("⏳ Generating 12-hour IP history report...")
-        
-        from utils.ip_history_tracker import ip_history_tracker
-        from utils.isp_detector import ISPDetector
-        
         config_data = await read_config()
         
         # Get ISP detector with token if available
-        isp_detector = None
-        ipinfo_token = config_data.get("IPINFO_TOKEN", "")
-        use_fallback_api = config_data.get("USE_FALLBACK_ISP_API", False)
-        if ipinfo_token or use_fallback_api:
-            isp_detector = ISPDetector(token=ipinfo_token, use_fallback_only=use_fallback_api)
+        isp_detector = _get_isp_detector(config_data)
         
-        # Generate report
-        report = await ip_history_tracker.generate_report(12, config_data, isp_detector)
+        parts = await _cached_ip_history_report(hours, config_data, isp_detector)
+        await placeholder
         
-        # Split if too long (Telegram limit)
-        if len(report) > 4000:
-            # Split into chunks
-            chunks = []
-            lines = report.split("\n")
-            current_chunk = []
-            current_length = 0
-            
-            for line in lines:
-                if current_length + len(line) + 1 > 3500:
-                    chunks.append("\n".join(current_chunk))
-                    current_chunk = [line]
-                    current_length = len(line)
-                else:
-                    current_chunk.append(line)
-                    current_length += len(line) + 1
-            
-            if current_chunk:
-                chunks.append("\n".join(current_chunk))
-            
-            # Send chunks
-            for i, chunk in enumerate(chunks):
-                if i > 0:
-                    chunk = f"<b>Part {i+1}/{len(chunks)}</b>\n\n" + chunk
-                await update.message.reply_text(chunk, parse_mode="HTML")
-                if i < len(chunks) - 1:
-                    await asyncio.sleep(1)
+        # Upload very long reports as a single document
+        if sum(map(len, parts)) > _DOCUMENT_THRESHOLD:
+            report = "\n".join(parts)
+            await _reply_report_document(update, _html_to_text(report), f"ip_history_{hours}h.txt")
         else:
-            await update.message.reply_text(report, parse_mode="HTML")
+            await _send_report_parts(update, parts)
             
     except Exception as e:
-        await update.message.reply_text(f"Error generating report: {str(e)}")
-        import traceback
+        await asyncio.gather(placeholder, return_exceptions=True)
+        await update.message.reply_text(f"Error generating report: {escape_html(e)}")
         traceback.print_exc()
 
 
+@admin_only
+async def ip_history_12h_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show users exceeding limits in last 12 hours"""
+    await _send_ip_history_report(update, 12)
+
+
+@admin_only
 async def ip_history_48h_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Show users exceeding limits in last 48 hours"""
-    check = await check_admin_privilege(update)
-    if check:
-        return check
-    
-    try:
-        await update.message.reply_text("⏳ Generating 48-hour IP history report...")
-        
-        from utils.ip_history_tracker import ip_history_tracker
-        from utils.isp_detector import ISPDetector
-        
-        config_data = await read_config()
-        
-        # Get ISP detector with token if available
-        isp_detector = None
-        ipinfo_token = config_data.get("IPINFO_TOKEN", "")
-        use_fallback_api = config_data.get("USE_FALLBACK_ISP_API", False)
-        if ipinfo_token or use_fallback_api:
-            isp_detector = ISPDetector(token=ipinfo_token, use_fallback_only=use_fallback_api)
-        
-        # Generate report
-        report = await ip_history_tracker.generate_report(48, config_data, isp_detector)
-        
-        # Split if too long (Telegram limit)
-        if len(report) > 4000:
-            # Split into chunks
-            chunks = []
-            lines = report.split("\n")
-            current_chunk = []
-            current_length = 0
-            
-            for line in lines:
-                if current_length + len(line) + 1 > 3500:
-                    chunks.append("\n".join(current_chunk))
-                    current_chunk = [line]
-                    current_length = len(line)
-                else:
-                    current_chunk.append(line)
-                    current_length += len(line) + 1
-            
-            if current_chunk:
-                chunks.append("\n".join(current_chunk))
-            
-            # Send chunks
-            for i, chunk in enumerate(chunks):
-                if i > 0:
-                    chunk = f"<b>Part {i+1}/{len(chunks)}</b>\n\n" + chunk
-                await update.message.reply_text(chunk, parse_mode="HTML")
-                if i < len(chunks) - 1:
-                    await asyncio.sleep(1)
-        else:
-            await update.message.reply_text(report, parse_mode="HTML")
-            
-    except Exception as e:
-        await update.message.reply_text(f"Error generating report: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    await _send_ip_history_report(update, 48)
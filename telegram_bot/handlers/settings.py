@@ -4,6 +4,8 @@ Contains all settings-related handlers for panel, intervals, and configuration.
 """
 
 import json
+from functools import cache
+
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     ContextTypes,
@@ -23,20 +25,27 @@ from telegram_bot.constants import (
 )
 from telegram_bot.utils import (
     add_base_information,
+    escape_html,
     read_json_file,
     save_check_interval,
     save_time_to_active_users,
     write_country_code_json,
     write_json_file,
 )
-from telegram_bot.handlers.admin import check_admin_privilege
+from telegram_bot.handlers.admin import admin_only, check_admin_privilege
+from telegram_bot.send_message import callback_action
 from telegram_bot.keyboards import (
     create_back_to_main_keyboard,
     create_settings_menu_keyboard,
 )
-from utils.read_config import read_config, save_config_value
+from utils.read_config import load_env_config, read_config, save_config_value
+
+# Menu number -> country code for /country_code, and code -> display name
+_COUNTRY_CODES = {"1": "IR", "2": "RU", "3": "CN", "4": "None"}
+_COUNTRY_NAMES = {"IR": "🇮🇷 Iran", "RU": "🇷🇺 Russia", "CN": "🇨🇳 China", "None": "🌐 None"}
 
 
+@cache
 def create_back_to_settings_keyboard():
     """Create a keyboard with only a back to settings button."""
     keyboard = [
@@ -45,6 +54,7 @@ def create_back_to_settings_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+@cache
 def create_country_keyboard():
     """Create country code options keyboard."""
     keyboard = [
@@ -61,6 +71,7 @@ def create_country_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+@cache
 def create_interval_keyboard():
     """Create check interval options keyboard."""
     keyboard = [
@@ -75,6 +86,7 @@ def create_interval_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+@cache
 def create_time_to_active_keyboard():
     """Create time to active options keyboard."""
     keyboard = [
@@ -89,6 +101,7 @@ def create_time_to_active_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+@cache
 def create_enhanced_details_keyboard():
     """Create enhanced details toggle keyboard."""
     keyboard = [
@@ -101,6 +114,7 @@ def create_enhanced_details_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+@cache
 def create_single_ip_keyboard():
     """Create single IP users toggle keyboard."""
     keyboard = [
@@ -125,7 +139,6 @@ async def set_panel_domain(update: Update, _context: ContextTypes.DEFAULT_TYPE):
         return check
     
     # Check if environment variables are already set
-    from utils.read_config import load_env_config
     env_config = load_env_config()
     panel_config = env_config.get("panel", {})
     domain = panel_config.get("domain")
@@ -136,7 +149,7 @@ async def set_panel_domain(update: Update, _context: ContextTypes.DEFAULT_TYPE):
             text="⚠️ Panel credentials are stored in <code>.env</code> file.\n"
             + "To change them, edit the .env file or use:\n"
             + "<code>pg-limiter config</code>\n\n"
-            + f"<b>Current domain:</b> <code>{domain}</code>"
+            + f"<b>Current domain:</b> <code>{escape_html(domain)}</code>"
         )
         return ConversationHandler.END
     
@@ -165,20 +178,21 @@ async def get_username(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
 async def get_password(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Get panel password from user and save config"""
     context.user_data["password"] = update.message.text.strip()
-    await update.message.reply_text("Please wait to check panel credentials...")
+    # Reuse the progress message for the result instead of sending another one
+    status_message = await update.message.reply_text("Please wait to check panel credentials...")
     try:
         await add_base_information(
             context.user_data["domain"],
             context.user_data["password"],
             context.user_data["username"],
         )
-        await update.message.reply_text("Config saved successfully 🎊")
+        await status_message.edit_text("Config saved successfully 🎊")
     except ValueError:
-        await update.message.reply_html(
+        await status_message.edit_text(
             text="<b>Error with your information!</b>\n"
-            + f"Domain: <code>{context.user_data['domain']}</code>\n"
-            + f"Username: <code>{context.user_data['username']}</code>\n"
-            + "Try again /create_config",
+            + f"Domain: <code>{escape_html(context.user_data['domain'])}</code>\n"
+            + f"Username: <code>{escape_html(context.user_data['username'])}</code>\n"
+            + "Try again /create_config"
         )
     return ConversationHandler.END
 
@@ -269,8 +283,7 @@ async def set_country_code(update: Update, _context: ContextTypes.DEFAULT_TYPE):
 async def country_code_handler(update: Update, _context: ContextTypes.DEFAULT_TYPE):
     """Write the country code to the config file."""
     country_code = update.message.text.strip()
-    country_codes = {"1": "IR", "2": "RU", "3": "CN", "4": "None"}
-    selected_country = country_codes.get(country_code, "None")
+    selected_country = _COUNTRY_CODES.get(country_code, "None")
     await write_country_code_json(selected_country)
     await update.message.reply_html(
         f"Country code <code>{selected_country}</code> set successfully!"
@@ -283,11 +296,9 @@ async def country_code_handler(update: Update, _context: ContextTypes.DEFAULT_TY
 # ═══════════════════════════════════════════════════════════════════════════════
 
 
+@admin_only
 async def set_ipinfo_token(update: Update, _context: ContextTypes.DEFAULT_TYPE):
     """Set the ipinfo.io API token."""
-    check = await check_admin_privilege(update)
-    if check is not None:
-        return check
     await update.message.reply_html(
         "Send your ipinfo.io API token:\n\n"
         + "Get one at https://ipinfo.io\n"
@@ -339,8 +350,7 @@ async def handle_settings_menu_callback(query, _context: ContextTypes.DEFAULT_TY
     """Handle callback for settings menu display."""
     await query.edit_message_text(
         text="⚙️ <b>Settings Menu</b>\n\nConfigure your bot settings:",
-        reply_markup=create_settings_menu_keyboard(),
-        parse_mode="HTML"
+        reply_markup=create_settings_menu_keyboard()
     )
 
 
@@ -348,19 +358,16 @@ async def handle_country_menu_callback(query, _context: ContextTypes.DEFAULT_TYP
     """Handle callback for country menu display."""
     await query.edit_message_text(
         text="🌍 <b>Select Country</b>\n\nOnly IPs from the selected country will be counted:",
-        reply_markup=create_country_keyboard(),
-        parse_mode="HTML"
+        reply_markup=create_country_keyboard()
     )
 
 
 async def handle_country_selection_callback(query, _context: ContextTypes.DEFAULT_TYPE, country_code: str):
     """Handle callback for country selection."""
-    country_names = {"IR": "🇮🇷 Iran", "RU": "🇷🇺 Russia", "CN": "🇨🇳 China", "None": "🌐 None"}
     await write_country_code_json(country_code)
     await query.edit_message_text(
-        text=f"✅ Country set to <b>{country_names.get(country_code, country_code)}</b>",
-        reply_markup=create_back_to_main_keyboard(),
-        parse_mode="HTML"
+        text=f"✅ Country set to <b>{_COUNTRY_NAMES.get(country_code, country_code)}</b>",
+        reply_markup=create_back_to_main_keyboard()
     )
 
 
@@ -368,8 +375,7 @@ async def handle_interval_menu_callback(query, _context: ContextTypes.DEFAULT_TY
     """Handle callback for interval menu display."""
     await query.edit_message_text(
         text="⏱️ <b>Check Interval</b>\n\nHow often should the bot check users:",
-        reply_markup=create_interval_keyboard(),
-        parse_mode="HTML"
+        reply_markup=create_interval_keyboard()
     )
 
 
@@ -378,8 +384,7 @@ async def handle_interval_preset_callback(query, _context: ContextTypes.DEFAULT_
     await save_check_interval(interval)
     await query.edit_message_text(
         text=f"✅ Check interval set to <b>{interval} seconds</b> ({interval // 60} min)",
-        reply_markup=create_back_to_main_keyboard(),
-        parse_mode="HTML"
+        reply_markup=create_back_to_main_keyboard()
     )
 
 
@@ -387,8 +392,7 @@ async def handle_interval_custom_callback(query, context: ContextTypes.DEFAULT_T
     """Handle callback for custom interval input."""
     context.user_data["waiting_for"] = "check_interval"
     await query.edit_message_text(
-        text="⏱️ <b>Custom Check Interval</b>\n\nSend the interval in seconds:",
-        parse_mode="HTML"
+        text="⏱️ <b>Custom Check Interval</b>\n\nSend the interval in seconds:"
     )
 
 
@@ -396,8 +400,7 @@ async def handle_time_menu_callback(query, _context: ContextTypes.DEFAULT_TYPE):
     """Handle callback for time to active menu display."""
     await query.edit_message_text(
         text="⏰ <b>Time to Active</b>\n\nHow long users stay active:",
-        reply_markup=create_time_to_active_keyboard(),
-        parse_mode="HTML"
+        reply_markup=create_time_to_active_keyboard()
     )
 
 
@@ -406,8 +409,7 @@ async def handle_time_preset_callback(query, _context: ContextTypes.DEFAULT_TYPE
     await save_time_to_active_users(time_val)
     await query.edit_message_text(
         text=f"✅ Time to active set to <b>{time_val} seconds</b> ({time_val // 60} min)",
-        reply_markup=create_back_to_main_keyboard(),
-        parse_mode="HTML"
+        reply_markup=create_back_to_main_keyboard()
     )
 
 
@@ -415,8 +417,7 @@ async def handle_time_custom_callback(query, context: ContextTypes.DEFAULT_TYPE)
     """Handle callback for custom time input."""
     context.user_data["waiting_for"] = "time_to_active"
     await query.edit_message_text(
-        text="⏰ <b>Custom Time to Active</b>\n\nSend the time in seconds:",
-        parse_mode="HTML"
+        text="⏰ <b>Custom Time to Active</b>\n\nSend the time in seconds:"
     )
 
 
@@ -432,27 +433,19 @@ async def handle_enhanced_menu_callback(query, _context: ContextTypes.DEFAULT_TY
         text=f"📋 <b>Enhanced Details</b>\n\nCurrently: <b>{status}</b>\n\n"
              + "• <b>ON</b>: Shows node names, IDs, and protocols\n"
              + "• <b>OFF</b>: Shows only IP addresses",
-        reply_markup=create_enhanced_details_keyboard(),
-        parse_mode="HTML"
+        reply_markup=create_enhanced_details_keyboard()
     )
 
 
+@callback_action(create_back_to_main_keyboard)
 async def handle_enhanced_toggle_callback(query, _context: ContextTypes.DEFAULT_TYPE, enable: bool):
     """Handle callback for enhanced details toggle."""
-    try:
-        await save_config_value("enhanced_details", str(enable).lower())
-        status = "enabled ✅" if enable else "disabled ❌"
-        await query.edit_message_text(
-            text=f"✅ Enhanced details <b>{status}</b>",
-            reply_markup=create_back_to_main_keyboard(),
-            parse_mode="HTML"
-        )
-    except Exception as e:
-        await query.edit_message_text(
-            text=f"❌ Error: {e}",
-            reply_markup=create_back_to_main_keyboard(),
-            parse_mode="HTML"
-        )
+    await save_config_value("enhanced_details", str(enable).lower())
+    status = "enabled ✅" if enable else "disabled ❌"
+    await query.edit_message_text(
+        text=f"✅ Enhanced details <b>{status}</b>",
+        reply_markup=create_back_to_main_keyboard()
+    )
 
 
 async def handle_single_ip_menu_callback(query, _context: ContextTypes.DEFAULT_TYPE):
@@ -467,27 +460,19 @@ async def handle_single_ip_menu_callback(query, _context: ContextTypes.DEFAULT_T
         text=f"1️⃣ <b>Single IP Users</b>\n\nCurrently: <b>{status}</b>\n\n"
              + "• <b>ON</b>: Include users with 1 IP in reports\n"
              + "• <b>OFF</b>: Only show users with multiple IPs",
-        reply_markup=create_single_ip_keyboard(),
-        parse_mode="HTML"
+        reply_markup=create_single_ip_keyboard()
     )
 
 
+@callback_action(create_back_to_main_keyboard)
 async def handle_single_ip_toggle_callback(query, _context: ContextTypes.DEFAULT_TYPE, enable: bool):
     """Handle callback for single IP toggle."""
-    try:
-        await save_config_value("show_single_ip_users", str(enable).lower())
-        status = "enabled ✅" if enable else "disabled ❌"
-        await query.edit_message_text(
-            text=f"✅ Show single IP users <b>{status}</b>",
-            reply_markup=create_back_to_main_keyboard(),
-            parse_mode="HTML"
-        )
-    except Exception as e:
-        await query.edit_message_text(
-            text=f"❌ Error: {e}",
-            reply_markup=create_back_to_main_keyboard(),
-            parse_mode="HTML"
-        )
+    await save_config_value("show_single_ip_users", str(enable).lower())
+    status = "enabled ✅" if enable else "disabled ❌"
+    await query.edit_message_text(
+        text=f"✅ Show single IP users <b>{status}</b>",
+        reply_markup=create_back_to_main_keyboard()
+    )
 
 
 async def handle_ipinfo_callback(query, context: ContextTypes.DEFAULT_TYPE):
@@ -497,8 +482,7 @@ async def handle_ipinfo_callback(query, context: ContextTypes.DEFAULT_TYPE):
         text="🔑 <b>IPInfo Token</b>\n\n"
              + "Send your ipinfo.io API token:\n\n"
              + "Get one at: https://ipinfo.io\n\n"
-             + "Or send <code>remove</code> to remove the token",
-        parse_mode="HTML"
+             + "Or send <code>remove</code> to remove the token"
     )
 
 
@@ -512,17 +496,10 @@ async def handle_check_interval_input(update: Update, context: ContextTypes.DEFA
     text = update.message.text.strip()
     try:
         interval = int(text)
-        await save_check_interval(interval)
-        await update.message.reply_html(
-            text=f"✅ Check interval set to <b>{interval} seconds</b>",
-            reply_markup=create_back_to_main_keyboard()
-        )
     except ValueError:
-        await update.message.reply_html(
-            text="❌ Invalid number.",
-            reply_markup=create_back_to_main_keyboard()
-        )
-    context.user_data["waiting_for"] = None
+        return "❌ Invalid number."
+    await save_check_interval(interval)
+    return f"✅ Check interval set to <b>{interval} seconds</b>"
 
 
 async def handle_time_to_active_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -530,17 +507,10 @@ async def handle_time_to_active_input(update: Update, context: ContextTypes.DEFA
     text = update.message.text.strip()
     try:
         time_val = int(text)
-        await save_time_to_active_users(time_val)
-        await update.message.reply_html(
-            text=f"✅ Time to active set to <b>{time_val} seconds</b>",
-            reply_markup=create_back_to_main_keyboard()
-        )
     except ValueError:
-        await update.message.reply_html(
-            text="❌ Invalid number.",
-            reply_markup=create_back_to_main_keyboard()
-        )
-    context.user_data["waiting_for"] = None
+        return "❌ Invalid number."
+    await save_time_to_active_users(time_val)
+    return f"✅ Time to active set to <b>{time_val} seconds</b>"
 
 
 async def handle_ipinfo_token_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -548,19 +518,8 @@ async def handle_ipinfo_token_input(update: Update, context: ContextTypes.DEFAUL
     text = update.message.text.strip()
     if text.lower() == "remove":
         await save_ipinfo_token("")
-        await update.message.reply_html(
-            text="✅ IPInfo token removed!",
-            reply_markup=create_back_to_main_keyboard()
-        )
-    elif len(text) < 10:
-        await update.message.reply_html(
-            text="❌ Invalid token format!",
-            reply_markup=create_back_to_main_keyboard()
-        )
-    else:
-        await save_ipinfo_token(text)
-        await update.message.reply_html(
-            text="✅ IPInfo token set successfully!",
-            reply_markup=create_back_to_main_keyboard()
-        )
-    context.user_data["waiting_for"] = None
+        return "✅ IPInfo token removed!"
+    if len(text) < 10:
+        return "❌ Invalid token format!"
+    await save_ipinfo_token(text)
+    return "✅ IPInfo token set successfully!"
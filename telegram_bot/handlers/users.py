@@ -4,6 +4,8 @@ Includes functions for except users, disabled users management, and cleanup.
 """
 
 import time
+from functools import cache
+
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     ContextTypes,
@@ -17,17 +19,28 @@ from telegram_bot.constants import (
 )
 from telegram_bot.utils import (
     add_except_user,
+    escape_html,
     remove_except_user_from_config,
     show_except_users_handler,
 )
 from telegram_bot.handlers.admin import check_admin_privilege
+from telegram_bot.send_message import callback_action
 from telegram_bot.keyboards import (
     create_back_to_main_keyboard,
     create_users_menu_keyboard,
 )
+from utils.handel_dis_users import DisabledUsers
+from utils.panel_api import cleanup_deleted_users, enable_selected_users
 from utils.read_config import read_config
+from utils.types import PanelType
+
+# Buttons are immutable, so the static back row of the user info page is shared
+_BACK_TO_DISABLED_ROW = (
+    InlineKeyboardButton("« Back to Disabled Users", callback_data=CallbackData.SHOW_DISABLED_USERS),
+)
 
 
+@cache
 def create_back_to_users_keyboard():
     """Create a simple back to users menu keyboard."""
     keyboard = [
@@ -37,6 +50,14 @@ def create_back_to_users_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+def _format_disabled_ago(elapsed: float) -> str:
+    """Format seconds since disable as a short 'Xm ago' / 'Xh ago' label."""
+    minutes = int(elapsed) // 60
+    if minutes >= 60:
+        return f"{minutes // 60}h ago"
+    return f"{minutes}m ago"
+
+
 def create_disabled_users_keyboard(disabled_users: dict, page: int = 0, per_page: int = 5):
     """
     Create a keyboard with disabled users as glass-style buttons.
@@ -60,26 +81,16 @@ def create_disabled_users_keyboard(disabled_users: dict, page: int = 0, per_page
     current_time = time.time()
     
     # Add user buttons with glass-style appearance
-    for username, disabled_time in page_users:
-        elapsed = int(current_time - disabled_time)
-        minutes = elapsed // 60
-        if minutes >= 60:
-            hours = minutes // 60
-            time_str = f"{hours}h ago"
-        else:
-            time_str = f"{minutes}m ago"
-        
-        # Glass-style button with user info and enable action
-        keyboard.append([
+    keyboard.extend(
+        [
             InlineKeyboardButton(
-                f"🔴 {username} ({time_str})",
+                f"🔴 {username} ({_format_disabled_ago(current_time - disabled_time)})",
                 callback_data=f"user_info:{username}"
             ),
-            InlineKeyboardButton(
-                "✅ Enable",
-                callback_data=f"enable_user:{username}"
-            )
-        ])
+            InlineKeyboardButton("✅ Enable", callback_data=f"enable_user:{username}"),
+        ]
+        for username, disabled_time in page_users
+    )
     
     # Pagination buttons
     nav_buttons = []
@@ -131,7 +142,7 @@ async def set_except_users_handler(update: Update, _context: ContextTypes.DEFAUL
     except_user = update.message.text.strip()
     await add_except_user(except_user)
     await update.message.reply_html(
-        f"Except user <code>{except_user}</code> added successfully!"
+        f"Except user <code>{escape_html(except_user)}</code> added successfully!"
     )
     return ConversationHandler.END
 
@@ -152,11 +163,11 @@ async def remove_except_user_handler(
     except_user = await remove_except_user_from_config(update.message.text.strip())
     if except_user:
         await update.message.reply_html(
-            f"Except user <code>{except_user}</code> removed successfully!"
+            f"Except user <code>{escape_html(except_user)}</code> removed successfully!"
         )
     else:
         await update.message.reply_html(
-            f"Except user <code>{update.message.text.strip()}</code> not found!"
+            f"Except user <code>{escape_html(update.message.text.strip())}</code> not found!"
         )
     return ConversationHandler.END
 
@@ -180,144 +191,109 @@ async def show_except_users(update: Update, _context: ContextTypes.DEFAULT_TYPE)
 # ═══════════════════════════════════════════════════════════════════════════════
 
 
+@callback_action(create_back_to_users_keyboard, "❌ Error loading disabled users")
 async def show_disabled_users_menu(query, page: int = 0):
     """Display the disabled users menu with enable buttons."""
-    from utils.handel_dis_users import DisabledUsers
+    # Load disabled users
+    dis_users = DisabledUsers()
+    disabled_dict = dis_users.disabled_users
     
-    try:
-        # Load disabled users
-        dis_users = DisabledUsers()
-        disabled_dict = dis_users.disabled_users
-        
-        if not disabled_dict:
-            text = (
-                "🚫 <b>Disabled Users</b>\n\n"
-                "✅ No users are currently disabled by the limiter.\n\n"
-                "Users get disabled when they exceed their IP limit."
-            )
-            keyboard = create_back_to_users_keyboard()
-        else:
-            # Get time to active for info
-            try:
-                config = await read_config()
-                time_to_active = config.get("timing", {}).get("time_to_active_users", 300)
-            except Exception:
-                time_to_active = 300
-            
-            total_users = len(disabled_dict)
-            text = (
-                f"🚫 <b>Disabled Users</b>\n\n"
-                f"📊 Total: <b>{total_users}</b> users disabled by limiter\n"
-                f"⏱️ Auto-enable after: <b>{time_to_active // 60}</b> minutes\n\n"
-                f"<i>Click the ✅ button to manually enable a user:</i>"
-            )
-            keyboard = create_disabled_users_keyboard(disabled_dict, page=page)
-        
-        await query.edit_message_text(
-            text=text,
-            reply_markup=keyboard,
-            parse_mode="HTML"
+    if not disabled_dict:
+        text = (
+            "🚫 <b>Disabled Users</b>\n\n"
+            "✅ No users are currently disabled by the limiter.\n\n"
+            "Users get disabled when they exceed their IP limit."
         )
-    except Exception as e:
-        await query.edit_message_text(
-            text=f"❌ Error loading disabled users: {e}",
-            reply_markup=create_back_to_users_keyboard(),
-            parse_mode="HTML"
+        keyboard = create_back_to_users_keyboard()
+    else:
+        # Get time to active for info
+        try:
+            config = await read_config()
+            time_to_active = config.get("timing", {}).get("time_to_active_users", 300)
+        except Exception:
+            time_to_active = 300
+        
+        total_users = len(disabled_dict)
+        text = (
+            f"🚫 <b>Disabled Users</b>\n\n"
+            f"📊 Total: <b>{total_users}</b> users disabled by limiter\n"
+            f"⏱️ Auto-enable after: <b>{time_to_active // 60}</b> minutes\n\n"
+            f"<i>Click the ✅ button to manually enable a user:</i>"
         )
+        keyboard = create_disabled_users_keyboard(disabled_dict, page=page)
+    
+    await query.edit_message_text(
+        text=text,
+        reply_markup=keyboard
+    )
 
 
+@callback_action(create_back_to_users_keyboard, "❌ Error enabling user")
 async def enable_single_user(query, username: str):
     """Enable a single disabled user."""
-    from utils.handel_dis_users import DisabledUsers
-    from utils.panel_api import enable_selected_users
-    from utils.types import PanelType
+    # Load config for panel data
+    config = await read_config()
+    panel_config = config.get("panel", {})
+    panel_data = PanelType(
+        panel_username=panel_config.get("username", ""),
+        panel_password=panel_config.get("password", ""),
+        panel_domain=panel_config.get("domain", "")
+    )
     
-    try:
-        # Load config for panel data
-        config = await read_config()
-        panel_config = config.get("panel", {})
-        panel_data = PanelType(
-            panel_username=panel_config.get("username", ""),
-            panel_password=panel_config.get("password", ""),
-            panel_domain=panel_config.get("domain", "")
-        )
-        
-        # Enable user on panel
-        await enable_selected_users(panel_data, {username})
-        
-        # Remove from disabled users list
-        dis_users = DisabledUsers()
-        await dis_users.remove_user(username)
-        
-        # Show updated list
-        await query.answer(f"✅ User {username} enabled!")
-        await show_disabled_users_menu(query)
-        
-    except Exception as e:
-        await query.edit_message_text(
-            text=f"❌ Error enabling user {username}: {e}",
-            reply_markup=create_back_to_users_keyboard(),
-            parse_mode="HTML"
-        )
+    # Enable user on panel
+    await enable_selected_users(panel_data, {username})
+    
+    # Remove from disabled users list
+    dis_users = DisabledUsers()
+    await dis_users.remove_user(username)
+    
+    # Show updated list
+    await query.answer(f"✅ User {username} enabled!")
+    await show_disabled_users_menu(query)
 
 
+@callback_action(create_back_to_users_keyboard, "❌ Error enabling users")
 async def enable_all_disabled_users(query):
     """Enable all disabled users."""
-    from utils.handel_dis_users import DisabledUsers
-    from utils.panel_api import enable_selected_users
-    from utils.types import PanelType
+    # Load disabled users
+    dis_users = DisabledUsers()
+    disabled_dict = dis_users.disabled_users.copy()
     
-    try:
-        # Load disabled users
-        dis_users = DisabledUsers()
-        disabled_dict = dis_users.disabled_users.copy()
-        
-        if not disabled_dict:
-            await query.answer("No disabled users to enable!")
-            return
-        
-        usernames = set(disabled_dict.keys())
-        count = len(usernames)
-        
-        await query.edit_message_text(
-            text=f"⏳ Enabling {count} users...",
-            parse_mode="HTML"
-        )
-        
-        # Load config for panel data
-        config = await read_config()
-        panel_config = config.get("panel", {})
-        panel_data = PanelType(
-            panel_username=panel_config.get("username", ""),
-            panel_password=panel_config.get("password", ""),
-            panel_domain=panel_config.get("domain", "")
-        )
-        
-        # Enable all users on panel
-        await enable_selected_users(panel_data, usernames)
-        
-        # Clear disabled users list
-        await dis_users.read_and_clear_users()
-        
-        await query.edit_message_text(
-            text=f"✅ <b>Successfully enabled {count} users!</b>\n\n"
-                 f"All disabled users have been re-enabled on the panel.",
-            reply_markup=create_back_to_users_keyboard(),
-            parse_mode="HTML"
-        )
-        
-    except Exception as e:
-        await query.edit_message_text(
-            text=f"❌ Error enabling users: {e}",
-            reply_markup=create_back_to_users_keyboard(),
-            parse_mode="HTML"
-        )
+    if not disabled_dict:
+        await query.answer("No disabled users to enable!")
+        return
+    
+    usernames = set(disabled_dict.keys())
+    count = len(usernames)
+    
+    await query.edit_message_text(
+        text=f"⏳ Enabling {count} users..."
+    )
+    
+    # Load config for panel data
+    config = await read_config()
+    panel_config = config.get("panel", {})
+    panel_data = PanelType(
+        panel_username=panel_config.get("username", ""),
+        panel_password=panel_config.get("password", ""),
+        panel_domain=panel_config.get("domain", "")
+    )
+    
+    # Enable all users on panel
+    await enable_selected_users(panel_data, usernames)
+    
+    # Clear disabled users list
+    await dis_users.read_and_clear_users()
+    
+    await query.edit_message_text(
+        text=f"✅ <b>Successfully enabled {count} users!</b>\n\n"
+             f"All disabled users have been re-enabled on the panel.",
+        reply_markup=create_back_to_users_keyboard()
+    )
 
 
 async def show_user_info(query, username: str):
     """Show detailed info for a disabled user."""
-    from utils.handel_dis_users import DisabledUsers
-    
     dis_users = DisabledUsers()
     disabled_time = dis_users.disabled_users.get(username)
     
@@ -328,21 +304,20 @@ async def show_user_info(query, username: str):
         disabled_at = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(disabled_time))
         
         info_text = (
-            f"ℹ️ <b>User Info: {username}</b>\n\n"
+            f"ℹ️ <b>User Info: {escape_html(username)}</b>\n\n"
             f"🔴 <b>Status:</b> Disabled\n"
             f"📅 <b>Disabled at:</b> {disabled_at}\n"
             f"⏱️ <b>Elapsed:</b> {minutes}m {seconds}s\n\n"
             f"<i>Click Enable to re-activate this user.</i>"
         )
         
-        keyboard = [
-            [InlineKeyboardButton(f"✅ Enable {username}", callback_data=f"enable_user:{username}")],
-            [InlineKeyboardButton("« Back to Disabled Users", callback_data=CallbackData.SHOW_DISABLED_USERS)],
-        ]
+        keyboard = (
+            (InlineKeyboardButton(f"✅ Enable {username}", callback_data=f"enable_user:{username}"),),
+            _BACK_TO_DISABLED_ROW,
+        )
         await query.edit_message_text(
             text=info_text,
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode="HTML"
+            reply_markup=InlineKeyboardMarkup(keyboard)
         )
     else:
         await query.answer(f"User {username} is no longer disabled!")
@@ -354,98 +329,85 @@ async def show_user_info(query, username: str):
 # ═══════════════════════════════════════════════════════════════════════════════
 
 
+@callback_action(create_back_to_users_keyboard, "❌ <b>Error during cleanup</b>")
 async def cleanup_deleted_users_handler(query):
     """Clean up users from limiter config that no longer exist in the panel."""
-    from utils.panel_api import cleanup_deleted_users
-    from utils.types import PanelType
+    await query.edit_message_text(
+        text="⏳ <b>Cleaning up deleted users...</b>\n\n"
+             "Fetching all users from panel and checking limiter config..."
+    )
+    
+    # Load config for panel data
+    config = await read_config()
+    panel_config = config.get("panel", {})
+    panel_data = PanelType(
+        panel_username=panel_config.get("username", ""),
+        panel_password=panel_config.get("password", ""),
+        panel_domain=panel_config.get("domain", "")
+    )
+    
+    # Perform cleanup
+    result = await cleanup_deleted_users(panel_data)
     
-    try:
+    # Build result message
+    total_removed = (
+        len(result.get("special_limits_removed", [])) +
+        len(result.get("except_users_removed", [])) +
+        len(result.get("disabled_users_removed", [])) +
+        len(result.get("user_groups_backup_removed", []))
+    )
+    
+    if total_removed == 0:
         await query.edit_message_text(
-            text="⏳ <b>Cleaning up deleted users...</b>\n\n"
-                 "Fetching all users from panel and checking limiter config...",
-            parse_mode="HTML"
-        )
-        
-        # Load config for panel data
-        config = await read_config()
-        panel_config = config.get("panel", {})
-        panel_data = PanelType(
-            panel_username=panel_config.get("username", ""),
-            panel_password=panel_config.get("password", ""),
-            panel_domain=panel_config.get("domain", "")
+            text="✅ <b>Cleanup Complete!</b>\n\n"
+                 "No deleted users found in limiter config.\n"
+                 "Everything is clean! 🎉",
+            reply_markup=create_back_to_users_keyboard()
         )
+    else:
+        message_parts = ["🧹 <b>Cleanup Complete!</b>\n"]
         
-        # Perform cleanup
-        result = await cleanup_deleted_users(panel_data)
+        special_limits = result.get("special_limits_removed", [])
+        if special_limits:
+            message_parts.append(
+                f"\n📊 <b>Special Limits:</b> Removed {len(special_limits)} users\n"
+                f"<code>{escape_html(', '.join(special_limits[:10]))}</code>"
+            )
+            if len(special_limits) > 10:
+                message_parts.append(f" and {len(special_limits) - 10} more...")
         
-        # Build result message
-        total_removed = (
-            len(result.get("special_limits_removed", [])) +
-            len(result.get("except_users_removed", [])) +
-            len(result.get("disabled_users_removed", [])) +
-            len(result.get("user_groups_backup_removed", []))
-        )
+        except_users = result.get("except_users_removed", [])
+        if except_users:
+            message_parts.append(
+                f"\n📋 <b>Except Users:</b> Removed {len(except_users)} users\n"
+                f"<code>{escape_html(', '.join(except_users[:10]))}</code>"
+            )
+            if len(except_users) > 10:
+                message_parts.append(f" and {len(except_users) - 10} more...")
         
-        if total_removed == 0:
-            await query.edit_message_text(
-                text="✅ <b>Cleanup Complete!</b>\n\n"
-                     "No deleted users found in limiter config.\n"
-                     "Everything is clean! 🎉",
-                reply_markup=create_back_to_users_keyboard(),
-                parse_mode="HTML"
+        disabled_users = result.get("disabled_users_removed", [])
+        if disabled_users:
+            message_parts.append(
+                f"\n🚫 <b>Disabled Users:</b> Removed {len(disabled_users)} users\n"
+                f"<code>{escape_html(', '.join(disabled_users[:10]))}</code>"
             )
-        else:
-            message_parts = ["🧹 <b>Cleanup Complete!</b>\n"]
-            
-            special_limits = result.get("special_limits_removed", [])
-            if special_limits:
-                message_parts.append(
-                    f"\n📊 <b>Special Limits:</b> Removed {len(special_limits)} users\n"
-                    f"<code>{', '.join(special_limits[:10])}</code>"
-                )
-                if len(special_limits) > 10:
-                    message_parts.append(f" and {len(special_limits) - 10} more...")
-            
-            except_users = result.get("except_users_removed", [])
-            if except_users:
-                message_parts.append(
-                    f"\n📋 <b>Except Users:</b> Removed {len(except_users)} users\n"
-                    f"<code>{', '.join(except_users[:10])}</code>"
-                )
-                if len(except_users) > 10:
-                    message_parts.append(f" and {len(except_users) - 10} more...")
-            
-            disabled_users = result.get("disabled_users_removed", [])
-            if disabled_users:
-                message_parts.append(
-                    f"\n🚫 <b>Disabled Users:</b> Removed {len(disabled_users)} users\n"
-                    f"<code>{', '.join(disabled_users[:10])}</code>"
-                )
-                if len(disabled_users) > 10:
-                    message_parts.append(f" and {len(disabled_users) - 10} more...")
-            
-            group_users = result.get("user_groups_backup_removed", [])
-            if group_users:
-                message_parts.append(
-                    f"\n📁 <b>Groups Backup:</b> Removed {len(group_users)} users\n"
-                    f"<code>{', '.join(group_users[:10])}</code>"
-                )
-                if len(group_users) > 10:
-                    message_parts.append(f" and {len(group_users) - 10} more...")
-            
-            message_parts.append(f"\n\n<b>Total removed:</b> {total_removed} user entries")
-            
-            await query.edit_message_text(
-                text="".join(message_parts),
-                reply_markup=create_back_to_users_keyboard(),
-                parse_mode="HTML"
+            if len(disabled_users) > 10:
+                message_parts.append(f" and {len(disabled_users) - 10} more...")
+        
+        group_users = result.get("user_groups_backup_removed", [])
+        if group_users:
+            message_parts.append(
+                f"\n📁 <b>Groups Backup:</b> Removed {len(group_users)} users\n"
+                f"<code>{escape_html(', '.join(group_users[:10]))}</code>"
             )
+            if len(group_users) > 10:
+                message_parts.append(f" and {len(group_users) - 10} more...")
+        
+        message_parts.append(f"\n\n<b>Total removed:</b> {total_removed} user entries")
         
-    except Exception as e:
         await query.edit_message_text(
-            text=f"❌ <b>Error during cleanup:</b>\n\n{e}",
-            reply_markup=create_back_to_users_keyboard(),
-            parse_mode="HTML"
+            text="".join(message_parts),
+            reply_markup=create_back_to_users_keyboard()
         )
 
 
@@ -458,8 +420,7 @@ async def handle_users_menu_callback(query, _context: ContextTypes.DEFAULT_TYPE)
     """Handle callback for users menu display."""
     await query.edit_message_text(
         text="👥 <b>Users Menu</b>\n\nManage users and view disabled accounts:",
-        reply_markup=create_users_menu_keyboard(),
-        parse_mode="HTML"
+        reply_markup=create_users_menu_keyboard()
     )
 
 
@@ -472,8 +433,7 @@ async def handle_show_except_users_callback(query, _context: ContextTypes.DEFAUL
         text = "👥 No except users found!"
     await query.edit_message_text(
         text=text,
-        reply_markup=create_back_to_users_keyboard(),
-        parse_mode="HTML"
+        reply_markup=create_back_to_users_keyboard()
     )
 
 
@@ -481,8 +441,7 @@ async def handle_set_except_user_callback(query, context: ContextTypes.DEFAULT_T
     """Handle callback for initiating add except user flow."""
     context.user_data["waiting_for"] = "except_user"
     await query.edit_message_text(
-        text="👥 <b>Add Except User</b>\n\nSend the username to add:",
-        parse_mode="HTML"
+        text="👥 <b>Add Except User</b>\n\nSend the username to add:"
     )
 
 
@@ -490,8 +449,7 @@ async def handle_remove_except_user_callback(query, context: ContextTypes.DEFAUL
     """Handle callback for initiating remove except user flow."""
     context.user_data["waiting_for"] = "remove_except_user"
     await query.edit_message_text(
-        text="👥 <b>Remove Except User</b>\n\nSend the username to remove:",
-        parse_mode="HTML"
+        text="👥 <b>Remove Except User</b>\n\nSend the username to remove:"
     )
 
 
@@ -525,6 +483,21 @@ async def handle_user_info_callback(query, _context: ContextTypes.DEFAULT_TYPE,
     await show_user_info(query, username)
 
 
+@callback_action(create_back_to_main_keyboard, "❌ Error adding except user")
+async def handle_add_except_callback(query, _context: ContextTypes.DEFAULT_TYPE, username: str):
+    """Handle the "Add to except" button on a user report (add_except:<username>)."""
+    if await add_except_user(username) is None:
+        await query.message.reply_html(
+            f"ℹ️ User <code>{escape_html(username)}</code> is already in the except list."
+        )
+        return
+    # Drop the buttons so the same report can't be acted on twice
+    await query.edit_message_reply_markup(reply_markup=None)
+    await query.message.reply_html(
+        f"Except user <code>{escape_html(username)}</code> added successfully!"
+    )
+
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # TEXT MESSAGE HANDLERS (for inline keyboard input flows)
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -537,10 +510,9 @@ async def handle_except_user_input(update: Update, context: ContextTypes.DEFAULT
     """
     text = update.message.text.strip()
     await add_except_user(text)
-    context.user_data["waiting_for"] = None
-    await update.message.reply_html(
-        text=f"✅ Except user <b>{text}</b> added successfully!",
-        reply_markup=create_back_to_users_keyboard()
+    return (
+        f"✅ Except user <b>{escape_html(text)}</b> added successfully!",
+        create_back_to_users_keyboard(),
     )
 
 
@@ -551,15 +523,9 @@ async def handle_remove_except_user_input(update: Update, context: ContextTypes.
     """
     text = update.message.text.strip()
     result = await remove_except_user_from_config(text)
-    context.user_data["waiting_for"] = None
     
     if result:
-        await update.message.reply_html(
-            text=f"✅ Except user <b>{text}</b> removed successfully!",
-            reply_markup=create_back_to_users_keyboard()
-        )
+        reply = f"✅ Except user <b>{escape_html(text)}</b> removed successfully!"
     else:
-        await update.message.reply_html(
-            text=f"❌ Except user <b>{text}</b> not found!",
-            reply_markup=create_back_to_users_keyboard()
-        )
+        reply = f"❌ Except user <b>{escape_html(text)}</b> not found!"
+    return reply, create_back_to_users_keyboard()
@@ -1,12 +1,20 @@
 """
 Telegram Bot Keyboards
 Contains all inline keyboard builders.
+
+InlineKeyboardMarkup is immutable, so the static builders here are
+memoized with @cache and the few that take arguments use a bounded
+lru_cache. Keyboards built from runtime data (user lists, report pages)
+live in the handlers and are not cached.
 """
 
+from functools import cache, lru_cache
+
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from telegram_bot.constants import CallbackData
 
 
+@cache
 def create_main_menu_keyboard():
     """Create the main menu inline keyboard."""
     keyboard = [
@@ -30,6 +38,7 @@ def create_main_menu_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+@cache
 def create_settings_menu_keyboard():
     """Create the settings menu inline keyboard."""
     keyboard = [
@@ -38,12 +47,12 @@ def create_settings_menu_keyboard():
             InlineKeyboardButton("🚫 Disable Method", callback_data=CallbackData.DISABLE_METHOD_MENU),
         ],
         [
-            InlineKeyboardButton("🌍 Country Code", callback_data=CallbackData.COUNTRY_NONE),
-            InlineKeyboardButton("⏱️ Check Interval", callback_data=CallbackData.INTERVAL_CUSTOM),
+            InlineKeyboardButton("🌍 Country Code", callback_data=CallbackData.COUNTRY_MENU),
+            InlineKeyboardButton("⏱️ Check Interval", callback_data=CallbackData.INTERVAL_MENU),
         ],
         [
-            InlineKeyboardButton("⏰ Active Time", callback_data=CallbackData.TIME_CUSTOM),
-            InlineKeyboardButton("📋 Enhanced Details", callback_data=CallbackData.ENHANCED_ON),
+            InlineKeyboardButton("⏰ Active Time", callback_data=CallbackData.TIME_MENU),
+            InlineKeyboardButton("📋 Enhanced Details", callback_data=CallbackData.ENHANCED_MENU),
         ],
         [
             InlineKeyboardButton("⚖️ Punishment", callback_data=CallbackData.PUNISHMENT_MENU),
@@ -59,6 +68,7 @@ def create_settings_menu_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+@cache
 def create_limits_menu_keyboard():
     """Create the limits menu inline keyboard."""
     keyboard = [
@@ -81,6 +91,7 @@ def create_limits_menu_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+@cache
 def create_users_menu_keyboard():
     """Create the users menu inline keyboard."""
     keyboard = [
@@ -105,6 +116,7 @@ def create_users_menu_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+@cache
 def create_monitoring_menu_keyboard():
     """Create the monitoring menu inline keyboard."""
     keyboard = [
@@ -122,6 +134,7 @@ def create_monitoring_menu_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+@cache
 def create_reports_menu_keyboard():
     """Create the reports menu inline keyboard."""
     keyboard = [
@@ -143,6 +156,7 @@ def create_reports_menu_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+@cache
 def create_admin_menu_keyboard():
     """Create the admin management menu inline keyboard."""
     keyboard = [
@@ -160,6 +174,7 @@ def create_admin_menu_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+@cache
 def create_country_keyboard():
     """Create country code selection keyboard."""
     keyboard = [
@@ -178,6 +193,7 @@ def create_country_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+@cache
 def create_interval_keyboard():
     """Create check interval selection keyboard."""
     keyboard = [
@@ -196,6 +212,7 @@ def create_interval_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+@cache
 def create_time_to_active_keyboard():
     """Create time to active selection keyboard."""
     keyboard = [
@@ -214,6 +231,7 @@ def create_time_to_active_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+@cache
 def create_enhanced_details_keyboard():
     """Create enhanced details toggle keyboard."""
     keyboard = [
@@ -228,6 +246,7 @@ def create_enhanced_details_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+@cache
 def create_disable_method_keyboard():
     """Create disable method selection keyboard."""
     keyboard = [
@@ -244,6 +263,7 @@ def create_disable_method_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+@cache
 def create_punishment_menu_keyboard(enabled: bool = False):
     """Create punishment system menu keyboard."""
     toggle_text = "🔴 Disable" if enabled else "🟢 Enable"
@@ -266,6 +286,7 @@ def create_punishment_menu_keyboard(enabled: bool = False):
     return InlineKeyboardMarkup(keyboard)
 
 
+@lru_cache(maxsize=128)
 def create_back_keyboard(callback_data: str = CallbackData.BACK_MAIN):
     """Create a simple back button keyboard."""
     keyboard = [
@@ -274,6 +295,7 @@ def create_back_keyboard(callback_data: str = CallbackData.BACK_MAIN):
     return InlineKeyboardMarkup(keyboard)
 
 
+@lru_cache(maxsize=128)
 def create_confirmation_keyboard(confirm_data: str, cancel_data: str = CallbackData.BACK_MAIN):
     """Create a confirmation keyboard with Yes/No buttons."""
     keyboard = [
@@ -285,6 +307,7 @@ def create_confirmation_keyboard(confirm_data: str, cancel_data: str = CallbackD
     return InlineKeyboardMarkup(keyboard)
 
 
+@cache
 def create_back_to_main_keyboard():
     """Create a simple back to main menu keyboard."""
     keyboard = [
@@ -293,6 +316,7 @@ def create_back_to_main_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+@cache
 def create_special_limit_options_keyboard():
     """Create special limit options keyboard."""
     keyboard = [
@@ -306,6 +330,7 @@ def create_special_limit_options_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+@cache
 def create_general_limit_keyboard():
     """Create general limit options keyboard."""
     keyboard = [
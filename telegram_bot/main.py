@@ -5,11 +5,14 @@ Contains the main bot setup and handler registration.
 
 import os
 import sys
+from functools import partial
 
 try:
     from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+    from telegram.constants import ParseMode
     from telegram.ext import (
         ApplicationBuilder,
+        Defaults,
         CommandHandler,
         ContextTypes,
         ConversationHandler,
@@ -67,6 +70,17 @@ from telegram_bot.handlers.admin import (
     remove_admin,
 )
 from telegram_bot.handlers.limits import (
+    handle_general_limit_custom_callback,
+    handle_general_limit_input,
+    handle_general_limit_preset_callback,
+    handle_set_limit_callback,
+    handle_set_special_limit_callback,
+    handle_show_special_limit_callback,
+    handle_special_limit_1_callback,
+    handle_special_limit_2_callback,
+    handle_special_limit_custom_callback,
+    handle_special_limit_number_input,
+    handle_special_limit_username_input,
     set_special_limit,
     get_special_limit,
     get_limit_number,
@@ -75,17 +89,39 @@ from telegram_bot.handlers.limits import (
     get_general_limit_number_handler,
 )
 from telegram_bot.handlers.users import (
+    handle_add_except_callback,
+    handle_cleanup_deleted_users_callback,
+    handle_enable_all_disabled_callback,
+    handle_enable_user_callback,
+    handle_except_user_input,
+    handle_remove_except_user_callback,
+    handle_remove_except_user_input,
+    handle_set_except_user_callback,
+    handle_show_disabled_users_callback,
+    handle_show_except_users_callback,
+    handle_user_info_callback,
     set_except_users,
     set_except_users_handler,
     remove_except_user,
     remove_except_user_handler,
     show_except_users,
     show_disabled_users_menu,
-    enable_single_user,
-    enable_all_disabled_users,
-    cleanup_deleted_users_handler,
 )
 from telegram_bot.handlers.settings import (
+    handle_check_interval_input,
+    handle_country_menu_callback,
+    handle_country_selection_callback,
+    handle_enhanced_menu_callback,
+    handle_enhanced_toggle_callback,
+    handle_interval_custom_callback,
+    handle_interval_menu_callback,
+    handle_interval_preset_callback,
+    handle_ipinfo_callback,
+    handle_ipinfo_token_input,
+    handle_time_custom_callback,
+    handle_time_menu_callback,
+    handle_time_preset_callback,
+    handle_time_to_active_input,
     set_panel_domain,
     get_domain,
     get_username,
@@ -108,6 +144,7 @@ from telegram_bot.handlers.reports import (
     connection_report_command,
     node_usage_report_command,
     multi_device_users_command,
+    handle_multi_device_page_callback,
     users_by_node_command,
     users_by_protocol_command,
     ip_history_12h_command,
@@ -117,6 +154,7 @@ from telegram_bot.handlers.backup import (
     send_backup,
     restore_config,
     restore_config_handler,
+    handle_restore_callback,
 )
 from telegram_bot.handlers.punishment import (
     punishment_status,
@@ -144,7 +182,10 @@ from telegram_bot.handlers.admin_filter import (
 )
 
 # Import utilities
-from telegram_bot.utils import check_admin, add_admin_to_config
+from telegram_bot.utils import add_admin_to_config, escape_html, get_admin_set
+from telegram_bot.send_message import edit_query_message
+from utils.http_client import close_http_client
+from utils.isp_detector import close_http_session
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -159,24 +200,44 @@ try:
 except Exception as e:
     print(f"⚠ Error loading config at module import: {e}")
 
-# Create application
-if bot_token:
-    application = ApplicationBuilder().token(bot_token).build()
-else:
+# Create application; every message is HTML unless a call says otherwise.
+# Updates stay sequential: ConversationHandler and the waiting_for flows
+# rely on one update per user being handled at a time. Slow read-only
+# commands opt out individually with block=False.
+_DEFAULTS = Defaults(parse_mode=ParseMode.HTML)
+
+
+async def _close_shared_clients(_application):
+    """Close the shared HTTP clients the bot's panel and report calls use."""
+    await close_http_client()
+    await close_http_session()
+
+
+application = (
+    ApplicationBuilder()
     # Dummy token for module loading - replaced at runtime
-    application = ApplicationBuilder().token("0000000000:XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX").build()
+    .token(bot_token or "0000000000:XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX")
+    .defaults(_DEFAULTS)
+    .post_shutdown(_close_shared_clients)
+    .build()
+)
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # CORE COMMAND HANDLERS
 # ═══════════════════════════════════════════════════════════════════════════════
 
+# Keyboard markups are immutable, so static ones are built once and shared
+_BACK_MAIN_KEYBOARD = create_back_to_main_keyboard()
+_MAIN_MENU_KEYBOARD = create_main_menu_keyboard()
+
+
 async def start(update: Update, _context: ContextTypes.DEFAULT_TYPE):
     """Handle the /start command."""
-    admins = await check_admin()
+    admins = await get_admin_set()
     if not admins:
         await add_admin_to_config(update.effective_chat.id)
-    admins = await check_admin()
+        admins = await get_admin_set()
     
     if update.effective_chat.id not in admins:
         await update.message.reply_html(
@@ -186,7 +247,7 @@ async def start(update: Update, _context: ContextTypes.DEFAULT_TYPE):
     
     await update.message.reply_html(
         text=START_MESSAGE,
-        reply_markup=create_main_menu_keyboard()
+        reply_markup=_MAIN_MENU_KEYBOARD
     )
 
 
@@ -195,12 +256,12 @@ async def help_command(update: Update, _context: ContextTypes.DEFAULT_TYPE):
     check = await check_admin_privilege(update)
     if check is not None:
         return check
-    await update.message.reply_html(text=HELP_TEXT)
+    await update.message.reply_html(text=HELP_TEXT, reply_markup=_BACK_MAIN_KEYBOARD)
 
 
 async def send_logs(msg):
     """Send log messages to all admins."""
-    admins = await check_admin()
+    admins = await get_admin_set()
     for admin in admins:
         try:
             await application.bot.send_message(chat_id=admin, text=msg)
@@ -212,6 +273,102 @@ async def send_logs(msg):
 # CALLBACK QUERY HANDLER
 # ═══════════════════════════════════════════════════════════════════════════════
 
+async def _show_disabled_page(query, _context: ContextTypes.DEFAULT_TYPE, page: str):
+    """Show the requested page of the disabled users list."""
+    await show_disabled_users_menu(query, page=int(page))
+
+
+_SETTINGS_PAGE = (
+    "⚙️ <b>Settings Menu</b>\n\nConfigure your bot settings:",
+    create_settings_menu_keyboard(),
+)
+_LIMITS_PAGE = (
+    "🎯 <b>Limits Menu</b>\n\nManage user connection limits:",
+    create_limits_menu_keyboard(),
+)
+
+# Static menu pages: callback data -> (text, keyboard), built once at import
+_MENU_PAGES = {
+    CallbackData.MAIN_MENU: (START_MESSAGE, _MAIN_MENU_KEYBOARD),
+    CallbackData.BACK_MAIN: (START_MESSAGE, _MAIN_MENU_KEYBOARD),
+    CallbackData.SETTINGS_MENU: _SETTINGS_PAGE,
+    CallbackData.BACK_SETTINGS: _SETTINGS_PAGE,
+    CallbackData.LIMITS_MENU: _LIMITS_PAGE,
+    CallbackData.BACK_LIMITS: _LIMITS_PAGE,
+    CallbackData.USERS_MENU: (
+        "👥 <b>Users Menu</b>\n\nManage users and view disabled accounts:",
+        create_users_menu_keyboard(),
+    ),
+    CallbackData.MONITORING_MENU: (
+        "📡 <b>Monitoring Menu</b>\n\nView user monitoring status:",
+        create_monitoring_menu_keyboard(),
+    ),
+    CallbackData.REPORTS_MENU: (
+        "📊 <b>Reports Menu</b>\n\nGenerate usage reports:",
+        create_reports_menu_keyboard(),
+    ),
+    CallbackData.ADMIN_MENU: (
+        "👑 <b>Admin Menu</b>\n\nManage bot administrators:",
+        create_admin_menu_keyboard(),
+    ),
+}
+
+# Exact-match actions: callback data -> handler(query, context)
+_EXACT_CALLBACKS = {
+    # Limits
+    CallbackData.SHOW_SPECIAL_LIMIT: handle_show_special_limit_callback,
+    CallbackData.GENERAL_LIMIT_2: partial(handle_general_limit_preset_callback, limit=2),
+    CallbackData.GENERAL_LIMIT_3: partial(handle_general_limit_preset_callback, limit=3),
+    CallbackData.GENERAL_LIMIT_4: partial(handle_general_limit_preset_callback, limit=4),
+    # Prompts answered through text_message_handler (_WAITING_HANDLERS)
+    CallbackData.SET_SPECIAL_LIMIT: handle_set_special_limit_callback,
+    CallbackData.SPECIAL_LIMIT_1: handle_special_limit_1_callback,
+    CallbackData.SPECIAL_LIMIT_2: handle_special_limit_2_callback,
+    CallbackData.SPECIAL_LIMIT_CUSTOM: handle_special_limit_custom_callback,
+    CallbackData.GENERAL_LIMIT_CUSTOM: handle_general_limit_custom_callback,
+    CallbackData.SET_EXCEPT_USER: handle_set_except_user_callback,
+    CallbackData.REMOVE_EXCEPT_USER: handle_remove_except_user_callback,
+    CallbackData.INTERVAL_CUSTOM: handle_interval_custom_callback,
+    CallbackData.TIME_CUSTOM: handle_time_custom_callback,
+    CallbackData.SET_IPINFO: handle_ipinfo_callback,
+    # Settings sub-menus and their presets
+    CallbackData.COUNTRY_MENU: handle_country_menu_callback,
+    CallbackData.COUNTRY_IR: partial(handle_country_selection_callback, country_code="IR"),
+    CallbackData.COUNTRY_RU: partial(handle_country_selection_callback, country_code="RU"),
+    CallbackData.COUNTRY_CN: partial(handle_country_selection_callback, country_code="CN"),
+    CallbackData.COUNTRY_NONE: partial(handle_country_selection_callback, country_code="None"),
+    CallbackData.INTERVAL_MENU: handle_interval_menu_callback,
+    CallbackData.INTERVAL_120: partial(handle_interval_preset_callback, interval=120),
+    CallbackData.INTERVAL_180: partial(handle_interval_preset_callback, interval=180),
+    CallbackData.INTERVAL_240: partial(handle_interval_preset_callback, interval=240),
+    CallbackData.TIME_MENU: handle_time_menu_callback,
+    CallbackData.TIME_300: partial(handle_time_preset_callback, time_val=300),
+    CallbackData.TIME_600: partial(handle_time_preset_callback, time_val=600),
+    CallbackData.TIME_900: partial(handle_time_preset_callback, time_val=900),
+    CallbackData.ENHANCED_MENU: handle_enhanced_menu_callback,
+    CallbackData.ENHANCED_ON: partial(handle_enhanced_toggle_callback, enable=True),
+    CallbackData.ENHANCED_OFF: partial(handle_enhanced_toggle_callback, enable=False),
+    # Users
+    CallbackData.SHOW_EXCEPT_USERS: handle_show_except_users_callback,
+    CallbackData.SHOW_DISABLED_USERS: handle_show_disabled_users_callback,
+    CallbackData.ENABLE_ALL_DISABLED: handle_enable_all_disabled_callback,
+    CallbackData.CLEANUP_DELETED_USERS: handle_cleanup_deleted_users_callback,
+    # Backup
+    CallbackData.RESTORE: handle_restore_callback,
+}
+
+# Dynamic "<prefix>:<arg>" actions: prefix -> handler(query, context, arg)
+_PREFIX_CALLBACKS = {
+    "enable_user": handle_enable_user_callback,
+    "disabled_page": _show_disabled_page,
+    "user_info": handle_user_info_callback,
+    "multi_device_page": handle_multi_device_page_callback,
+    # Buttons on per-user limit reports (send_message.send_user_message)
+    "set_limit": handle_set_limit_callback,
+    "add_except": handle_add_except_callback,
+}
+
+
 async def callback_query_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle all callback queries from inline keyboards."""
     query = update.callback_query
@@ -220,105 +377,44 @@ async def callback_query_handler(update: Update, context: ContextTypes.DEFAULT_T
     data = query.data
     
     # Admin check
-    admins = await check_admin()
+    admins = await get_admin_set()
     if update.effective_chat.id not in admins:
-        await query.edit_message_text(
+        await edit_query_message(
+            query,
             text="Sorry, you do not have permission to use this bot."
         )
         return
     
-    # Main menu
-    if data in [CallbackData.MAIN_MENU, CallbackData.BACK_MAIN]:
-        await query.edit_message_text(
-            text=START_MESSAGE,
-            reply_markup=create_main_menu_keyboard(),
-            parse_mode="HTML"
-        )
-        return
-    
-    # Settings menu
-    if data == CallbackData.SETTINGS_MENU:
-        await query.edit_message_text(
-            text="⚙️ <b>Settings Menu</b>\n\nConfigure your bot settings:",
-            reply_markup=create_settings_menu_keyboard(),
-            parse_mode="HTML"
-        )
-        return
-    
-    # Limits menu
-    if data == CallbackData.LIMITS_MENU:
-        await query.edit_message_text(
-            text="🎯 <b>Limits Menu</b>\n\nManage user connection limits:",
-            reply_markup=create_limits_menu_keyboard(),
-            parse_mode="HTML"
-        )
-        return
-    
-    # Users menu
-    if data == CallbackData.USERS_MENU:
-        await query.edit_message_text(
-            text="👥 <b>Users Menu</b>\n\nManage users and view disabled accounts:",
-            reply_markup=create_users_menu_keyboard(),
-            parse_mode="HTML"
-        )
-        return
-    
-    # Monitoring menu
-    if data == CallbackData.MONITORING_MENU:
-        await query.edit_message_text(
-            text="📡 <b>Monitoring Menu</b>\n\nView user monitoring status:",
-            reply_markup=create_monitoring_menu_keyboard(),
-            parse_mode="HTML"
+    # Static menu pages
+    page = _MENU_PAGES.get(data)
+    if page is not None:
+        text, keyboard = page
+        await edit_query_message(
+            query,
+            text=text,
+            reply_markup=keyboard
         )
         return
     
-    # Reports menu
-    if data == CallbackData.REPORTS_MENU:
-        await query.edit_message_text(
-            text="📊 <b>Reports Menu</b>\n\nGenerate usage reports:",
-            reply_markup=create_reports_menu_keyboard(),
-            parse_mode="HTML"
-        )
-        return
-    
-    # Admin menu
-    if data == CallbackData.ADMIN_MENU:
-        await query.edit_message_text(
-            text="👑 <b>Admin Menu</b>\n\nManage bot administrators:",
-            reply_markup=create_admin_menu_keyboard(),
-            parse_mode="HTML"
-        )
+    # Exact-match actions
+    handler = _EXACT_CALLBACKS.get(data)
+    if handler is not None:
+        await handler(query, context)
         return
     
-    # Disabled users
-    if data == CallbackData.SHOW_DISABLED_USERS:
-        await show_disabled_users_menu(query)
-        return
-    
-    if data == CallbackData.ENABLE_ALL_DISABLED:
-        await enable_all_disabled_users(query)
-        return
-    
-    if data == CallbackData.CLEANUP_DELETED_USERS:
-        await cleanup_deleted_users_handler(query)
-        return
-    
-    # Handle dynamic callbacks
-    if data.startswith("enable_user:"):
-        username = data.split(":", 1)[1]
-        await enable_single_user(query, username)
-        return
-    
-    if data.startswith("disabled_page:"):
-        page = int(data.split(":", 1)[1])
-        await show_disabled_users_menu(query, page=page)
+    # Handle dynamic "<prefix>:<arg>" callbacks: one partition plus one dict
+    # lookup, however many prefixes are registered
+    prefix, sep, arg = data.partition(":")
+    handler = _PREFIX_CALLBACKS.get(prefix) if sep else None
+    if handler is not None:
+        await handler(query, context, arg)
         return
     
     # Fallback for unhandled callbacks
-    await query.edit_message_text(
-        text=f"⚠️ Unhandled callback: {data}",
-        reply_markup=create_back_to_main_keyboard(),
-        parse_mode="HTML"
+    await edit_query_message(
+        query,
+        text=f"⚠️ Unhandled callback: {escape_html(data)}",
+        reply_markup=_BACK_MAIN_KEYBOARD
     )
 
 
@@ -326,6 +422,21 @@ async def callback_query_handler(update: Update, context: ContextTypes.DEFAULT_T
 # TEXT MESSAGE HANDLER
 # ═══════════════════════════════════════════════════════════════════════════════
 
+# Text input handlers: waiting_for state -> handler(update, context)
+# Each handler returns its reply text, or (text, keyboard) when the reply
+# needs something other than the back-to-main keyboard
+_WAITING_HANDLERS = {
+    "special_limit_username": handle_special_limit_username_input,
+    "special_limit_number": handle_special_limit_number_input,
+    "general_limit": handle_general_limit_input,
+    "except_user": handle_except_user_input,
+    "remove_except_user": handle_remove_except_user_input,
+    "check_interval": handle_check_interval_input,
+    "time_to_active": handle_time_to_active_input,
+    "ipinfo_token": handle_ipinfo_token_input,
+}
+
+
 async def text_message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle text messages for inline keyboard flows."""
     waiting_for = context.user_data.get("waiting_for")
@@ -333,10 +444,23 @@ async def text_message_handler(update: Update, context: ContextTypes.DEFAULT_TYP
     if not waiting_for:
         return
     
-    # Handle different input types based on waiting_for state
-    # This will be extended by handler modules as needed
-    
+    # Each prompt takes one answer; cleared before dispatch so a handler
+    # can still ask for a follow-up by setting a new state
     context.user_data["waiting_for"] = None
+    
+    handler = _WAITING_HANDLERS.get(waiting_for)
+    if handler is None:
+        return
+    
+    if update.effective_chat.id not in await get_admin_set():
+        return
+    
+    reply = await handler(update, context)
+    if isinstance(reply, tuple):
+        text, keyboard = reply
+    else:
+        text, keyboard = reply, _BACK_MAIN_KEYBOARD
+    await update.message.reply_html(text, reply_markup=keyboard)
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -345,139 +469,119 @@ async def text_message_handler(update: Update, context: ContextTypes.DEFAULT_TYP
 
 async def document_message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle document uploads (for restore)."""
-    waiting_for = context.user_data.get("waiting_for")
+    if context.user_data.get("waiting_for") != "restore":
+        return
     
-    if waiting_for == "restore":
-        await restore_config_handler(update, context)
+    # Only uploads that answer a restore prompt pay for the admin lookup
+    if update.effective_chat.id not in await get_admin_set():
         return
+    
+    await restore_config_handler(update, context)
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # HANDLER REGISTRATION
 # ═══════════════════════════════════════════════════════════════════════════════
 
-# Core commands
-application.add_handler(CommandHandler("start", start))
-application.add_handler(CommandHandler("help", help_command))
-
-# Callback and message handlers
-application.add_handler(CallbackQueryHandler(callback_query_handler))
-application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, text_message_handler))
-application.add_handler(MessageHandler(filters.Document.ALL, document_message_handler))
-
-# Admin management
-application.add_handler(
-    ConversationHandler(
-        entry_points=[CommandHandler("add_admin", add_admin)],
-        states={GET_CHAT_ID: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_chat_id)]},
-        fallbacks=[],
-    )
-)
-application.add_handler(
-    ConversationHandler(
-        entry_points=[CommandHandler("remove_admin", remove_admin)],
-        states={GET_CHAT_ID_TO_REMOVE: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_chat_id_to_remove)]},
-        fallbacks=[],
-    )
-)
-application.add_handler(CommandHandler("admins_list", admins_list))
-
-# Config management
-application.add_handler(
-    ConversationHandler(
-        entry_points=[CommandHandler("create_config", set_panel_domain)],
-        states={
-            GET_DOMAIN: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_domain)],
-            GET_USERNAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_username)],
-            GET_PASSWORD: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_password)],
-        },
-        fallbacks=[],
-    )
+# Plain commands: command name -> handler
+_COMMANDS = (
+    # Core
+    ("start", start),
+    ("help", help_command),
+    # Admin management
+    ("admins_list", admins_list),
+    # Limits and users
+    ("show_special_limit", show_special_limit_function),
+    ("show_except_users", show_except_users),
+    # Monitoring
+    ("clear_monitoring", clear_monitoring),
+    # Backup
+    ("backup", send_backup),
+    # Punishment system
+    ("punishment_status", punishment_status),
+    ("punishment_toggle", punishment_toggle),
+    ("punishment_set_window", punishment_set_window),
+    ("punishment_set_steps", punishment_set_steps),
+    ("user_violations", user_violations),
+    ("clear_user_violations", clear_user_violations),
+    # Group filter
+    ("group_filter_status", group_filter_status),
+    ("group_filter_toggle", group_filter_toggle),
+    ("group_filter_mode", group_filter_mode),
+    ("group_filter_set", group_filter_set),
+    ("group_filter_add", group_filter_add),
+    ("group_filter_remove", group_filter_remove),
+    # Admin filter
+    ("admin_filter_status", admin_filter_status),
+    ("admin_filter_toggle", admin_filter_toggle),
+    ("admin_filter_mode", admin_filter_mode),
+    ("admin_filter_set", admin_filter_set),
+    ("admin_filter_add", admin_filter_add),
+    ("admin_filter_remove", admin_filter_remove),
 )
 
-# Limits management
-application.add_handler(
-    ConversationHandler(
-        entry_points=[CommandHandler("set_special_limit", set_special_limit)],
-        states={
-            GET_SPECIAL_LIMIT: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_special_limit)],
-            GET_LIMIT_NUMBER: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_limit_number)],
-        },
-        fallbacks=[],
-    )
-)
-application.add_handler(CommandHandler("show_special_limit", show_special_limit_function))
-application.add_handler(
-    ConversationHandler(
-        entry_points=[CommandHandler("set_general_limit_number", get_general_limit_number)],
-        states={GET_GENERAL_LIMIT_NUMBER: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_general_limit_number_handler)]},
-        fallbacks=[],
-    )
+# Monitoring and reports are read-only and can be slow, so they run
+# without blocking the processing of other updates
+_NON_BLOCKING_COMMANDS = (
+    ("monitoring_status", monitoring_status),
+    ("monitoring_details", monitoring_details),
+    ("connection_report", connection_report_command),
+    ("node_usage", node_usage_report_command),
+    ("multi_device_users", multi_device_users_command),
+    ("users_by_node", users_by_node_command),
+    ("users_by_protocol", users_by_protocol_command),
+    ("ip_history_12h", ip_history_12h_command),
+    ("ip_history_48h", ip_history_48h_command),
 )
 
-# User management
-application.add_handler(
-    ConversationHandler(
-        entry_points=[CommandHandler("set_except_user", set_except_users)],
-        states={SET_EXCEPT_USERS: [MessageHandler(filters.TEXT & ~filters.COMMAND, set_except_users_handler)]},
-        fallbacks=[],
-    )
+for name, callback in _COMMANDS:
+    application.add_handler(CommandHandler(name, callback))
+for name, callback in _NON_BLOCKING_COMMANDS:
+    application.add_handler(CommandHandler(name, callback, block=False))
+
+# Text-input conversations: entry command -> entry handler, then each state's
+# text step in order
+_TEXT_INPUT = filters.TEXT & ~filters.COMMAND
+_CONVERSATIONS = (
+    # Admin management
+    ("add_admin", add_admin, ((GET_CHAT_ID, get_chat_id),)),
+    ("remove_admin", remove_admin, ((GET_CHAT_ID_TO_REMOVE, get_chat_id_to_remove),)),
+    # Config management
+    ("create_config", set_panel_domain, (
+        (GET_DOMAIN, get_domain),
+        (GET_USERNAME, get_username),
+        (GET_PASSWORD, get_password),
+    )),
+    # Limits management
+    ("set_special_limit", set_special_limit, (
+        (GET_SPECIAL_LIMIT, get_special_limit),
+        (GET_LIMIT_NUMBER, get_limit_number),
+    )),
+    ("set_general_limit_number", get_general_limit_number, (
+        (GET_GENERAL_LIMIT_NUMBER, get_general_limit_number_handler),
+    )),
+    # User management
+    ("set_except_user", set_except_users, ((SET_EXCEPT_USERS, set_except_users_handler),)),
+    ("remove_except_user", remove_except_user, ((REMOVE_EXCEPT_USER, remove_except_user_handler),)),
+    # Settings
+    ("country_code", set_country_code, ((SET_COUNTRY_CODE, country_code_handler),)),
+    ("set_check_interval", set_check_interval, ((GET_CHECK_INTERVAL, check_interval_handler),)),
+    ("set_time_to_active_users", set_time_to_active, (
+        (GET_TIME_TO_ACTIVE_USERS, time_to_active_handler),
+    )),
+    ("set_ipinfo_token", set_ipinfo_token, ((SET_IPINFO_TOKEN, ipinfo_token_handler),)),
 )
-application.add_handler(
-    ConversationHandler(
-        entry_points=[CommandHandler("remove_except_user", remove_except_user)],
-        states={REMOVE_EXCEPT_USER: [MessageHandler(filters.TEXT & ~filters.COMMAND, remove_except_user_handler)]},
-        fallbacks=[],
-    )
-)
-application.add_handler(CommandHandler("show_except_users", show_except_users))
 
-# Settings
-application.add_handler(
-    ConversationHandler(
-        entry_points=[CommandHandler("country_code", set_country_code)],
-        states={SET_COUNTRY_CODE: [MessageHandler(filters.TEXT & ~filters.COMMAND, country_code_handler)]},
-        fallbacks=[],
-    )
-)
-application.add_handler(
-    ConversationHandler(
-        entry_points=[CommandHandler("set_check_interval", set_check_interval)],
-        states={GET_CHECK_INTERVAL: [MessageHandler(filters.TEXT & ~filters.COMMAND, check_interval_handler)]},
-        fallbacks=[],
-    )
-)
-application.add_handler(
-    ConversationHandler(
-        entry_points=[CommandHandler("set_time_to_active_users", set_time_to_active)],
-        states={GET_TIME_TO_ACTIVE_USERS: [MessageHandler(filters.TEXT & ~filters.COMMAND, time_to_active_handler)]},
-        fallbacks=[],
-    )
-)
-application.add_handler(
-    ConversationHandler(
-        entry_points=[CommandHandler("set_ipinfo_token", set_ipinfo_token)],
-        states={SET_IPINFO_TOKEN: [MessageHandler(filters.TEXT & ~filters.COMMAND, ipinfo_token_handler)]},
-        fallbacks=[],
+for name, entry, steps in _CONVERSATIONS:
+    application.add_handler(
+        ConversationHandler(
+            entry_points=[CommandHandler(name, entry)],
+            states={state: [MessageHandler(_TEXT_INPUT, step)] for state, step in steps},
+            fallbacks=[],
+        )
     )
-)
 
-# Monitoring
-application.add_handler(CommandHandler("monitoring_status", monitoring_status))
-application.add_handler(CommandHandler("monitoring_details", monitoring_details))
-application.add_handler(CommandHandler("clear_monitoring", clear_monitoring))
-
-# Reports
-application.add_handler(CommandHandler("connection_report", connection_report_command))
-application.add_handler(CommandHandler("node_usage", node_usage_report_command))
-application.add_handler(CommandHandler("multi_device_users", multi_device_users_command))
-application.add_handler(CommandHandler("users_by_node", users_by_node_command))
-application.add_handler(CommandHandler("users_by_protocol", users_by_protocol_command))
-application.add_handler(CommandHandler("ip_history_12h", ip_history_12h_command))
-application.add_handler(CommandHandler("ip_history_48h", ip_history_48h_command))
-
-# Backup
-application.add_handler(CommandHandler("backup", send_backup))
+# Backup restore
 application.add_handler(
     ConversationHandler(
         entry_points=[CommandHandler("restore", restore_config)],
@@ -486,26 +590,8 @@ application.add_handler(
     )
 )
 
-# Punishment system
-application.add_handler(CommandHandler("punishment_status", punishment_status))
-application.add_handler(CommandHandler("punishment_toggle", punishment_toggle))
-application.add_handler(CommandHandler("punishment_set_window", punishment_set_window))
-application.add_handler(CommandHandler("punishment_set_steps", punishment_set_steps))
-application.add_handler(CommandHandler("user_violations", user_violations))
-application.add_handler(CommandHandler("clear_user_violations", clear_user_violations))
-
-# Group filter
-application.add_handler(CommandHandler("group_filter_status", group_filter_status))
-application.add_handler(CommandHandler("group_filter_toggle", group_filter_toggle))
-application.add_handler(CommandHandler("group_filter_mode", group_filter_mode))
-application.add_handler(CommandHandler("group_filter_set", group_filter_set))
-application.add_handler(CommandHandler("group_filter_add", group_filter_add))
-application.add_handler(CommandHandler("group_filter_remove", group_filter_remove))
-
-# Admin filter
-application.add_handler(CommandHandler("admin_filter_status", admin_filter_status))
-application.add_handler(CommandHandler("admin_filter_toggle", admin_filter_toggle))
-application.add_handler(CommandHandler("admin_filter_mode", admin_filter_mode))
-application.add_handler(CommandHandler("admin_filter_set", admin_filter_set))
-application.add_handler(CommandHandler("admin_filter_add", admin_filter_add))
-application.add_handler(CommandHandler("admin_filter_remove", admin_filter_remove))
+# Callback and catch-all message handlers go in a later group so they
+# don't shadow the text steps of the conversations above
+application.add_handler(CallbackQueryHandler(callback_query_handler), group=1)
+application.add_handler(MessageHandler(_TEXT_INPUT, text_message_handler), group=1)
+application.add_handler(MessageHandler(filters.Document.ALL, document_message_handler), group=1)
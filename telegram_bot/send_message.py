@@ -2,8 +2,13 @@
 Send logs to telegram bot.
 """
 
+from functools import wraps
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
+
 from utils.logs import get_logger
-from telegram_bot.utils import check_admin
+from telegram_bot.utils import escape_html, get_admin_set
 
 tg_send_logger = get_logger("telegram.send")
 
@@ -24,7 +29,7 @@ async def send_logs(msg, return_message_id=False, reply_markup=None):
     # Import application here to get the updated instance
     from telegram_bot.main import application
     
-    admins = await check_admin()
+    admins = await get_admin_set()
     retries = 2
     first_message_info = None
     
@@ -35,7 +40,7 @@ async def send_logs(msg, return_message_id=False, reply_markup=None):
             for attempt in range(retries):
                 try:
                     sent_message = await application.bot.sendMessage(
-                        chat_id=admin, text=msg, parse_mode="HTML",
+                        chat_id=admin, text=msg,
                         reply_markup=reply_markup
                     )
                     # Store the first successful message info for editing later
@@ -76,8 +81,7 @@ async def edit_message(message_info, new_text):
         await application.bot.edit_message_text(
             chat_id=chat_id,
             message_id=message_id,
-            text=new_text,
-            parse_mode="HTML"
+            text=new_text
         )
         tg_send_logger.debug("✅ Message edited successfully")
         return True
@@ -86,6 +90,97 @@ async def edit_message(message_info, new_text):
         return False
 
 
+async def edit_query_message(query, text, reply_markup=None):
+    """
+    Edit the message behind a callback query.
+    Pressing a button that re-renders the same page makes Telegram reject
+    the edit as "message is not modified"; that is treated as a no-op.
+    
+    Args:
+        query: The CallbackQuery whose message should be edited
+        text: The new message text
+        reply_markup: Optional InlineKeyboardMarkup for buttons
+        
+    Returns:
+        The edited message, or None if the content was unchanged
+    """
+    try:
+        return await query.edit_message_text(text=text, reply_markup=reply_markup)
+    except BadRequest as e:
+        if "message is not modified" not in str(e).lower():
+            raise
+        tg_send_logger.debug("⏭️ Skipped edit with unchanged content")
+        return None
+
+
+def callback_action(back_keyboard, error_text: str = "❌ Error"):
+    """
+    Decorator for inline keyboard handlers that take the query first.
+    Any exception replaces the message with "<error_text>: <error>" and
+    the keyboard from back_keyboard(), so handlers need no try/except.
+    
+    Args:
+        back_keyboard: Keyboard builder for the error message
+        error_text: Prefix for the error message (HTML)
+    """
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(query, *args, **kwargs):
+            try:
+                return await func(query, *args, **kwargs)
+            except Exception as e:  # pylint: disable=broad-except
+                await query.edit_message_text(
+                    text=f"{error_text}: {escape_html(e)}",
+                    reply_markup=back_keyboard()
+                )
+        return wrapper
+    return decorator
+
+
+def _safe_html_cut(text: str, start: int, end: int) -> int:
+    """Move a cut at ``end`` back before any tag or entity it would split."""
+    cut = end
+    lt = text.rfind("<", start, cut)
+    if lt > text.rfind(">", start, cut):
+        cut = lt
+    amp = text.rfind("&", start, cut)
+    if amp > text.rfind(";", start, cut):
+        cut = amp
+    # A single tag or entity longer than the limit can't be kept whole
+    return cut if cut > start else end
+
+
+def split_html(text: str, limit: int = 3500, sep: str = "\n") -> list[str]:
+    """
+    Split a message into chunks of at most ``limit`` characters.
+    Each chunk ends at the last ``sep`` before the limit, so HTML tags that
+    open and close on one line stay intact; the separator itself is dropped.
+    A run with no separator in it is cut near the limit, backing up so the
+    cut never lands inside a tag or an ``&...;`` entity.
+    
+    Args:
+        text: The message text to split
+        limit: Maximum length of each chunk
+        sep: Preferred boundary to cut at
+        
+    Returns:
+        List of chunks, in order
+    """
+    chunks = []
+    start = 0
+    while len(text) - start > limit:
+        cut = text.rfind(sep, start, start + limit)
+        if cut <= start:
+            end = _safe_html_cut(text, start, start + limit)
+            chunks.append(text[start:end])
+            start = end
+        else:
+            chunks.append(text[start:cut])
+            start = cut + len(sep)
+    chunks.append(text[start:])
+    return chunks
+
+
 async def send_disable_notification(msg: str, username: str):
     """
     Send a disable notification with an Enable button.
@@ -94,8 +189,6 @@ async def send_disable_notification(msg: str, username: str):
         msg: The message text to send
         username: The username that was disabled
     """
-    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-    
     tg_send_logger.debug(f"🚫 Sending disable notification for {username}")
     keyboard = [
         [InlineKeyboardButton(f"✅ Enable {username}", callback_data=f"enable_user:{username}")],
@@ -117,11 +210,10 @@ async def send_user_message(msg: str, username: str, device_count: int, has_spec
         has_special_limit: Whether user already has a special limit set
         is_except: Whether user is in except list
     """
-    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
     from telegram_bot.main import application
     
     tg_send_logger.debug(f"📤 Sending user message for {username} (devices: {device_count})")
-    admins = await check_admin()
+    admins = await get_admin_set()
     retries = 2
     
     # Create inline keyboard if user doesn't have special limit and is not except
@@ -142,7 +234,6 @@ async def send_user_message(msg: str, username: str, device_count: int, has_spec
                     await application.bot.sendMessage(
                         chat_id=admin, 
                         text=msg, 
-                        parse_mode="HTML",
                         reply_markup=reply_markup
                     )
                     tg_send_logger.debug(f"✅ User message sent to admin {admin}")
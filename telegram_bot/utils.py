@@ -3,10 +3,16 @@ This module contains utility functions for managing admin IDs,
 handling special limits for users, and interacting with the database.
 """
 
+import asyncio
+import copy
 import json
 import os
 import sys
+import time
+from contextlib import asynccontextmanager
 
+from utils.logs import get_logger
+from utils.read_config import bump_config_version, invalidate_config_cache
 from utils.types import PanelType
 
 try:
@@ -15,6 +21,13 @@ except ImportError:
     print("Module 'httpx' is not installed use: 'pip install httpx' to install it")
     sys.exit()
 
+# orjson is an optional, faster drop-in for config (de)serialization
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Import database utilities
 try:
     from db import get_db, UserLimitCRUD, ExceptUserCRUD, ConfigCRUD
@@ -50,26 +63,169 @@ async def get_token(panel_data: PanelType) -> PanelType | ValueError:
     raise ValueError(message)
 
 
+# Cached admin set, keyed by (ADMIN_IDS, config.json mtime)
+_admin_cache: dict = {"key": None, "admins": frozenset(), "checked_at": 0.0}
+
+# Seconds a validated admin set is trusted before ADMIN_IDS / config.json
+# are looked at again; our own config writes invalidate it immediately
+ADMIN_CACHE_TTL = 30
+
+# Parsed config.json, keyed by its (mtime, size)
+_config_file_cache: dict = {"key": None, "data": None}
+
+# Serializes read-modify-write cycles on the cached config dict
+config_lock = asyncio.Lock()
+
+# Seconds to hold a scheduled config write so rapid changes share one write
+WRITE_COALESCE_DELAY = 0.2
+
+# Latest config dict waiting to be written and the task that will write it
+_pending_write: dict = {"data": None, "task": None}
+
+tg_utils_logger = get_logger("telegram.utils")
+
+# Strong references to fire-and-forget tasks so they are not collected mid-run
+_background_tasks: set[asyncio.Task] = set()
+
+
+def _on_background_done(task: asyncio.Task):
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        tg_utils_logger.error(f"❌ Background task {task.get_name()} failed: {task.exception()}")
+
+
+def run_in_background(coro, name: str) -> asyncio.Task:
+    """
+    Schedules a coroutine without awaiting it, logging any failure.
+
+    Args:
+        coro: The coroutine to run.
+        name: Task name used in the failure log.
+    """
+    task = asyncio.create_task(coro, name=name)
+    _background_tasks.add(task)
+    task.add_done_callback(_on_background_done)
+    return task
+
+
+# Characters Telegram's HTML parse mode treats as markup
+_HTML_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;"})
+
+
+def escape_html(text) -> str:
+    """Escape a user-supplied value for interpolation into an HTML message."""
+    return str(text).translate(_HTML_ESCAPES)
+
+
+def _load_config_file() -> dict:
+    """Parse config.json (runs in a worker thread)."""
+    if ORJSON_AVAILABLE:
+        with open("config.json", "rb") as f:
+            return orjson.loads(f.read())
+    with open("config.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
 async def read_json_file() -> dict:
     """
     Reads and returns the content of the config.json file.
+    The parsed dict is cached until the file's mtime or size changes.
+    Each caller gets its own copy, so edits that are never written (or
+    whose write fails) don't leak into the cache.
 
     Returns:
         The content of the config.json file.
     """
-    with open("config.json", "r", encoding="utf-8") as f:
-        return json.load(f)
+    stat = os.stat("config.json")
+    key = (stat.st_mtime_ns, stat.st_size)
+    if key != _config_file_cache["key"]:
+        _config_file_cache["data"] = await asyncio.to_thread(_load_config_file)
+        _config_file_cache["key"] = key
+    return copy.deepcopy(_config_file_cache["data"])
+
+
+def _replace_file(path: str, payload: bytes):
+    """Write payload to a temp file, fsync it and rename it over path."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
 
 
 async def write_json_file(data: dict):
     """
     Writes the given data to the config.json file.
+    The data is written to a temp file and renamed over config.json,
+    so readers never see a half-written file. The disk I/O runs in a
+    worker thread to keep the event loop responsive.
+
+    Args:
+        data: The data to write to the file.
+    """
+    # Compact output; /backup pretty-prints its copy for humans
+    if ORJSON_AVAILABLE:
+        payload = orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    else:
+        payload = json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    await asyncio.to_thread(_replace_file, "config.json", payload)
+    # Don't rely on mtime alone; coarse timestamps can hide a quick rewrite
+    _admin_cache["key"] = None
+    _config_file_cache["key"] = None
+    # Callers save an edited copy of read_config(); tell version-keyed readers
+    bump_config_version()
+
+
+async def _flush_pending_write():
+    await asyncio.sleep(WRITE_COALESCE_DELAY)
+    async with config_lock:
+        data = _pending_write["data"]
+        _pending_write["data"] = None
+        _pending_write["task"] = None
+        if data is not None:
+            try:
+                await write_json_file(data)
+            except Exception:
+                # Drop cached config so readers reload what is actually stored
+                await invalidate_config_cache()
+                raise
+
+
+def schedule_json_write(data: dict) -> asyncio.Task:
+    """
+    Queues data to be written to config.json shortly.
+    Changes scheduled within WRITE_COALESCE_DELAY of each other are
+    written once with the latest data, so repeated button presses cost
+    a single write. The write takes config_lock, so callers holding it
+    must release it before awaiting the returned task.
 
     Args:
         data: The data to write to the file.
+
+    Returns:
+        The task performing the write; await it to learn whether the
+        data reached disk.
+    """
+    _pending_write["data"] = data
+    if _pending_write["task"] is None:
+        _pending_write["task"] = run_in_background(_flush_pending_write(), "config-write")
+    return _pending_write["task"]
+
+
+@asynccontextmanager
+async def config_tx():
     """
-    with open("config.json", "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    Read-modify-write transaction on config.json.
+    Yields a copy of the config (an empty dict if the file does not
+    exist yet) under config_lock and writes it once when the block exits
+    without an error, so several edits cost a single read and write.
+    The cache is only refreshed from disk after the write succeeds.
+    """
+    async with config_lock:
+        data = await read_json_file() if os.path.exists("config.json") else {}
+        yield data
+        await write_json_file(data)
 
 
 async def add_admin_to_config(new_admin_id: int) -> int | None:
@@ -140,6 +296,31 @@ async def check_admin() -> list[int] | None:
     return []
 
 
+async def get_admin_set() -> frozenset[int]:
+    """
+    Returns the admin IDs as a frozenset for O(1) membership tests.
+    The set is cached and only rebuilt when ADMIN_IDS or the mtime of
+    config.json changes; those are re-checked at most every
+    ADMIN_CACHE_TTL seconds. Use check_admin() when the ordered list is needed.
+
+    Returns:
+        The set of admin IDs.
+    """
+    now = time.monotonic()
+    if _admin_cache["key"] is not None and now - _admin_cache["checked_at"] < ADMIN_CACHE_TTL:
+        return _admin_cache["admins"]
+    try:
+        mtime = os.stat("config.json").st_mtime_ns
+    except OSError:
+        mtime = None
+    key = (os.environ.get("ADMIN_IDS", ""), mtime)
+    if key != _admin_cache["key"]:
+        _admin_cache["admins"] = frozenset(await check_admin() or ())
+        _admin_cache["key"] = key
+    _admin_cache["checked_at"] = now
+    return _admin_cache["admins"]
+
+
 async def handel_special_limit(username: str, limit: int) -> list:
     """
     Handles the special limit for a given username using database.
@@ -164,21 +345,11 @@ async def handel_special_limit(username: str, limit: int) -> list:
             return [set_before, limit]
     
     # Fallback to config.json
-    set_before = 0
-    if os.path.exists("config.json"):
-        data = await read_json_file()
-        if "limits" not in data:
-            data["limits"] = {}
-        special_limit = data.get("limits", {}).get("special", {})
-        if special_limit.get(username):
-            set_before = 1
+    async with config_tx() as data:
+        special_limit = data.setdefault("limits", {}).setdefault("special", {})
+        set_before = 1 if special_limit.get(username) else 0
         special_limit[username] = limit
-        data["limits"]["special"] = special_limit
-        await write_json_file(data)
-        return [set_before, special_limit[username]]
-    data = {"limits": {"special": {username: limit}}}
-    await write_json_file(data)
-    return [0, limit]
+    return [set_before, limit]
 
 
 async def remove_admin_from_config(admin_id: int) -> bool:
@@ -283,14 +454,8 @@ async def write_country_code_json(country_code: str) -> None:
             return
     
     # Fallback to config.json
-    if os.path.exists("config.json"):
-        data = await read_json_file()
-    else:
-        data = {}
-    if "monitoring" not in data:
-        data["monitoring"] = {}
-    data["monitoring"]["ip_location"] = country_code
-    await write_json_file(data)
+    async with config_tx() as data:
+        data.setdefault("monitoring", {})["ip_location"] = country_code
 
 
 async def add_except_user(except_user: str) -> str | None:
@@ -332,7 +497,7 @@ async def show_except_users_handler() -> list | None:
             except_users = await ExceptUserCRUD.get_all(db)
             if not except_users:
                 return None
-            except_users_str = "\n".join([f"{user}" for user in except_users])
+            except_users_str = "\n".join([escape_html(user) for user in except_users])
             messages = except_users_str.split("\n")
             shorter_messages = [
                 "\n".join(messages[i : i + 100]) for i in range(0, len(messages), 100)
@@ -345,7 +510,7 @@ async def show_except_users_handler() -> list | None:
         except_users = data.get("limits", {}).get("except_users", None)
         if not except_users:
             return None
-        except_users = "\n".join([f"{key}" for key in except_users])
+        except_users = "\n".join([escape_html(key) for key in except_users])
         messages = except_users.split("\n")
         shorter_messages = [
             "\n".join(messages[i : i + 100]) for i in range(0, len(messages), 100)
@@ -389,15 +554,8 @@ async def save_general_limit(limit: int) -> int:
             return limit
     
     # Fallback to config.json
-    if os.path.exists("config.json"):
-        data = await read_json_file()
-        if "limits" not in data:
-            data["limits"] = {}
-        data["limits"]["general"] = limit
-        await write_json_file(data)
-        return limit
-    data = {"limits": {"general": limit}}
-    await write_json_file(data)
+    async with config_tx() as data:
+        data.setdefault("limits", {})["general"] = limit
     return limit
 
 
@@ -413,15 +571,8 @@ async def save_check_interval(interval: int) -> int:
             return interval
     
     # Fallback to config.json
-    if os.path.exists("config.json"):
-        data = await read_json_file()
-        if "monitoring" not in data:
-            data["monitoring"] = {}
-        data["monitoring"]["check_interval"] = interval
-        await write_json_file(data)
-        return interval
-    data = {"monitoring": {"check_interval": interval}}
-    await write_json_file(data)
+    async with config_tx() as data:
+        data.setdefault("monitoring", {})["check_interval"] = interval
     return interval
 
 
@@ -437,13 +588,6 @@ async def save_time_to_active_users(time_val: int) -> int:
             return time_val
     
     # Fallback to config.json
-    if os.path.exists("config.json"):
-        data = await read_json_file()
-        if "monitoring" not in data:
-            data["monitoring"] = {}
-        data["monitoring"]["time_to_active_users"] = time_val
-        await write_json_file(data)
-        return time_val
-    data = {"monitoring": {"time_to_active_users": time_val}}
-    await write_json_file(data)
+    async with config_tx() as data:
+        data.setdefault("monitoring", {})["time_to_active_users"] = time_val
     return time_val
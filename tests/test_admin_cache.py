@@ -0,0 +1,54 @@
+"""
+Tests for the cached admin set in telegram_bot/utils.py
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from telegram_bot import utils as tg_utils
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(tmp_path, monkeypatch):
+    """Fresh admin cache, a controllable clock and a temp working dir."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("ADMIN_IDS", raising=False)
+    monkeypatch.setitem(tg_utils._admin_cache, "key", None)
+    monkeypatch.setitem(tg_utils._admin_cache, "admins", frozenset())
+    monkeypatch.setitem(tg_utils._admin_cache, "checked_at", 0.0)
+    monkeypatch.setitem(tg_utils._config_file_cache, "key", None)
+    monkeypatch.setitem(tg_utils._config_file_cache, "data", None)
+    fake = FakeClock()
+    monkeypatch.setattr(tg_utils.time, "monotonic", fake)
+    return fake
+
+
+def test_admin_set_is_trusted_until_ttl(clock, monkeypatch):
+    monkeypatch.setenv("ADMIN_IDS", "1,2")
+    assert asyncio.run(tg_utils.get_admin_set()) == {1, 2}
+
+    monkeypatch.setenv("ADMIN_IDS", "3")
+    clock.now += tg_utils.ADMIN_CACHE_TTL - 1
+    assert asyncio.run(tg_utils.get_admin_set()) == {1, 2}
+
+    clock.now += 2
+    assert asyncio.run(tg_utils.get_admin_set()) == {3}
+
+
+def test_config_write_invalidates_admin_set(clock, tmp_path):
+    (tmp_path / "config.json").write_text(json.dumps({"telegram": {"admins": [5]}}))
+    assert asyncio.run(tg_utils.get_admin_set()) == {5}
+
+    asyncio.run(tg_utils.write_json_file({"telegram": {"admins": [6]}}))
+    # Our own writes take effect without waiting for the TTL
+    assert asyncio.run(tg_utils.get_admin_set()) == {6}
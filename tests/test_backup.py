@@ -0,0 +1,62 @@
+"""
+Tests for restoring backup zips in telegram_bot/handlers/backup.py
+"""
+
+import io
+import os
+import zipfile
+
+import pytest
+
+from telegram_bot.handlers import backup
+
+
+@pytest.fixture
+def restore_dir(tmp_path, monkeypatch):
+    """Restore into a temp dir, never into the system install paths."""
+    monkeypatch.chdir(tmp_path)
+    real_exists = os.path.exists
+
+    def local_exists(path):
+        if str(path).startswith(("/etc/opt/pg-limiter", "/var/lib/pg-limiter")):
+            return False
+        return real_exists(path)
+
+    monkeypatch.setattr(backup.os.path, "exists", local_exists)
+    return tmp_path
+
+
+def _zip(members: dict) -> io.BytesIO:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zipf:
+        for name, data in members.items():
+            zipf.writestr(name, data)
+    buffer.seek(0)
+    return buffer
+
+
+def test_restores_top_level_data_and_legacy_files(restore_dir):
+    env_restored = backup._restore_backup_zip(_zip({
+        "data/pg_limiter.db": b"db",
+        "legacy/.disable_users.json": b"{}",
+    }))
+    assert env_restored is False
+    assert (restore_dir / "data" / "pg_limiter.db").read_bytes() == b"db"
+    assert (restore_dir / ".disable_users.json").read_bytes() == b"{}"
+
+
+def test_restores_env_file(restore_dir):
+    assert backup._restore_backup_zip(_zip({"config/.env": b"A=1"})) is True
+    assert (restore_dir / ".env").read_bytes() == b"A=1"
+
+
+def test_skips_nested_unknown_and_traversal_members(restore_dir):
+    backup._restore_backup_zip(_zip({
+        "data/sub/nested.db": b"x",
+        "data/../escaped": b"x",
+        "legacy/..": b"x",
+        "other/file.json": b"x",
+        "/abs/file": b"x",
+        "toplevel.json": b"x",
+    }))
+    assert sorted(os.listdir(restore_dir)) == []
@@ -0,0 +1,163 @@
+"""
+Tests for the prefixed report button callbacks dispatched by telegram_bot/main.py
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from telegram_bot import main
+from telegram_bot.constants import CallbackData
+from telegram_bot.handlers import limits, settings, users
+
+ADMIN_ID = 42
+
+
+class FakeMessage:
+    def __init__(self):
+        self.replies = []
+
+    async def reply_html(self, text=None, **_kwargs):
+        self.replies.append(text)
+
+
+class FakeQuery:
+    def __init__(self, data):
+        self.data = data
+        self.message = FakeMessage()
+        self.markup_removed = False
+        self.edited_text = None
+
+    async def answer(self):
+        pass
+
+    async def edit_message_reply_markup(self, reply_markup=None):
+        self.markup_removed = reply_markup is None
+
+    async def edit_message_text(self, text=None, reply_markup=None):
+        self.edited_text = text
+
+
+@pytest.fixture(autouse=True)
+def admin_chat(monkeypatch):
+    async def admins():
+        return frozenset({ADMIN_ID})
+
+    monkeypatch.setattr(main, "get_admin_set", admins)
+
+
+def _press(data, context=None):
+    query = FakeQuery(data)
+    update = SimpleNamespace(callback_query=query, effective_chat=SimpleNamespace(id=ADMIN_ID))
+    context = context or SimpleNamespace(user_data={})
+    asyncio.run(main.callback_query_handler(update, context))
+    return query
+
+
+def _send_text(text, context):
+    message = FakeMessage()
+    message.text = text
+    update = SimpleNamespace(message=message, effective_chat=SimpleNamespace(id=ADMIN_ID))
+    asyncio.run(main.text_message_handler(update, context))
+    return message
+
+
+def test_set_limit_keeps_colons_in_username(monkeypatch):
+    calls = []
+
+    async def fake_special_limit(username, limit):
+        calls.append((username, limit))
+        return [False, limit]
+
+    monkeypatch.setattr(limits, "handel_special_limit", fake_special_limit)
+    query = _press("set_limit:user:with:colons:3")
+    assert calls == [("user:with:colons", 3)]
+    assert query.markup_removed
+    assert "user:with:colons" in query.message.replies[0]
+
+
+def test_set_limit_with_bad_limit_reports_error(monkeypatch):
+    async def fake_special_limit(username, limit):
+        raise AssertionError("must not be called")
+
+    monkeypatch.setattr(limits, "handel_special_limit", fake_special_limit)
+    query = _press("set_limit:alice:many")
+    assert query.edited_text.startswith("❌ Error setting limit")
+    assert not query.markup_removed
+
+
+def test_add_except_reports_already_excepted_user(monkeypatch):
+    async def fake_add_except(_username):
+        return None
+
+    monkeypatch.setattr(users, "add_except_user", fake_add_except)
+    query = _press("add_except:alice")
+    assert not query.markup_removed
+    assert "already in the except list" in query.message.replies[0]
+
+
+def test_add_except_drops_buttons_once_added(monkeypatch):
+    async def fake_add_except(username):
+        return username
+
+    monkeypatch.setattr(users, "add_except_user", fake_add_except)
+    query = _press("add_except:alice")
+    assert query.markup_removed
+    assert "added successfully" in query.message.replies[0]
+
+
+def test_every_waiting_state_has_a_routed_prompt():
+    prompts = (
+        "set_special_limit", "special_limit_custom", "general_limit_custom",
+        "set_except_user", "remove_except_user", "interval_custom",
+        "time_custom", "set_ipinfo",
+    )
+    reached = set()
+    for data in prompts:
+        context = SimpleNamespace(user_data={})
+        _press(data, context)
+        reached.add(context.user_data.get("waiting_for"))
+    assert reached == set(main._WAITING_HANDLERS)
+
+
+def test_except_user_prompt_feeds_text_handler(monkeypatch):
+    added = []
+
+    async def fake_add_except(username):
+        added.append(username)
+        return username
+
+    monkeypatch.setattr(users, "add_except_user", fake_add_except)
+    context = SimpleNamespace(user_data={})
+    query = _press("set_except_user", context)
+    assert "Add Except User" in query.edited_text
+    message = _send_text("bob", context)
+    assert added == ["bob"]
+    assert "added successfully" in message.replies[0]
+    assert context.user_data["waiting_for"] is None
+
+
+def test_settings_menu_buttons_open_their_menus():
+    menu_buttons = [
+        button.callback_data
+        for row in main._SETTINGS_PAGE[1].inline_keyboard
+        for button in row
+    ]
+    for data in (CallbackData.COUNTRY_MENU, CallbackData.INTERVAL_MENU, CallbackData.TIME_MENU):
+        assert data in menu_buttons
+        query = _press(data)
+        assert query.edited_text is not None
+        assert "Unhandled callback" not in query.edited_text
+
+
+def test_country_none_clears_the_country_filter(monkeypatch):
+    saved = []
+
+    async def fake_write_country(code):
+        saved.append(code)
+
+    monkeypatch.setattr(settings, "write_country_code_json", fake_write_country)
+    query = _press(CallbackData.COUNTRY_NONE)
+    assert saved == ["None"]
+    assert "Country set to" in query.edited_text
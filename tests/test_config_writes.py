@@ -0,0 +1,112 @@
+"""
+Tests for config_tx and schedule_json_write in telegram_bot/utils.py
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from telegram_bot import utils as tg_utils
+
+
+@pytest.fixture
+def config_dir(tmp_path, monkeypatch):
+    """Run in a temp dir with a small config.json and fresh module state."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "config.json").write_text(json.dumps({"limits": {"general": 2}}))
+    monkeypatch.setattr(tg_utils, "config_lock", asyncio.Lock())
+    monkeypatch.setattr(tg_utils, "WRITE_COALESCE_DELAY", 0.01)
+    monkeypatch.setitem(tg_utils._config_file_cache, "key", None)
+    monkeypatch.setitem(tg_utils._config_file_cache, "data", None)
+    monkeypatch.setitem(tg_utils._pending_write, "data", None)
+    monkeypatch.setitem(tg_utils._pending_write, "task", None)
+    return tmp_path
+
+
+def _on_disk(config_dir):
+    return json.loads((config_dir / "config.json").read_text())
+
+
+def test_config_tx_writes_changes_once(config_dir, monkeypatch):
+    writes = []
+    real_write = tg_utils.write_json_file
+
+    async def counting_write(data):
+        writes.append(data)
+        await real_write(data)
+
+    monkeypatch.setattr(tg_utils, "write_json_file", counting_write)
+
+    async def edit():
+        async with tg_utils.config_tx() as data:
+            data["limits"]["general"] = 3
+            data["limits"]["except_users"] = ["alice"]
+
+    asyncio.run(edit())
+    assert len(writes) == 1
+    assert _on_disk(config_dir)["limits"] == {"general": 3, "except_users": ["alice"]}
+
+
+def test_config_tx_error_leaves_file_and_cache_untouched(config_dir):
+    async def failing_edit():
+        async with tg_utils.config_tx() as data:
+            data["limits"]["general"] = 9
+            raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(failing_edit())
+    assert _on_disk(config_dir)["limits"]["general"] == 2
+    assert asyncio.run(tg_utils.read_json_file())["limits"]["general"] == 2
+
+
+def test_config_tx_starts_empty_without_config_file(config_dir):
+    (config_dir / "config.json").unlink()
+
+    async def create():
+        async with tg_utils.config_tx() as data:
+            assert data == {}
+            data["limits"] = {"general": 4}
+
+    asyncio.run(create())
+    assert _on_disk(config_dir) == {"limits": {"general": 4}}
+
+
+def test_schedule_json_write_coalesces_to_latest_data(config_dir, monkeypatch):
+    writes = []
+
+    async def fake_write(data):
+        writes.append(data)
+
+    monkeypatch.setattr(tg_utils, "write_json_file", fake_write)
+
+    async def burst():
+        first = tg_utils.schedule_json_write({"n": 1})
+        second = tg_utils.schedule_json_write({"n": 2})
+        third = tg_utils.schedule_json_write({"n": 3})
+        assert first is second is third
+        await third
+
+    asyncio.run(burst())
+    assert writes == [{"n": 3}]
+    assert tg_utils._pending_write["task"] is None
+
+
+def test_schedule_json_write_failure_reaches_caller(config_dir, monkeypatch):
+    invalidated = []
+
+    async def failing_write(_data):
+        raise OSError("disk full")
+
+    async def fake_invalidate():
+        invalidated.append(True)
+
+    monkeypatch.setattr(tg_utils, "write_json_file", failing_write)
+    monkeypatch.setattr(tg_utils, "invalidate_config_cache", fake_invalidate)
+
+    async def save():
+        await tg_utils.schedule_json_write({"n": 1})
+
+    with pytest.raises(OSError):
+        asyncio.run(save())
+    assert invalidated == [True]
@@ -0,0 +1,60 @@
+"""
+Tests for IPHistoryTracker.generate_report part packing
+"""
+
+import asyncio
+
+from utils.ip_history_tracker import IPHistoryTracker
+
+
+def _tracker(tmp_path, monkeypatch, users_data):
+    tracker = IPHistoryTracker(filename=str(tmp_path / "ip_history.json"))
+
+    async def fake_exceeding(_hours, _config_data):
+        return users_data
+
+    monkeypatch.setattr(tracker, "get_users_exceeding_limits", fake_exceeding)
+    return tracker
+
+
+def _users(count):
+    return [
+        (f"user{i}", 4, 2, {f"10.0.{i}.{n}" for n in range(4)})
+        for i in range(count)
+    ]
+
+
+def test_no_users_is_a_single_part(tmp_path, monkeypatch):
+    tracker = _tracker(tmp_path, monkeypatch, [])
+    parts = asyncio.run(tracker.generate_report(12, {}))
+    assert len(parts) == 1
+    assert "No users exceeded" in parts[0]
+
+
+def test_parts_respect_max_size_and_keep_user_blocks_whole(tmp_path, monkeypatch):
+    tracker = _tracker(tmp_path, monkeypatch, _users(40))
+    parts = asyncio.run(tracker.generate_report(12, {}, max_part_size=500))
+    assert len(parts) > 1
+    assert all(len(part) <= 500 for part in parts)
+    for i in range(40):
+        # Every user block lands in exactly one part
+        holders = [part for part in parts if f"<code>user{i}</code>" in part]
+        assert len(holders) == 1
+        assert f"10.0.{i}.0" in holders[0]
+    assert "Summary" in parts[-1]
+
+
+def test_joined_parts_match_the_unsplit_report(tmp_path, monkeypatch):
+    tracker = _tracker(tmp_path, monkeypatch, _users(40))
+    parts = asyncio.run(tracker.generate_report(48, {}, max_part_size=500))
+    whole = asyncio.run(tracker.generate_report(48, {}, max_part_size=None))
+    assert len(whole) == 1
+    # The header carries a timestamp, so compare everything after it
+    assert "\n".join(parts).split("\n", 3)[3] == whole[0].split("\n", 3)[3]
+
+
+def test_oversized_block_gets_its_own_part(tmp_path, monkeypatch):
+    tracker = _tracker(tmp_path, monkeypatch, _users(3))
+    parts = asyncio.run(tracker.generate_report(12, {}, max_part_size=10))
+    # Header, three user blocks and the summary
+    assert len(parts) == 5
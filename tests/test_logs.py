@@ -0,0 +1,62 @@
+"""
+Tests for BatchingRotatingFileHandler in utils/logs.py
+"""
+
+import logging
+
+from utils.logs import BatchingRotatingFileHandler
+
+
+def _record(msg):
+    return logging.LogRecord("test", logging.INFO, __file__, 1, msg, None, None)
+
+
+def _handler(path, **kwargs):
+    handler = BatchingRotatingFileHandler(str(path), encoding="utf-8", delay=True, **kwargs)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    return handler
+
+
+def test_records_are_buffered_until_flush(tmp_path):
+    log_file = tmp_path / "app.log"
+    handler = _handler(log_file, flush_interval=60)
+    try:
+        handler.handle(_record("one"))
+        handler.handle(_record("two"))
+        assert not log_file.exists() or log_file.read_text() == ""
+        handler.flush()
+        assert log_file.read_text() == "one\ntwo\n"
+    finally:
+        handler.close()
+
+
+def test_full_buffer_is_written_without_flush(tmp_path):
+    log_file = tmp_path / "app.log"
+    handler = _handler(log_file, flush_interval=60, max_buffer=10)
+    try:
+        handler.handle(_record("x" * 20))
+        assert log_file.read_text() == "x" * 20 + "\n"
+    finally:
+        handler.close()
+
+
+def test_close_writes_pending_records(tmp_path):
+    log_file = tmp_path / "app.log"
+    handler = _handler(log_file, flush_interval=60)
+    handler.handle(_record("last words"))
+    handler.close()
+    assert log_file.read_text() == "last words\n"
+
+
+def test_batch_that_would_overflow_rolls_over_first(tmp_path):
+    log_file = tmp_path / "app.log"
+    handler = _handler(log_file, flush_interval=60, maxBytes=50, backupCount=1)
+    try:
+        handler.handle(_record("a" * 30))
+        handler.flush()
+        handler.handle(_record("b" * 30))
+        handler.flush()
+        assert (tmp_path / "app.log.1").read_text() == "a" * 30 + "\n"
+        assert log_file.read_text() == "b" * 30 + "\n"
+    finally:
+        handler.close()
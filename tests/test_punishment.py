@@ -0,0 +1,141 @@
+"""
+Tests for the punishment config handlers and step validation
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from telegram_bot.handlers import admin, punishment
+from utils.punishment_system import validate_steps
+
+ADMIN_ID = 42
+
+
+class FakeMessage:
+    def __init__(self):
+        self.replies = []
+
+    async def reply_html(self, text=None, **_kwargs):
+        self.replies.append(text)
+
+
+@pytest.fixture
+def shared_config(monkeypatch):
+    """A shared cached config as read_config() hands it out."""
+    config = {"punishment": {"enabled": True, "window_hours": 72, "steps": []}}
+
+    async def admins():
+        return frozenset({ADMIN_ID})
+
+    async def fake_read_config():
+        return config
+
+    monkeypatch.setattr(admin, "get_admin_set", admins)
+    monkeypatch.setattr(punishment, "read_config", fake_read_config)
+    monkeypatch.setattr(punishment, "config_lock", asyncio.Lock())
+    return config
+
+
+def _run(handler, args=()):
+    message = FakeMessage()
+    update = SimpleNamespace(message=message, effective_chat=SimpleNamespace(id=ADMIN_ID))
+    asyncio.run(handler(update, SimpleNamespace(args=list(args))))
+    return message
+
+
+def test_failed_write_leaves_shared_config_untouched(shared_config, monkeypatch):
+    invalidated = []
+
+    async def failing_write(_data):
+        raise OSError("disk full")
+
+    async def fake_invalidate():
+        invalidated.append(True)
+
+    monkeypatch.setattr(punishment, "write_json_file", failing_write)
+    monkeypatch.setattr(punishment, "invalidate_config_cache", fake_invalidate)
+    message = _run(punishment.punishment_toggle)
+    assert shared_config["punishment"]["enabled"] is True
+    assert invalidated == [True]
+    assert message.replies[0].startswith("❌ Error")
+
+
+def test_saved_config_is_an_edited_copy(shared_config, monkeypatch):
+    written = []
+
+    async def fake_write(data):
+        written.append(data)
+
+    monkeypatch.setattr(punishment, "write_json_file", fake_write)
+    _run(punishment.punishment_set_window, ["24"])
+    assert written[0]["punishment"]["window_hours"] == 24
+    assert written[0] is not shared_config
+    assert shared_config["punishment"]["window_hours"] == 72
+
+
+def test_validate_steps_normalizes_steps():
+    steps = validate_steps([{"type": "warning"}, {"type": "disable", "duration": 15}])
+    assert steps == [
+        {"type": "warning", "duration": 0},
+        {"type": "disable", "duration": 15},
+    ]
+
+
+@pytest.mark.parametrize("steps", [
+    [],
+    {"type": "warning"},
+    ["warning"],
+    [{"type": ["warning"]}],
+    [{"type": {"a": 1}}],
+    [{"type": "ban"}],
+    [{"type": "disable", "duration": -1}],
+    [{"type": "disable", "duration": True}],
+])
+def test_validate_steps_rejects_malformed_steps(steps):
+    with pytest.raises(ValueError):
+        validate_steps(steps)
+
+
+class FakeSystem:
+    def __init__(self, violations):
+        self.violations = violations
+
+    async def save_violations(self):
+        pass
+
+
+def _clear(monkeypatch, violations, username):
+    system = FakeSystem(violations)
+    scheduled = []
+
+    def fake_run_in_background(coro, name):
+        scheduled.append(name)
+        coro.close()
+
+    monkeypatch.setattr(punishment, "get_punishment_system", lambda: system)
+    monkeypatch.setattr(punishment, "run_in_background", fake_run_in_background)
+    message = _run(punishment.clear_user_violations, [username])
+    return system, scheduled, message
+
+
+def test_clear_user_violations_clears_before_replying(shared_config, monkeypatch):
+    system, scheduled, message = _clear(monkeypatch, {"alice": [1], "bob": [2]}, "alice")
+    assert system.violations == {"bob": [2]}
+    assert scheduled == ["save_violations"]
+    assert message.replies[0].startswith("✅")
+
+
+def test_clear_all_violations(shared_config, monkeypatch):
+    system, scheduled, message = _clear(monkeypatch, {"alice": [1], "bob": [2]}, "ALL")
+    assert system.violations == {}
+    assert scheduled == ["save_violations"]
+    assert "2 users" in message.replies[0]
+
+
+def test_clear_unknown_user_saves_nothing(shared_config, monkeypatch):
+    system, scheduled, message = _clear(monkeypatch, {"alice": [1]}, "bob")
+    assert system.violations == {"alice": [1]}
+    assert scheduled == []
+    assert "No violation history" in message.replies[0]
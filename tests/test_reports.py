@@ -0,0 +1,47 @@
+"""
+Tests for the multi-device report pages in telegram_bot/handlers/reports.py
+"""
+
+from telegram_bot.handlers.reports import _MULTI_DEVICE_PAGE_SIZE, _multi_device_page
+
+
+def _users(count):
+    return [(f"user{i}", 3, 2, ["vless"]) for i in range(count)]
+
+
+def _nav_callbacks(keyboard):
+    return [button.callback_data for row in keyboard.inline_keyboard for button in row]
+
+
+def test_single_page_has_no_navigation():
+    text, keyboard = _multi_device_page(_users(3), 0)
+    assert keyboard is None
+    assert "page" not in text
+    assert text.count("unique IPs") == 3
+
+
+def test_first_page_links_to_next_only():
+    users = _users(_MULTI_DEVICE_PAGE_SIZE * 2 + 1)
+    text, keyboard = _multi_device_page(users, 0)
+    assert "(page 1/3," in text
+    assert text.count("unique IPs") == _MULTI_DEVICE_PAGE_SIZE
+    assert _nav_callbacks(keyboard) == ["multi_device_page:1"]
+
+
+def test_middle_page_links_both_ways():
+    users = _users(_MULTI_DEVICE_PAGE_SIZE * 2 + 1)
+    _, keyboard = _multi_device_page(users, 1)
+    assert _nav_callbacks(keyboard) == ["multi_device_page:0", "multi_device_page:2"]
+
+
+def test_out_of_range_page_is_clamped():
+    users = _users(_MULTI_DEVICE_PAGE_SIZE + 1)
+    text, keyboard = _multi_device_page(users, 99)
+    assert "(page 2/2," in text
+    assert f"user{_MULTI_DEVICE_PAGE_SIZE}" in text
+    assert _nav_callbacks(keyboard) == ["multi_device_page:0"]
+
+
+def test_usernames_are_escaped():
+    text, _ = _multi_device_page([("<b>x</b>", 3, 2, ["vless"])], 0)
+    assert "&lt;b&gt;x&lt;/b&gt;" in text
@@ -0,0 +1,67 @@
+"""
+Tests for split_html and edit_query_message in telegram_bot/send_message.py
+"""
+
+import asyncio
+
+import pytest
+from telegram.error import BadRequest
+
+from telegram_bot.send_message import edit_query_message, split_html
+
+
+def test_short_text_is_one_chunk():
+    assert split_html("hello", limit=10) == ["hello"]
+
+
+def test_splits_at_last_separator_before_limit():
+    text = "aaa\nbbb\nccc"
+    assert split_html(text, limit=8) == ["aaa\nbbb", "ccc"]
+
+
+def test_chunks_never_exceed_limit_and_keep_all_lines():
+    lines = [f"<b>user{i}</b>: 1.2.3.{i}" for i in range(200)]
+    chunks = split_html("\n".join(lines), limit=100)
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert "\n".join(chunks).split("\n") == lines
+
+
+def test_hard_cut_does_not_split_a_tag():
+    text = "x" * 8 + "<code>y</code>"
+    chunks = split_html(text, limit=10)
+    assert chunks[0] == "x" * 8
+    assert "".join(chunks) == text
+
+
+def test_hard_cut_does_not_split_an_entity():
+    text = "x" * 7 + "&amp;" + "y" * 5
+    chunks = split_html(text, limit=10)
+    assert chunks[0] == "x" * 7
+    assert "".join(chunks) == text
+
+
+def test_oversized_tag_is_cut_at_limit():
+    text = "<" + "a" * 20 + ">"
+    chunks = split_html(text, limit=10)
+    assert chunks[0] == text[:10]
+    assert "".join(chunks) == text
+
+
+class FailingQuery:
+    def __init__(self, error):
+        self.error = error
+
+    async def edit_message_text(self, text=None, reply_markup=None):
+        raise self.error
+
+
+def test_unmodified_edit_is_skipped():
+    query = FailingQuery(BadRequest("Message is not modified: specified new message content "
+                                    "and reply markup are exactly the same"))
+    assert asyncio.run(edit_query_message(query, "same")) is None
+
+
+def test_other_edit_errors_are_raised():
+    query = FailingQuery(BadRequest("Can't parse entities"))
+    with pytest.raises(BadRequest):
+        asyncio.run(edit_query_message(query, "<b>broken"))
@@ -14,7 +14,7 @@ from utils.panel_api import disable_user
 from utils.read_config import read_config, get_config_value
 from utils.types import PanelType, UserType, EnhancedUserInfo
 from utils.warning_system import EnhancedWarningSystem
-from utils.isp_detector import ISPDetector
+from utils.isp_detector import get_shared_isp_detector
 from utils.ip_history_tracker import ip_history_tracker
 from utils.user_group_filter import should_limit_user, get_filter_status_text
 from utils.admin_filter import should_limit_user_by_admin
@@ -173,7 +173,7 @@ async def check_ip_used() -> dict:
         logger.info(f"Loading IPINFO_TOKEN from config: {'Present' if ipinfo_token else 'NOT FOUND'}")
         if use_fallback_api:
             logger.info("Using fallback ISP API (ip-api.com) for all requests")
-        isp_detector = ISPDetector(token=ipinfo_token if ipinfo_token else None, use_fallback_only=use_fallback_api)
+        isp_detector = get_shared_isp_detector(ipinfo_token, use_fallback_api)
     
     all_users_log = {}
     enhanced_users_info = {}
@@ -435,7 +435,7 @@ async def check_users_usage(panel_data: PanelType):
             logger.info(f"[check_users_usage] Token preview: {ipinfo_token[:20]}...")
         if use_fallback_api:
             logger.info("[check_users_usage] Using fallback ISP API (ip-api.com) for all requests")
-        isp_detector = ISPDetector(token=ipinfo_token if ipinfo_token else None, use_fallback_only=use_fallback_api)
+        isp_detector = get_shared_isp_detector(ipinfo_token, use_fallback_api)
     
     # Build user info with actual unique IP counts for ALL active users
     # This is critical for warning system to work correctly
@@ -3,6 +3,7 @@ Connection analyzer utility for tracking IP-Node-Inbound relationships.
 """
 
 from typing import Dict, List, Tuple
+from utils.check_usage import ACTIVE_USERS
 from utils.types import UserType, ConnectionInfo
 
 
@@ -17,30 +18,30 @@ async def generate_connection_report(active_users: Dict[str, UserType] = None) -
         str: Formatted report string
     """
     if active_users is None:
-        from utils.check_usage import ACTIVE_USERS
         active_users = ACTIVE_USERS
     
     if not active_users:
         return "No active user connections found."
     
-    report_lines = []
-    report_lines.append("=== CONNECTION ANALYSIS REPORT ===\n")
+    report_lines = ["=== CONNECTION ANALYSIS REPORT ===\n"]
     
     for username, user in active_users.items():
-        report_lines.append(f"User: {username}")
-        report_lines.append(f"Total IPs: {len(user.device_info.unique_ips)}")
-        report_lines.append(f"Total Nodes: {len(user.device_info.unique_nodes)}")
-        report_lines.append(f"Inbound Protocols: {', '.join(user.device_info.inbound_protocols)}")
-        report_lines.append(f"Multi-device: {'Yes' if user.device_info.is_multi_device else 'No'}")
-        report_lines.append("")
+        device_info = user.device_info
+        report_lines.append(
+            f"User: {username}\n"
+            f"Total IPs: {len(device_info.unique_ips)}\n"
+            f"Total Nodes: {len(device_info.unique_nodes)}\n"
+            f"Inbound Protocols: {', '.join(device_info.inbound_protocols)}\n"
+            f"Multi-device: {'Yes' if device_info.is_multi_device else 'No'}\n"
+        )
         
-        if user.device_info.connections:
+        if device_info.connections:
             report_lines.append("  Connections:")
-            for conn in user.device_info.connections:
-                report_lines.append(
-                    f"    IP: {conn.ip} | Node: {conn.node_name} (ID: {conn.node_id}) | "
-                    f"Protocol: {conn.inbound_protocol} | Count: {conn.connection_count}"
-                )
+            report_lines.extend(
+                f"    IP: {conn.ip} | Node: {conn.node_name} (ID: {conn.node_id}) | "
+                f"Protocol: {conn.inbound_protocol} | Count: {conn.connection_count}"
+                for conn in device_info.connections
+            )
         
         report_lines.append("-" * 60)
     
@@ -59,17 +60,14 @@ async def get_users_by_node(node_id: int, active_users: Dict[str, UserType] = No
         List[Tuple[str, str, str]]: List of (username, ip, inbound_protocol) tuples
     """
     if active_users is None:
-        from utils.check_usage import ACTIVE_USERS
         active_users = ACTIVE_USERS
     
-    users_on_node = []
-    
-    for username, user in active_users.items():
-        for conn in user.device_info.connections:
-            if conn.node_id == node_id:
-                users_on_node.append((username, conn.ip, conn.inbound_protocol))
-    
-    return users_on_node
+    return [
+        (username, conn.ip, conn.inbound_protocol)
+        for username, user in active_users.items()
+        for conn in user.device_info.connections
+        if conn.node_id == node_id
+    ]
 
 
 async def get_users_by_inbound_protocol(protocol: str, active_users: Dict[str, UserType] = None) -> List[Tuple[str, str, str]]:
@@ -84,17 +82,14 @@ async def get_users_by_inbound_protocol(protocol: str, active_users: Dict[str, U
         List[Tuple[str, str, str]]: List of (username, ip, node_name) tuples
     """
     if active_users is None:
-        from utils.check_usage import ACTIVE_USERS
         active_users = ACTIVE_USERS
     
-    users_with_protocol = []
-    
-    for username, user in active_users.items():
-        for conn in user.device_info.connections:
-            if conn.inbound_protocol == protocol:
-                users_with_protocol.append((username, conn.ip, conn.node_name))
-    
-    return users_with_protocol
+    return [
+        (username, conn.ip, conn.node_name)
+        for username, user in active_users.items()
+        for conn in user.device_info.connections
+        if conn.inbound_protocol == protocol
+    ]
 
 
 async def get_multi_device_users(active_users: Dict[str, UserType] = None) -> List[Tuple[str, int, int, List[str]]]:
@@ -108,7 +103,6 @@ async def get_multi_device_users(active_users: Dict[str, UserType] = None) -> Li
         List[Tuple[str, int, int, List[str]]]: List of (username, ip_count, node_count, protocols) tuples
     """
     if active_users is None:
-        from utils.check_usage import ACTIVE_USERS
         active_users = ACTIVE_USERS
     
     multi_device_users = []
@@ -136,7 +130,6 @@ async def get_node_usage_summary(active_users: Dict[str, UserType] = None) -> Di
         Dict[str, Dict[str, int]]: Dictionary with node usage statistics
     """
     if active_users is None:
-        from utils.check_usage import ACTIVE_USERS
         active_users = ACTIVE_USERS
     
     node_stats = {}
@@ -182,15 +175,14 @@ async def generate_node_usage_report(active_users: Dict[str, UserType] = None) -
     if not node_stats:
         return "No node usage data available."
     
-    report_lines = []
-    report_lines.append("=== NODE USAGE REPORT ===\n")
-    
-    for node_key, stats in node_stats.items():
-        report_lines.append(f"Node: {node_key}")
-        report_lines.append(f"  Unique Users: {stats['unique_users']}")
-        report_lines.append(f"  Unique IPs: {stats['unique_ips']}")
-        report_lines.append(f"  Protocol Types: {stats['protocols']}")
-        report_lines.append(f"  Total Connections: {stats['total_connections']}")
-        report_lines.append("")
+    report_lines = ["=== NODE USAGE REPORT ===\n"]
+    report_lines.extend(
+        f"Node: {node_key}\n"
+        f"  Unique Users: {stats['unique_users']}\n"
+        f"  Unique IPs: {stats['unique_ips']}\n"
+        f"  Protocol Types: {stats['protocols']}\n"
+        f"  Total Connections: {stats['total_connections']}\n"
+        for node_key, stats in node_stats.items()
+    )
     
     return "\n".join(report_lines)
@@ -0,0 +1,47 @@
+"""
+Shared HTTP client for panel API and IP lookup requests.
+Reusing one httpx client keeps connections (and TLS sessions) alive
+between requests instead of paying a new handshake for every call.
+"""
+
+import asyncio
+import sys
+from typing import Optional
+
+try:
+    import httpx
+except ImportError:
+    print("Module 'httpx' is not installed use: 'pip install httpx' to install it")
+    sys.exit()
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+async def get_http_client() -> httpx.AsyncClient:
+    """Get or create the shared httpx client for the running event loop"""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        # A client left over from a previous event loop (e.g. after the
+        # limiter restarted) is closed rather than dropped
+        await close_http_client()
+        # Certificate checks stay off as they were for the per-call clients
+        # this replaces: panels commonly run with self-signed certificates
+        _client = httpx.AsyncClient(
+            verify=False,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_http_client():
+    """Close the shared httpx client"""
+    global _client
+    client, _client = _client, None
+    if client is not None and not client.is_closed:
+        try:
+            await client.aclose()
+        except Exception:  # pylint: disable=broad-except
+            pass
@@ -9,6 +9,7 @@ from typing import Dict, Set, List, Tuple
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 
+from utils.isp_detector import NULL_ISP_DETECTOR
 from utils.logs import logger
 
 
@@ -48,6 +49,8 @@ class IPHistoryTracker:
     def __init__(self, filename=".ip_history.json"):
         self.filename = filename
         self.user_histories: Dict[str, UserIPHistory] = {}
+        # Incremented whenever the history changes, so reports can be cached
+        self.version = 0
         self.load_history()
     
     def load_history(self):
@@ -107,6 +110,7 @@ class IPHistoryTracker:
         
         # Cleanup old entries (keep 48 hours)
         user_history.cleanup_old_entries(max_hours=48)
+        self.version += 1
     
     async def get_users_exceeding_limits(self, hours: int, config_data: dict) -> List[Tuple[str, int, int, Set[str]]]:
         """
@@ -157,89 +161,94 @@ class IPHistoryTracker:
         
         for username in users_to_remove:
             del self.user_histories[username]
+        if users_to_remove:
+            self.version += 1
         
         if users_to_remove:
             logger.info(f"Cleaned up {len(users_to_remove)} inactive users from IP history")
     
-    async def generate_report(self, hours: int, config_data: dict, isp_detector=None) -> str:
+    async def generate_report(self, hours: int, config_data: dict, isp_detector=None,
+                              max_part_size: int | None = 3500) -> List[str]:
         """
         Generate a formatted report of users exceeding limits
         
         Args:
             hours: Time period (12 or 48)
             config_data: Configuration with limits
-            isp_detector: Optional ISP detector for enhanced info
+            isp_detector: ISP detector for enhanced info (NULL_ISP_DETECTOR if None)
+            max_part_size: Split the report into parts of at most this many
+                characters, on user boundaries (None for a single part)
+        
+        Returns:
+            The report as a list of ready-to-send parts
         """
         users_data = await self.get_users_exceeding_limits(hours, config_data)
         
         if not users_data:
-            return f"📊 <b>{hours}H IP History Report</b>\n\n✅ No users exceeded their limits in the last {hours} hours."
-        
-        # Get ISP info if detector available
-        isp_info_batch = {}
-        if isp_detector:
-            all_ips = set()
-            for _, _, _, ips in users_data:
-                all_ips.update(ips)
-            if all_ips:
-                isp_info_batch = await isp_detector.get_multiple_isp_info(list(all_ips))
-        
-        # Build report
-        report_lines = [
-            f"📊 <b>{hours}H IP History Report</b>",
-            f"⏰ Period: Last {hours} hours",
-            f"📅 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
-            "",
-            f"🚫 <b>{len(users_data)} users exceeded limits:</b>",
-            ""
+            return [f"📊 <b>{hours}H IP History Report</b>\n\n✅ No users exceeded their limits in the last {hours} hours."]
+        
+        if isp_detector is None:
+            isp_detector = NULL_ISP_DETECTOR
+        
+        # ISP info for every reported IP (empty when lookups are disabled)
+        all_ips = set().union(*(ips for _, _, _, ips in users_data))
+        isp_info_batch = await isp_detector.get_multiple_isp_info(list(all_ips))
+        
+        # One block per record; joining all blocks gives the full report
+        blocks = [
+            f"📊 <b>{hours}H IP History Report</b>\n"
+            f"⏰ Period: Last {hours} hours\n"
+            f"📅 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+            f"\n"
+            f"🚫 <b>{len(users_data)} users exceeded limits:</b>\n"
         ]
         
         for username, ip_count, limit, unique_ips in users_data:
-            report_lines.append(f"👤 <code>{username}</code>")
-            report_lines.append(f"   📍 Unique IPs: <b>{ip_count}</b> (Limit: {limit})")
-            report_lines.append(f"   ⚠️ Exceeded by: <b>{ip_count - limit}</b> IPs")
+            block_lines = [
+                f"👤 <code>{username}</code>",
+                f"   📍 Unique IPs: <b>{ip_count}</b> (Limit: {limit})",
+                f"   ⚠️ Exceeded by: <b>{ip_count - limit}</b> IPs",
+            ]
             
-            # Show IPs with ISP info if available
-            if isp_info_batch:
-                ip_list = []
-                for ip in sorted(unique_ips):
-                    if ip in isp_info_batch:
-                        isp_info = isp_info_batch[ip]
-                        ip_with_isp = f"{ip} ({isp_info.get('isp', 'Unknown')}, {isp_info.get('country', 'Unknown')})"
-                        ip_list.append(ip_with_isp)
-                    else:
-                        ip_list.append(ip)
-                
-                # Show first 5 IPs, then summarize if more
-                if len(ip_list) <= 5:
-                    for ip_str in ip_list:
-                        report_lines.append(f"      • {ip_str}")
-                else:
-                    for ip_str in ip_list[:5]:
-                        report_lines.append(f"      • {ip_str}")
-                    report_lines.append(f"      • ... and {len(ip_list) - 5} more")
-            else:
-                # Simple IP list without ISP info
-                ip_list = sorted(unique_ips)
-                if len(ip_list) <= 5:
-                    for ip in ip_list:
-                        report_lines.append(f"      • {ip}")
-                else:
-                    for ip in ip_list[:5]:
-                        report_lines.append(f"      • {ip}")
-                    report_lines.append(f"      • ... and {len(ip_list) - 5} more")
+            # Show IPs (with ISP info when known), first 5 then a summary
+            ip_list = sorted(unique_ips)
+            for ip in ip_list[:5]:
+                isp_info = isp_info_batch.get(ip)
+                if isp_info:
+                    ip = f"{ip} ({isp_info.get('isp', 'Unknown')}, {isp_info.get('country', 'Unknown')})"
+                block_lines.append(f"      • {ip}")
+            if len(ip_list) > 5:
+                block_lines.append(f"      • ... and {len(ip_list) - 5} more")
             
-            report_lines.append("")
+            block_lines.append("")
+            blocks.append("\n".join(block_lines))
         
         # Summary
         total_ips = sum(ip_count for _, ip_count, _, _ in users_data)
-        report_lines.append("─────────────────────")
-        report_lines.append(f"📈 <b>Summary:</b>")
-        report_lines.append(f"   • Users: {len(users_data)}")
-        report_lines.append(f"   • Total Unique IPs: {total_ips}")
-        report_lines.append(f"   • Period: {hours}h")
-        
-        return "\n".join(report_lines)
+        blocks.append(
+            f"─────────────────────\n"
+            f"📈 <b>Summary:</b>\n"
+            f"   • Users: {len(users_data)}\n"
+            f"   • Total Unique IPs: {total_ips}\n"
+            f"   • Period: {hours}h"
+        )
+        
+        if max_part_size is None:
+            return ["\n".join(blocks)]
+        
+        # Pack whole blocks into parts; a single oversized block gets its own part
+        parts = []
+        current = []
+        current_size = 0
+        for block in blocks:
+            if current and current_size + len(block) + 1 > max_part_size:
+                parts.append("\n".join(current))
+                current = []
+                current_size = 0
+            current.append(block)
+            current_size += len(block) + 1
+        parts.append("\n".join(current))
+        return parts
 
 
 # Global instance
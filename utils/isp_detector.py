@@ -5,6 +5,7 @@ Uses Redis cache when available for fast lookups, with fallback to in-memory and
 """
 
 import asyncio
+import time
 import aiohttp
 from typing import Dict, Optional
 from utils.logs import logger
@@ -23,12 +24,54 @@ except ImportError:
     DB_AVAILABLE = False
     get_db_subnet_cache = None
 
+# One aiohttp session shared by every ISPDetector, so short-lived detectors
+# don't each build (and leak) their own connector, resolver and SSL context
+_http_session: Optional[aiohttp.ClientSession] = None
+_http_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """Get or create the shared aiohttp session for the running event loop"""
+    global _http_session, _http_session_loop
+    loop = asyncio.get_running_loop()
+    if _http_session is None or _http_session.closed or _http_session_loop is not loop:
+        # A session left over from a previous event loop (e.g. after the
+        # limiter restarted) is closed rather than dropped, so its connector
+        # doesn't leak
+        await close_http_session()
+        connector = aiohttp.TCPConnector(limit=50, limit_per_host=5, ttl_dns_cache=300)
+        _http_session = aiohttp.ClientSession(connector=connector)
+        _http_session_loop = loop
+    return _http_session
+
+
+def _unknown_isp_info(ip: str) -> Dict[str, str]:
+    """ISP info returned when no lookup succeeded; never cached"""
+    return {"ip": ip, "isp": "Unknown ISP", "country": "Unknown", "city": "Unknown", "region": "Unknown"}
+
+
+async def close_http_session():
+    """Close the shared aiohttp session"""
+    global _http_session
+    session, _http_session = _http_session, None
+    if session is not None and not session.closed:
+        try:
+            await session.close()
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning(f"Failed to close ISP lookup session: {e}")
+
 
 class ISPDetector:
     """
     A class to detect ISP information for IP addresses
     """
     
+    # Detectors are shared for the life of the process, so cached entries
+    # expire, the cache is bounded and a 429 only pauses ipinfo.io for a while
+    CACHE_TTL = 24 * 3600  # seconds
+    CACHE_MAX_SIZE = 10000
+    RATE_LIMIT_COOLDOWN = 300  # seconds
+    
     def __init__(self, token: Optional[str] = None, use_fallback_only: bool = False, use_db_cache: bool = True):
         """
         Initialize the ISP detector with an optional ipinfo token
@@ -41,11 +84,10 @@ class ISPDetector:
         self.token = token
         self.use_fallback_only = use_fallback_only
         self.use_db_cache = use_db_cache and DB_AVAILABLE
-        self.cache = {}  # Simple cache to avoid repeated API calls
+        self.cache = {}  # ip -> (stored_at, isp_info), oldest first
         self.rate_limit_delay = 1  # 1 second delay between requests
         self.last_request_time = 0
-        self.rate_limited = False  # Track if we're rate limited
-        self._session = None  # Shared aiohttp session
+        self.rate_limited_until = 0.0  # monotonic time ipinfo.io may be used again
         self._db_cache = get_db_subnet_cache() if self.use_db_cache else None
         
         if self.use_db_cache:
@@ -58,18 +100,32 @@ class ISPDetector:
             logger.warning("ISPDetector initialized WITHOUT token - ISP detection may be limited")
     
     async def _get_session(self):
-        """Get or create the shared aiohttp session"""
-        if self._session is None or self._session.closed:
-            # Create session with connection limits
-            connector = aiohttp.TCPConnector(limit=10, limit_per_host=5)
-            self._session = aiohttp.ClientSession(connector=connector)
-        return self._session
+        """Get the module-wide shared aiohttp session"""
+        return await get_http_session()
     
     async def close(self):
-        """Close the aiohttp session"""
-        if self._session and not self._session.closed:
-            await self._session.close()
-            self._session = None
+        """
+        Kept for compatibility; the session is shared between detectors and
+        is closed with close_http_session() on shutdown.
+        """
+    
+    def _cache_get(self, ip: str) -> Optional[Dict[str, str]]:
+        """Return cached ISP info for ip, dropping it if it has expired"""
+        entry = self.cache.get(ip)
+        if entry is None:
+            return None
+        stored_at, isp_info = entry
+        if time.monotonic() - stored_at > self.CACHE_TTL:
+            del self.cache[ip]
+            return None
+        return isp_info
+    
+    def _cache_put(self, ip: str, isp_info: Dict[str, str]):
+        """Cache ISP info for ip, evicting the oldest entry once the cache is full"""
+        self.cache.pop(ip, None)
+        self.cache[ip] = (time.monotonic(), isp_info)
+        if len(self.cache) > self.CACHE_MAX_SIZE:
+            del self.cache[next(iter(self.cache))]
     
     async def get_isp_info(self, ip: str) -> Dict[str, str]:
         """
@@ -89,14 +145,15 @@ class ISPDetector:
                 if cached:
                     logger.debug(f"ISP Redis cache hit for {ip}")
                     # Also store in memory cache
-                    self.cache[ip] = cached
+                    self._cache_put(ip, cached)
                     return cached
             except Exception as e:
                 logger.warning(f"Redis cache lookup failed for {ip}: {e}")
         
         # Check memory cache
-        if ip in self.cache:
-            return self.cache[ip]
+        cached = self._cache_get(ip)
+        if cached is not None:
+            return cached
         
         # Check database cache (by subnet) if enabled
         if self._db_cache:
@@ -104,7 +161,7 @@ class ISPDetector:
                 cached = await self._db_cache.get_cached_isp(ip)
                 if cached:
                     # Copy to memory cache and Redis
-                    self.cache[ip] = cached
+                    self._cache_put(ip, cached)
                     await self._cache_isp_result(ip, cached)
                     logger.debug(f"ISP cache hit for {ip} (subnet cache)")
                     return cached
@@ -117,17 +174,9 @@ class ISPDetector:
             await self._cache_isp_result(ip, result)
             return result
         
-        # If we're rate limited, return default info immediately
-        if self.rate_limited:
-            default_info = {
-                "ip": ip,
-                "isp": "Unknown ISP",
-                "country": "Unknown",
-                "city": "Unknown",
-                "region": "Unknown"
-            }
-            self.cache[ip] = default_info
-            return default_info
+        # If we're rate limited, return default info until the cooldown ends
+        if time.monotonic() < self.rate_limited_until:
+            return _unknown_isp_info(ip)
             
         # Rate limiting
         current_time = asyncio.get_event_loop().time()
@@ -158,14 +207,14 @@ class ISPDetector:
                         "city": data.get("city", "Unknown"),
                         "region": data.get("region", "Unknown")
                     }
-                    self.cache[ip] = isp_info
+                    self._cache_put(ip, isp_info)
                     self.last_request_time = asyncio.get_event_loop().time()
                     # Save to all caches (Redis + database)
                     await self._cache_isp_result(ip, isp_info)
                     return isp_info
                 elif response.status == 429:
-                    # Rate limited - set flag and return default
-                    self.rate_limited = True
+                    # Rate limited - back off for a while and return default
+                    self.rate_limited_until = time.monotonic() + self.RATE_LIMIT_COOLDOWN
                     logger.warning(f"ISP detection rate limited for {ip}")
                 elif response.status == 403:
                     # Forbidden - try fallback API
@@ -190,16 +239,8 @@ class ISPDetector:
             await self._cache_isp_result(ip, result)
             return result
         
-        # Return default info if lookup fails
-        default_info = {
-            "ip": ip,
-            "isp": "Unknown ISP",
-            "country": "Unknown",
-            "city": "Unknown",
-            "region": "Unknown"
-        }
-        self.cache[ip] = default_info
-        return default_info
+        # Return default info if lookup fails; not cached so it is retried later
+        return _unknown_isp_info(ip)
     
     async def _save_to_db_cache(self, ip: str, isp_info: Dict[str, str]):
         """Save ISP info to database cache (by subnet)"""
@@ -260,7 +301,7 @@ class ISPDetector:
                             "region": data.get("regionName", "Unknown")
                         }
                         logger.info(f"✓ Fallback API success for {ip}: {isp_info['isp']}")
-                        self.cache[ip] = isp_info
+                        self._cache_put(ip, isp_info)
                         return isp_info
                     else:
                         logger.warning(f"Fallback API returned failure status for {ip}")
@@ -268,14 +309,7 @@ class ISPDetector:
             logger.error(f"Fallback API failed for {ip}: {e}")
         
         # If all fails, return default
-        default_info = {
-            "ip": ip,
-            "isp": "Unknown ISP",
-            "country": "Unknown",
-            "city": "Unknown",
-            "region": "Unknown"
-        }
-        return default_info
+        return _unknown_isp_info(ip)
     
     async def get_multiple_isp_info(self, ips: list[str]) -> Dict[str, Dict[str, str]]:
         """
@@ -289,7 +323,14 @@ class ISPDetector:
             Dict[str, Dict[str, str]]: Dictionary mapping IP to ISP info
         """
         # Filter out already cached IPs
-        uncached_ips = [ip for ip in ips if ip not in self.cache]
+        results = {}
+        uncached_ips = []
+        for ip in ips:
+            cached = self._cache_get(ip)
+            if cached is None:
+                uncached_ips.append(ip)
+            else:
+                results[ip] = cached
         
         if uncached_ips:
             # Limit concurrent requests to avoid overwhelming the API
@@ -304,16 +345,16 @@ class ISPDetector:
             for i in range(0, len(uncached_ips), batch_size):
                 batch = uncached_ips[i:i + batch_size]
                 tasks = [bounded_get_isp_info(ip) for ip in batch]
-                await asyncio.gather(*tasks, return_exceptions=True)
+                infos = await asyncio.gather(*tasks, return_exceptions=True)
+                for ip, info in zip(batch, infos):
+                    if isinstance(info, dict):
+                        results[ip] = info
                 
                 # Small delay between batches if we have more
                 if i + batch_size < len(uncached_ips):
                     await asyncio.sleep(0.5)
         
-        # Build result from cache
-        def default_info(ip_addr):
-            return {"ip": ip_addr, "isp": "Unknown ISP", "country": "Unknown", "city": "Unknown", "region": "Unknown"}
-        return {ip: self.cache.get(ip, default_info(ip)) for ip in ips}
+        return {ip: results.get(ip) or _unknown_isp_info(ip) for ip in ips}
     
     def format_ip_with_isp(self, ip: str, isp_info: Dict[str, str]) -> str:
         """
@@ -345,3 +386,40 @@ class ISPDetector:
     def clear_cache(self):
         """Clear the ISP cache"""
         self.cache.clear()
+
+
+# ISPDetectors keyed by (token, use_fallback_only), shared so the per-IP
+# cache survives between monitoring cycles and report requests
+_shared_detectors: Dict[tuple, "ISPDetector"] = {}
+
+
+def get_shared_isp_detector(token: Optional[str] = None, use_fallback_only: bool = False) -> "ISPDetector":
+    """Get the process-wide ISPDetector for the given settings, creating it once"""
+    key = (token or None, bool(use_fallback_only))
+    detector = _shared_detectors.get(key)
+    if detector is None:
+        detector = _shared_detectors[key] = ISPDetector(token=key[0], use_fallback_only=key[1])
+    return detector
+
+
+class NullISPDetector:
+    """
+    Stand-in for ISPDetector when ISP lookups are not configured.
+    Returns no ISP info, so callers can use it without None checks.
+    """
+
+    async def get_isp_info(self, ip: str) -> Dict[str, str]:
+        return {}
+
+    async def get_multiple_isp_info(self, ips: list[str]) -> Dict[str, Dict[str, str]]:
+        return {}
+
+    def format_ip_with_isp(self, ip: str, isp_info: Dict[str, str]) -> str:
+        return ip
+
+    async def close(self):
+        pass
+
+
+# Shared no-op detector
+NULL_ISP_DETECTOR = NullISPDetector()
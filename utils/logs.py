@@ -4,18 +4,27 @@ Provides structured logging with different levels, colors, and contextual inform
 """
 
 import asyncio
+import atexit
 import functools
 import logging
 import os
+import queue
 import sys
+import threading
 import time
 import traceback
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from typing import Callable
 
 # Log level from environment (DEBUG, INFO, WARNING, ERROR, CRITICAL)
 LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
 
+# Whether the console supports ANSI colors; checked once at import
+_IS_TTY = sys.stdout.isatty()
+
+# Background thread that drains queued records into the real handlers
+_log_listener: QueueListener | None = None
+
 
 class Colors:
     """ANSI color codes for terminal output."""
@@ -43,21 +52,107 @@ class ColoredFormatter(logging.Formatter):
         logging.CRITICAL: Colors.BOLD + Colors.RED,
     }
 
+    # Only a handful of levels exist, so build their colored names once
+    COLORED_LEVELNAMES = {
+        level: f"{color}{logging.getLevelName(level):8}{Colors.RESET}"
+        for level, color in LEVEL_COLORS.items()
+    }
+
     def format(self, record):
-        # Add color to level name for console
-        color = self.LEVEL_COLORS.get(record.levelno, Colors.WHITE)
-        record.levelname_colored = f"{color}{record.levelname:8}{Colors.RESET}"
-        record.message_colored = f"{color}{record.getMessage()}{Colors.RESET}"
+        colored = self.COLORED_LEVELNAMES.get(record.levelno)
+        if colored is None:
+            colored = f"{Colors.WHITE}{record.levelname:8}{Colors.RESET}"
+        record.levelname_colored = colored
         return super().format(record)
 
 
+class BatchingRotatingFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler that buffers formatted records and writes them in batches.
+
+    The buffer is written once it exceeds ``max_buffer`` characters or
+    ``flush_interval`` seconds after the first record was buffered, so a burst
+    of log lines becomes a single write instead of one per record.
+    """
+
+    def __init__(
+        self,
+        *args,
+        flush_interval: float = 0.05,
+        max_buffer: int = 64 * 1024,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._buffer: list[str] = []
+        self._buffer_len = 0
+        self._timer: threading.Timer | None = None
+
+    def emit(self, record):
+        try:
+            msg = self.format(record) + self.terminator
+        except Exception:
+            self.handleError(record)
+            return
+        self._buffer.append(msg)
+        self._buffer_len += len(msg)
+        if self._buffer_len >= self.max_buffer:
+            self._write_buffer()
+        elif self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def shouldRollover(self, record):
+        # Rollover is decided per batch in _write_buffer
+        return False
+
+    def _write_buffer(self):
+        """Write out buffered records, rolling over first if they would overflow. Caller holds the lock."""
+        if not self._buffer:
+            return
+        data = "".join(self._buffer)
+        self._buffer.clear()
+        self._buffer_len = 0
+        if self.stream is None:
+            self.stream = self._open()
+        if self.maxBytes > 0:
+            pos = self.stream.tell()
+            if pos and pos + len(data) >= self.maxBytes:
+                self.doRollover()
+                # With delay=True doRollover leaves the new file unopened
+                if self.stream is None:
+                    self.stream = self._open()
+        self.stream.write(data)
+        self.stream.flush()
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._write_buffer()
+        finally:
+            self.release()
+
+    def close(self):
+        self.flush()
+        super().close()
+
+
 class ContextLogger(logging.LoggerAdapter):
     """Logger adapter that adds context information to log messages."""
 
     def process(self, msg, kwargs):
-        extra = self.extra.copy() if self.extra else {}
-        extra.update(kwargs.get("extra", {}))
-        kwargs["extra"] = extra
+        # Records only read `extra`, so share the adapter's dict unless the
+        # call supplies its own keys to merge in
+        call_extra = kwargs.get("extra")
+        if call_extra:
+            kwargs["extra"] = {**(self.extra or {}), **call_extra}
+        else:
+            kwargs["extra"] = self.extra or {}
         return msg, kwargs
 
 
@@ -79,7 +174,18 @@ def get_logger(name: str = None, context: dict = None) -> logging.Logger:
 
 
 def setup_logging():
-    """Configure the root logger with file and console handlers."""
+    """
+    Configure the root logger with file and console handlers.
+
+    Handlers run on a QueueListener thread; the root logger only enqueues
+    records so callers on the event loop never block on file I/O.
+    """
+    global _log_listener
+
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
     root_logger = logging.getLogger()
     root_logger.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
 
@@ -88,7 +194,7 @@ def setup_logging():
         root_logger.removeHandler(handler)
 
     # File handler - detailed logs
-    file_handler = RotatingFileHandler(
+    file_handler = BatchingRotatingFileHandler(
         "app.log",
         maxBytes=10 * 10**6,  # 10MB per file
         backupCount=5,
@@ -106,7 +212,7 @@ def setup_logging():
     console_handler.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
 
     # Use colors if terminal supports it
-    if sys.stdout.isatty():
+    if _IS_TTY:
         console_format = ColoredFormatter(
             "%(asctime)s │ %(levelname_colored)s │ %(message)s",
             datefmt="%H:%M:%S",
@@ -118,8 +224,12 @@ def setup_logging():
         )
     console_handler.setFormatter(console_format)
 
-    root_logger.addHandler(file_handler)
-    root_logger.addHandler(console_handler)
+    log_queue = queue.Queue(-1)
+    root_logger.addHandler(QueueHandler(log_queue))
+    _log_listener = QueueListener(
+        log_queue, file_handler, console_handler, respect_handler_level=True
+    )
+    _log_listener.start()
 
     # Reduce noise from external libraries
     logging.getLogger("httpx").setLevel(logging.WARNING)
@@ -130,9 +240,24 @@ def setup_logging():
 # Initialize logging on module import
 setup_logging()
 
+
+@atexit.register
+def _stop_log_listener():
+    """Flush any queued records before the interpreter exits."""
+    if _log_listener is not None:
+        _log_listener.stop()
+
 # Main logger instance for backward compatibility
 logger = get_logger("limiter")
 
+# Loggers used by the helpers below, resolved once instead of per call
+_API_LOGGER = logging.getLogger("api")
+_USER_LOGGER = logging.getLogger("user_action")
+_MON_LOGGER = logging.getLogger("monitoring")
+_STARTUP_LOGGER = logging.getLogger("startup")
+_SHUTDOWN_LOGGER = logging.getLogger("shutdown")
+_PERF_LOGGER = logging.getLogger("perf")
+
 
 def log_function_call(func: Callable) -> Callable:
     """
@@ -143,58 +268,69 @@ def log_function_call(func: Callable) -> Callable:
         async def my_function(arg1, arg2):
             ...
     """
+    # Resolved once per decorated function rather than on every call
+    func_logger = get_logger(func.__module__)
+    func_name = func.__name__
+    is_enabled_for = func_logger.isEnabledFor
 
     @functools.wraps(func)
     async def async_wrapper(*args, **kwargs):
-        func_logger = get_logger(func.__module__)
+        # repr() of every argument is costly; only pay for it when DEBUG is on
+        debug = is_enabled_for(logging.DEBUG)
         start_time = time.perf_counter()
 
         # Log function entry with arguments (truncate long args)
-        args_repr = [repr(a)[:100] for a in args]
-        kwargs_repr = [f"{k}={v!r}"[:100] for k, v in kwargs.items()]
-        signature = ", ".join(args_repr + kwargs_repr)
-        func_logger.debug(f"→ ENTER {func.__name__}({signature[:200]})")
+        if debug:
+            args_repr = [repr(a)[:100] for a in args]
+            kwargs_repr = [f"{k}={v!r}"[:100] for k, v in kwargs.items()]
+            signature = ", ".join(args_repr + kwargs_repr)
+            func_logger.debug("→ ENTER %s(%s)", func_name, signature[:200])
 
         try:
             result = await func(*args, **kwargs)
-            elapsed = (time.perf_counter() - start_time) * 1000
-            result_repr = repr(result)[:100] if result is not None else "None"
-            func_logger.debug(
-                f"← EXIT  {func.__name__} [{elapsed:.1f}ms] → {result_repr}"
-            )
+            if debug:
+                elapsed = (time.perf_counter() - start_time) * 1000
+                result_repr = repr(result)[:100] if result is not None else "None"
+                func_logger.debug(
+                    "← EXIT  %s [%.1fms] → %s", func_name, elapsed, result_repr
+                )
             return result
         except Exception as e:
             elapsed = (time.perf_counter() - start_time) * 1000
             func_logger.error(
-                f"✗ ERROR {func.__name__} [{elapsed:.1f}ms]: {type(e).__name__}: {e}"
+                "✗ ERROR %s [%.1fms]: %s: %s", func_name, elapsed, type(e).__name__, e
             )
-            func_logger.debug(f"Traceback:\n{traceback.format_exc()}")
+            if is_enabled_for(logging.DEBUG):
+                func_logger.debug("Traceback:\n%s", traceback.format_exc())
             raise
 
     @functools.wraps(func)
     def sync_wrapper(*args, **kwargs):
-        func_logger = get_logger(func.__module__)
+        debug = is_enabled_for(logging.DEBUG)
         start_time = time.perf_counter()
 
-        args_repr = [repr(a)[:100] for a in args]
-        kwargs_repr = [f"{k}={v!r}"[:100] for k, v in kwargs.items()]
-        signature = ", ".join(args_repr + kwargs_repr)
-        func_logger.debug(f"→ ENTER {func.__name__}({signature[:200]})")
+        if debug:
+            args_repr = [repr(a)[:100] for a in args]
+            kwargs_repr = [f"{k}={v!r}"[:100] for k, v in kwargs.items()]
+            signature = ", ".join(args_repr + kwargs_repr)
+            func_logger.debug("→ ENTER %s(%s)", func_name, signature[:200])
 
         try:
             result = func(*args, **kwargs)
-            elapsed = (time.perf_counter() - start_time) * 1000
-            result_repr = repr(result)[:100] if result is not None else "None"
-            func_logger.debug(
-                f"← EXIT  {func.__name__} [{elapsed:.1f}ms] → {result_repr}"
-            )
+            if debug:
+                elapsed = (time.perf_counter() - start_time) * 1000
+                result_repr = repr(result)[:100] if result is not None else "None"
+                func_logger.debug(
+                    "← EXIT  %s [%.1fms] → %s", func_name, elapsed, result_repr
+                )
             return result
         except Exception as e:
             elapsed = (time.perf_counter() - start_time) * 1000
             func_logger.error(
-                f"✗ ERROR {func.__name__} [{elapsed:.1f}ms]: {type(e).__name__}: {e}"
+                "✗ ERROR %s [%.1fms]: %s: %s", func_name, elapsed, type(e).__name__, e
             )
-            func_logger.debug(f"Traceback:\n{traceback.format_exc()}")
+            if is_enabled_for(logging.DEBUG):
+                func_logger.debug("Traceback:\n%s", traceback.format_exc())
             raise
 
     if asyncio.iscoroutinefunction(func):
@@ -219,21 +355,25 @@ def log_api_request(
         duration_ms: Request duration in milliseconds
         error: Error message (if failed)
     """
-    api_logger = get_logger("api")
-
     if error:
-        msg = f"🌐 {method:6} {url} → ERROR: {error}"
         if duration_ms:
-            msg += f" [{duration_ms:.0f}ms]"
-        api_logger.error(msg)
+            _API_LOGGER.error(
+                "🌐 %-6s %s → ERROR: %s [%.0fms]", method, url, error, duration_ms
+            )
+        else:
+            _API_LOGGER.error("🌐 %-6s %s → ERROR: %s", method, url, error)
     elif status:
+        if not _API_LOGGER.isEnabledFor(logging.INFO):
+            return
         emoji = "✓" if 200 <= status < 300 else "⚠" if 300 <= status < 400 else "✗"
-        msg = f"🌐 {method:6} {url} → {emoji} {status}"
         if duration_ms:
-            msg += f" [{duration_ms:.0f}ms]"
-        api_logger.info(msg)
+            _API_LOGGER.info(
+                "🌐 %-6s %s → %s %s [%.0fms]", method, url, emoji, status, duration_ms
+            )
+        else:
+            _API_LOGGER.info("🌐 %-6s %s → %s %s", method, url, emoji, status)
     else:
-        api_logger.debug(f"🌐 {method:6} {url} → pending...")
+        _API_LOGGER.debug("🌐 %-6s %s → pending...", method, url)
 
 
 def log_user_action(
@@ -248,16 +388,16 @@ def log_user_action(
         details: Additional details
         success: Whether the action was successful
     """
-    user_logger = get_logger("user_action")
+    level = logging.INFO if success else logging.WARNING
+    if not _USER_LOGGER.isEnabledFor(level):
+        return
     emoji = "✓" if success else "✗"
-    msg = f"{emoji} {action.upper():12} │ {username}"
     if details:
-        msg += f" │ {details}"
-
-    if success:
-        user_logger.info(msg)
+        _USER_LOGGER.log(
+            level, "%s %-12s │ %s │ %s", emoji, action.upper(), username, details
+        )
     else:
-        user_logger.warning(msg)
+        _USER_LOGGER.log(level, "%s %-12s │ %s", emoji, action.upper(), username)
 
 
 def log_monitoring_event(event: str, username: str = None, details: dict = None):
@@ -269,55 +409,62 @@ def log_monitoring_event(event: str, username: str = None, details: dict = None)
         username: Username if applicable
         details: Additional details as dict
     """
-    mon_logger = get_logger("monitoring")
-    msg = f"📡 {event}"
+    if not _MON_LOGGER.isEnabledFor(logging.INFO):
+        return
+    parts = [event]
     if username:
-        msg += f" │ {username}"
+        parts.append(username)
     if details:
-        details_str = " │ ".join(f"{k}={v}" for k, v in details.items())
-        msg += f" │ {details_str}"
-    mon_logger.info(msg)
+        parts.extend(f"{k}={v}" for k, v in details.items())
+    _MON_LOGGER.info("📡 %s", " │ ".join(parts))
 
 
 def log_startup_info(component: str, details: str = None):
     """Log component startup."""
-    startup_logger = get_logger("startup")
-    msg = f"🚀 {component} starting"
     if details:
-        msg += f": {details}"
-    startup_logger.info(msg)
+        _STARTUP_LOGGER.info("🚀 %s starting: %s", component, details)
+    else:
+        _STARTUP_LOGGER.info("🚀 %s starting", component)
 
 
 def log_shutdown_info(component: str, reason: str = None):
     """Log component shutdown."""
-    shutdown_logger = get_logger("shutdown")
-    msg = f"🛑 {component} stopping"
     if reason:
-        msg += f": {reason}"
-    shutdown_logger.info(msg)
+        _SHUTDOWN_LOGGER.info("🛑 %s stopping: %s", component, reason)
+    else:
+        _SHUTDOWN_LOGGER.info("🛑 %s stopping", component)
 
 
 class PerformanceTimer:
     """Context manager for timing code blocks."""
 
+    __slots__ = ("operation", "log_level", "start_time", "logger", "_enabled")
+
     def __init__(self, operation: str, log_level: int = logging.DEBUG):
         self.operation = operation
         self.log_level = log_level
         self.start_time = None
-        self.logger = get_logger("perf")
+        self.logger = _PERF_LOGGER
+        # Skip the clock reads entirely when the result would be filtered out
+        self._enabled = _PERF_LOGGER.isEnabledFor(log_level)
 
     def __enter__(self):
-        self.start_time = time.perf_counter()
+        if self._enabled:
+            self.start_time = time.perf_counter()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        elapsed = (time.perf_counter() - self.start_time) * 1000
         if exc_type:
-            self.logger.error(
-                f"⏱ {self.operation} failed after {elapsed:.1f}ms: {exc_val}"
-            )
-        else:
+            if self.start_time is None:
+                self.logger.error("⏱ %s failed: %s", self.operation, exc_val)
+            else:
+                elapsed = (time.perf_counter() - self.start_time) * 1000
+                self.logger.error(
+                    "⏱ %s failed after %.1fms: %s", self.operation, elapsed, exc_val
+                )
+        elif self._enabled:
+            elapsed = (time.perf_counter() - self.start_time) * 1000
             self.logger.log(
-                self.log_level, f"⏱ {self.operation} completed in {elapsed:.1f}ms"
+                self.log_level, "⏱ %s completed in %.1fms", self.operation, elapsed
             )
         return False
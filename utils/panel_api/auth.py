@@ -14,6 +14,7 @@ except ImportError:
     print("Module 'httpx' is not installed use: 'pip install httpx' to install it")
     sys.exit()
 
+from utils.http_client import get_http_client
 from utils.logs import logger, log_api_request, get_logger
 from utils.types import PanelType
 
@@ -117,10 +118,10 @@ async def get_token(panel_data: PanelType, force_refresh: bool = False) -> Panel
             url = f"{scheme}://{panel_data.panel_domain}/api/admin/token"
             start_time = time.perf_counter()
             try:
-                async with httpx.AsyncClient(verify=False) as client:
-                    response = await client.post(url, data=payload, timeout=5)
-                    elapsed = (time.perf_counter() - start_time) * 1000
-                    response.raise_for_status()
+                client = await get_http_client()
+                response = await client.post(url, data=payload, timeout=5)
+                elapsed = (time.perf_counter() - start_time) * 1000
+                response.raise_for_status()
                 
                 log_api_request("POST", url, response.status_code, elapsed)
                 
@@ -9,6 +9,7 @@ from ssl import SSLError
 
 import httpx
 
+from utils.http_client import get_http_client
 from utils.logs import logger, log_api_request, get_logger
 from utils.types import PanelType
 from utils.panel_api.auth import get_token, invalidate_token_cache
@@ -47,10 +48,10 @@ async def get_groups(panel_data: PanelType) -> list[dict] | ValueError:
             url = f"{scheme}://{panel_data.panel_domain}/api/groups"
             start_time = time.perf_counter()
             try:
-                async with httpx.AsyncClient(verify=False) as client:
-                    response = await client.get(url, headers=headers, timeout=10)
-                    elapsed = (time.perf_counter() - start_time) * 1000
-                    response.raise_for_status()
+                client = await get_http_client()
+                response = await client.get(url, headers=headers, timeout=10)
+                elapsed = (time.perf_counter() - start_time) * 1000
+                response.raise_for_status()
                 
                 log_api_request("GET", url, response.status_code, elapsed)
                 
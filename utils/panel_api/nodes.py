@@ -9,6 +9,7 @@ from ssl import SSLError
 
 import httpx
 
+from utils.http_client import get_http_client
 from utils.logs import logger, log_api_request, get_logger
 from utils.types import PanelType, NodeType
 from utils.panel_api.auth import get_token, invalidate_token_cache, safe_send_logs_panel
@@ -111,10 +112,10 @@ async def get_nodes(panel_data: PanelType, force_refresh: bool = False) -> list[
             url = f"{scheme}://{panel_data.panel_domain}/api/nodes"
             start_time = time.perf_counter()
             try:
-                async with httpx.AsyncClient(verify=False) as client:
-                    response = await client.get(url, headers=headers, timeout=10)
-                    elapsed = (time.perf_counter() - start_time) * 1000
-                    response.raise_for_status()
+                client = await get_http_client()
+                response = await client.get(url, headers=headers, timeout=10)
+                elapsed = (time.perf_counter() - start_time) * 1000
+                response.raise_for_status()
                 
                 log_api_request("GET", url, response.status_code, elapsed)
                 
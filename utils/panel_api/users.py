@@ -11,6 +11,7 @@ import httpx
 
 from utils.handel_dis_users import DisabledUsers
 from utils.user_groups_storage import UserGroupsStorage
+from utils.http_client import get_http_client
 from utils.logs import logger, log_api_request, log_user_action, get_logger
 from utils.read_config import read_config
 from utils.types import PanelType, UserType
@@ -51,10 +52,10 @@ async def all_user(panel_data: PanelType) -> list[UserType] | ValueError:
             url = f"{scheme}://{panel_data.panel_domain}/api/users"
             start_time = time.perf_counter()
             try:
-                async with httpx.AsyncClient(verify=False) as client:
-                    response = await client.get(url, headers=headers, timeout=10)
-                    elapsed = (time.perf_counter() - start_time) * 1000
-                    response.raise_for_status()
+                client = await get_http_client()
+                response = await client.get(url, headers=headers, timeout=10)
+                elapsed = (time.perf_counter() - start_time) * 1000
+                response.raise_for_status()
                 
                 log_api_request("GET", url, response.status_code, elapsed)
                 
@@ -155,10 +156,10 @@ async def get_all_panel_users(panel_data: PanelType) -> set[str] | ValueError:
                 url = f"{scheme}://{panel_data.panel_domain}/api/users?offset={offset}&limit={limit}"
                 start_time = time.perf_counter()
                 try:
-                    async with httpx.AsyncClient(verify=False) as client:
-                        response = await client.get(url, headers=headers, timeout=30)
-                        elapsed = (time.perf_counter() - start_time) * 1000
-                        response.raise_for_status()
+                    client = await get_http_client()
+                    response = await client.get(url, headers=headers, timeout=30)
+                    elapsed = (time.perf_counter() - start_time) * 1000
+                    response.raise_for_status()
                     
                     log_api_request("GET", url, response.status_code, elapsed)
                     
@@ -260,27 +261,27 @@ async def check_user_exists(panel_data: PanelType, username: str) -> bool:
             url = f"{scheme}://{panel_data.panel_domain}/api/user/{username}"
             start_time = time.perf_counter()
             try:
-                async with httpx.AsyncClient(verify=False) as client:
-                    response = await client.get(url, headers=headers, timeout=10)
-                    elapsed = (time.perf_counter() - start_time) * 1000
-                    
-                    if response.status_code == 200:
-                        log_api_request("GET", url, 200, elapsed)
-                        users_logger.debug(f"👤 User {username} exists [{elapsed:.0f}ms]")
-                        return True
-                    elif response.status_code == 404:
-                        log_api_request("GET", url, 404, elapsed)
-                        users_logger.debug(f"👤 User {username} not found [{elapsed:.0f}ms]")
-                        return False
-                    elif response.status_code == 401:
-                        log_api_request("GET", url, 401, elapsed, "Unauthorized")
-                        await invalidate_token_cache()
-                        users_logger.warning("Got 401 error, invalidating token cache and retrying")
-                        break
-                    else:
-                        log_api_request("GET", url, response.status_code, elapsed)
-                        users_logger.warning(f"Unexpected status {response.status_code} checking user {username}")
-                        continue
+                client = await get_http_client()
+                response = await client.get(url, headers=headers, timeout=10)
+                elapsed = (time.perf_counter() - start_time) * 1000
+                
+                if response.status_code == 200:
+                    log_api_request("GET", url, 200, elapsed)
+                    users_logger.debug(f"👤 User {username} exists [{elapsed:.0f}ms]")
+                    return True
+                elif response.status_code == 404:
+                    log_api_request("GET", url, 404, elapsed)
+                    users_logger.debug(f"👤 User {username} not found [{elapsed:.0f}ms]")
+                    return False
+                elif response.status_code == 401:
+                    log_api_request("GET", url, 401, elapsed, "Unauthorized")
+                    await invalidate_token_cache()
+                    users_logger.warning("Got 401 error, invalidating token cache and retrying")
+                    break
+                else:
+                    log_api_request("GET", url, response.status_code, elapsed)
+                    users_logger.warning(f"Unexpected status {response.status_code} checking user {username}")
+                    continue
                     
             except SSLError:
                 elapsed = (time.perf_counter() - start_time) * 1000
@@ -334,10 +335,10 @@ async def get_user_details(panel_data: PanelType, username: str) -> dict | Value
             url = f"{scheme}://{panel_data.panel_domain}/api/user/{username}"
             start_time = time.perf_counter()
             try:
-                async with httpx.AsyncClient(verify=False) as client:
-                    response = await client.get(url, headers=headers, timeout=10)
-                    elapsed = (time.perf_counter() - start_time) * 1000
-                    response.raise_for_status()
+                client = await get_http_client()
+                response = await client.get(url, headers=headers, timeout=10)
+                elapsed = (time.perf_counter() - start_time) * 1000
+                response.raise_for_status()
                 
                 log_api_request("GET", url, response.status_code, elapsed)
                 
@@ -444,12 +445,12 @@ async def update_user_groups(panel_data: PanelType, username: str, group_ids: li
             url = f"{scheme}://{panel_data.panel_domain}/api/user/{username}"
             start_time = time.perf_counter()
             try:
-                async with httpx.AsyncClient(verify=False) as client:
-                    response = await client.put(
-                        url, json=payload, headers=headers, timeout=10
-                    )
-                    elapsed = (time.perf_counter() - start_time) * 1000
-                    response.raise_for_status()
+                client = await get_http_client()
+                response = await client.put(
+                    url, json=payload, headers=headers, timeout=10
+                )
+                elapsed = (time.perf_counter() - start_time) * 1000
+                response.raise_for_status()
                 log_api_request("PUT", url, response.status_code, elapsed)
                 log_user_action("UPDATE_GROUPS", username, f"groups={group_ids}", success=True)
                 users_logger.info(f"👥 Updated groups for user {username} to {group_ids} [{elapsed:.0f}ms]")
@@ -522,12 +523,12 @@ async def enable_all_user(panel_data: PanelType) -> None | ValueError:
             status = {"status": "active"}
             start_time = time.perf_counter()
             try:
-                async with httpx.AsyncClient(verify=False) as client:
-                    response = await client.put(
-                        url, json=status, headers=headers, timeout=5
-                    )
-                    elapsed = (time.perf_counter() - start_time) * 1000
-                    response.raise_for_status()
+                client = await get_http_client()
+                response = await client.put(
+                    url, json=status, headers=headers, timeout=5
+                )
+                elapsed = (time.perf_counter() - start_time) * 1000
+                response.raise_for_status()
                 log_api_request("PUT", url, response.status_code, elapsed)
                 log_user_action("ENABLE", username.name, success=True)
                 message = f"Enabled user: {username.name}"
@@ -583,10 +584,10 @@ async def enable_user_by_status(panel_data: PanelType, username: str) -> bool:
             url = f"{scheme}://{panel_data.panel_domain}/api/user/{username}"
             start_time = time.perf_counter()
             try:
-                async with httpx.AsyncClient(verify=False) as client:
-                    response = await client.put(url, json=status, headers=headers, timeout=5)
-                    elapsed = (time.perf_counter() - start_time) * 1000
-                    response.raise_for_status()
+                client = await get_http_client()
+                response = await client.put(url, json=status, headers=headers, timeout=5)
+                elapsed = (time.perf_counter() - start_time) * 1000
+                response.raise_for_status()
                 log_api_request("PUT", url, response.status_code, elapsed)
                 log_user_action("ENABLE", username, "status=active", success=True)
                 users_logger.info(f"✅ Enabled user by status: {username} [{elapsed:.0f}ms]")
@@ -750,10 +751,10 @@ async def disable_user_by_status(panel_data: PanelType, username: str) -> bool:
             url = f"{scheme}://{panel_data.panel_domain}/api/user/{username}"
             start_time = time.perf_counter()
             try:
-                async with httpx.AsyncClient(verify=False) as client:
-                    response = await client.put(url, json=status, headers=headers, timeout=5)
-                    elapsed = (time.perf_counter() - start_time) * 1000
-                    response.raise_for_status()
+                client = await get_http_client()
+                response = await client.put(url, json=status, headers=headers, timeout=5)
+                elapsed = (time.perf_counter() - start_time) * 1000
+                response.raise_for_status()
                 log_api_request("PUT", url, response.status_code, elapsed)
                 log_user_action("DISABLE", username, "status=disabled", success=True)
                 users_logger.info(f"🚫 Disabled user by status: {username} [{elapsed:.0f}ms]")
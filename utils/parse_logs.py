@@ -5,19 +5,13 @@ This module contains functions to parse and validate logs.
 import ipaddress
 import random
 import re
-import sys
 import time
 
 from utils.check_usage import ACTIVE_USERS
+from utils.http_client import get_http_client
 from utils.read_config import read_config
 from utils.types import ConnectionInfo, DeviceInfo, UserType
 
-try:
-    import httpx
-except ImportError:
-    print("Module 'httpx' is not installed use: 'pip install httpx' to install it")
-    sys.exit()
-
 INVALID_EMAILS = [
     "API]",
     "Found",
@@ -75,8 +69,8 @@ async def check_ip(ip_address: str) -> None | str:
     if "ipapi.co" in endpoint:
         url += "/country"
     try:
-        async with httpx.AsyncClient(verify=False) as client:
-            resp = await client.get(url, timeout=2)
+        client = await get_http_client()
+        resp = await client.get(url, timeout=2)
         info = resp.json()
         country = info.get(key) if key else resp.text
         if country:
@@ -67,6 +67,41 @@ class PunishmentStep:
         return f"🔒 {hours}h {remaining_mins}m disable"
 
 
+STEP_TYPES = frozenset({"warning", "disable"})
+
+
+def validate_steps(steps_data) -> list[dict]:
+    """
+    Validate punishment steps parsed from admin input.
+    
+    Args:
+        steps_data: Decoded JSON, expected to be a non-empty list of
+            {"type": "warning"|"disable", "duration": minutes} dicts
+            
+    Returns:
+        Normalized list of step dicts, ready to store in config
+        
+    Raises:
+        ValueError: If the steps are malformed
+    """
+    if not isinstance(steps_data, list) or not steps_data:
+        raise ValueError("Steps must be a non-empty array")
+    validated_steps = []
+    for step in steps_data:
+        if not isinstance(step, dict):
+            raise ValueError(f"Invalid step: {step}")
+        step_type = step.get("type", "disable")
+        duration = step.get("duration", 0)
+        # Lists/dicts are unhashable and would raise TypeError on the set lookup
+        if not isinstance(step_type, str) or step_type not in STEP_TYPES:
+            raise ValueError(f"Invalid step type: {step_type}")
+        # bool is an int subclass, but true/false is not a duration
+        if type(duration) is not int or duration < 0:
+            raise ValueError(f"Invalid duration: {duration}")
+        validated_steps.append({"type": step_type, "duration": duration})
+    return validated_steps
+
+
 @dataclass
 class ViolationRecord:
     """Represents a single violation record"""
@@ -101,6 +136,7 @@ class PunishmentSystem:
         self.steps: list[PunishmentStep] = self.DEFAULT_STEPS.copy()
         self.window_hours: int = self.DEFAULT_WINDOW_HOURS
         self.enabled: bool = True
+        self._loaded_config_version: Optional[int] = None
         self.load_violations()
     
     def load_violations(self):
@@ -153,13 +189,18 @@ class PunishmentSystem:
         except Exception as e:
             punishment_logger.error(f"❌ Error saving violation history: {e}")
     
-    def load_config(self, config_data: dict):
+    def load_config(self, config_data: dict, version: Optional[int] = None):
         """
         Load punishment configuration from config data.
         
         Args:
             config_data: Configuration dictionary with optional 'punishment' key
+            version: Optional config version (see utils.read_config.get_config_version);
+                loading is skipped when it matches the last loaded version
         """
+        if version is not None and version == self._loaded_config_version:
+            return
+        self._loaded_config_version = version
         punishment_config = config_data.get("punishment", {})
         
         self.enabled = punishment_config.get("enabled", True)
@@ -319,10 +360,10 @@ class PunishmentSystem:
     
     def get_steps_summary(self) -> str:
         """Get a formatted summary of all punishment steps"""
-        lines = [f"📋 <b>Punishment Steps</b> (window: {self.window_hours}h):\n"]
-        for i, step in enumerate(self.steps, 1):
-            lines.append(f"  {i}. {step.get_display_text()}")
-        return "\n".join(lines)
+        steps = "\n".join(
+            f"  {i}. {step.get_display_text()}" for i, step in enumerate(self.steps, 1)
+        ) or "  No steps configured"
+        return f"📋 <b>Punishment Steps</b> (window: {self.window_hours}h):\n\n{steps}"
 
 
 # Global instance
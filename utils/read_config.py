@@ -7,6 +7,7 @@ Reads settings from:
 """
 
 import os
+import time
 from typing import Any, Dict, List, Optional
 
 from utils.logs import get_logger
@@ -33,11 +34,31 @@ except ImportError:
 # In-memory cache fallback
 _config_cache: Dict[str, Any] = {}
 _cache_loaded = False
+_cache_loaded_at = 0.0
+
+# Bumped whenever the cached config is replaced or invalidated, so
+# consumers can skip re-deriving state from an unchanged config
+_config_version = 0
+
+# How long (seconds) the decoded in-memory config is served without
+# consulting Redis, so bursts of reads don't each fetch and re-parse it
+_MEMORY_CACHE_TTL = 5.0
+
+
+def get_config_version() -> int:
+    """Return the current config version (see bump_config_version)."""
+    return _config_version
+
+
+def bump_config_version():
+    """Mark the config as changed, e.g. after it was modified in place."""
+    global _config_version
+    _config_version += 1
 
 
 async def invalidate_config_cache():
     """Invalidate configuration cache (Redis and in-memory)."""
-    global _config_cache, _cache_loaded
+    global _config_cache, _cache_loaded, _cache_loaded_at
     
     if REDIS_CACHE_AVAILABLE:
         try:
@@ -48,6 +69,8 @@ async def invalidate_config_cache():
     
     _config_cache = {}
     _cache_loaded = False
+    _cache_loaded_at = 0.0
+    bump_config_version()
     config_logger.info("🔧 Configuration cache invalidated")
 
 
@@ -158,21 +181,40 @@ async def read_config(check_required_elements: bool = False) -> Dict[str, Any]:
     Read and return merged configuration from ENV and DB.
     Uses Redis cache when available for fast access.
     
+    The returned dict is the shared cached object; callers that edit it
+    must work on a copy (copy.deepcopy) so readers never see unsaved changes.
+    
     Args:
         check_required_elements: If True, validate required settings
         
     Returns:
         Complete configuration dictionary
     """
-    global _config_cache, _cache_loaded
+    global _config_cache, _cache_loaded, _cache_loaded_at
+    
+    now = time.monotonic()
+    
+    # Serve a recently loaded config straight from memory
+    if (
+        _cache_loaded and _config_cache and not check_required_elements
+        and now - _cache_loaded_at < _MEMORY_CACHE_TTL
+    ):
+        return _config_cache
     
-    # Try Redis cache first
+    # Try Redis cache next
     if REDIS_CACHE_AVAILABLE and not check_required_elements:
         try:
             cached = await get_cached_config()
             if cached:
                 config_logger.debug("🔧 Using Redis cached config")
-                return cached
+                # Keep the existing dict (and version) when nothing changed so
+                # version-keyed consumers don't reload on every TTL refresh
+                if cached != _config_cache:
+                    _config_cache = cached
+                    bump_config_version()
+                _cache_loaded = True
+                _cache_loaded_at = now
+                return _config_cache
         except Exception as e:
             config_logger.warning(f"Redis config cache error: {e}")
     
@@ -262,6 +304,8 @@ async def read_config(check_required_elements: bool = False) -> Dict[str, Any]:
     
     _config_cache = config
     _cache_loaded = True
+    _cache_loaded_at = now
+    bump_config_version()
     
     # Store in Redis cache
     if REDIS_CACHE_AVAILABLE:
@@ -28,6 +28,13 @@ except ImportError:
     redis_logger.warning("⚠️ redis package not installed, falling back to in-memory cache")
     REDIS_AVAILABLE = False
 
+# orjson is an optional, faster drop-in for cache (de)serialization
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 
 # Redis connection settings
 REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
@@ -266,7 +273,7 @@ class RedisCache:
         try:
             value = await self.client.get(full_key)
             if value:
-                return json.loads(value)
+                return orjson.loads(value) if ORJSON_AVAILABLE else json.loads(value)
             return None
         except Exception as e:
             redis_logger.error(f"❌ Redis get error for {key}: {e}")
@@ -277,7 +284,11 @@ class RedisCache:
         full_key = f"{CACHE_PREFIX}{key}"
         ttl = CACHE_TTL.get(ttl_key, CACHE_TTL["default"])
         try:
-            await self.client.set(full_key, json.dumps(value), ex=ttl)
+            if ORJSON_AVAILABLE:
+                payload = orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+            else:
+                payload = json.dumps(value)
+            await self.client.set(full_key, payload, ex=ttl)
             redis_logger.debug(f"💾 Cached {key} (TTL: {ttl}s)")
             return True
         except Exception as e:
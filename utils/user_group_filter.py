@@ -13,6 +13,7 @@ import time
 from typing import Optional
 
 from utils.logs import logger
+from utils.panel_api import get_groups, get_user_details
 
 
 # Cache for user group mappings
@@ -94,8 +95,6 @@ async def get_user_groups(panel_data, username: str) -> list[int]:
     
     # Fetch from API
     try:
-        from utils.panel_api import get_user_details
-        
         user_data = await get_user_details(panel_data, username)
         if user_data is None:
             return []
@@ -132,8 +131,6 @@ async def get_all_groups(panel_data) -> list[dict]:
     
     # Fetch from API
     try:
-        from utils.panel_api import get_groups
-        
         groups = await get_groups(panel_data)
         if isinstance(groups, ValueError):
             return []
@@ -196,8 +193,8 @@ async def should_limit_user(panel_data, username: str, config_data: dict) -> tup
     # Get user's groups
     user_group_ids = await get_user_groups(panel_data, username)
     
-    # Check if user belongs to any of the filter groups
-    user_in_filter_groups = any(gid in filter_group_ids for gid in user_group_ids)
+    # Check if user belongs to any of the filter groups (set test, not a nested scan)
+    user_in_filter_groups = not set(filter_group_ids).isdisjoint(user_group_ids)
     
     if filter_mode == "include":
         # Include mode: only limit users in specified groups
@@ -273,16 +270,12 @@ def get_filter_status_text(config_data: dict, groups: list[dict] = None) -> str:
     if not group_ids:
         return "⚠️ Group filter enabled but no groups selected"
     
-    # Get group names if available
-    group_names = []
-    for gid in group_ids:
-        if groups:
-            name = get_group_name(groups, gid)
-            group_names.append(f"{name} ({gid})")
-        else:
-            group_names.append(f"ID: {gid}")
-    
-    groups_text = ", ".join(group_names)
+    # Get group names if available (one id -> name map, not a scan per ID)
+    if groups:
+        names = {group.get("id"): group.get("name", f"Group {group.get('id')}") for group in groups}
+        groups_text = ", ".join(f"{names.get(gid, f'Group {gid}')} ({gid})" for gid in group_ids)
+    else:
+        groups_text = ", ".join(f"ID: {gid}" for gid in group_ids)
     
     if mode == "include":
         return f"✅ Include mode: Only users in [{groups_text}] are monitored"
@@ -35,6 +35,8 @@ class EnhancedWarningSystem:
     INSTANT_DISABLE_THRESHOLD = -60
     # Minimum duration (seconds) for an IP to count as a device
     MIN_DEVICE_DURATION = 120  # 2 minutes
+    # Seconds an activity analysis is reused while the user's snapshots are unchanged
+    ANALYSIS_CACHE_TTL = 30
     
     def __init__(self, filename=".user_warnings.json", history_filename=".warning_history.json"):
         self.filename = filename
@@ -42,6 +44,8 @@ class EnhancedWarningSystem:
         self.warnings: Dict[str, UserWarning] = {}
         self.warning_history: Dict[str, list] = {}
         self.monitoring_period = 180  # 3 minutes in seconds
+        # username -> (state key, analysis, monotonic time) for analyze_user_activity_patterns
+        self._analysis_cache: Dict[str, tuple] = {}
         self.load_warnings()
         self.load_warning_history()
         warning_logger.debug(f"⚠️ EnhancedWarningSystem initialized (monitoring_period={self.monitoring_period}s)")
@@ -546,12 +550,11 @@ class EnhancedWarningSystem:
         if not self.warnings:
             return
         
+        now = time.time()
         active_warnings = []
         for username, warning in self.warnings.items():
-            if warning.is_monitoring_active():
-                remaining = warning.time_remaining()
-                minutes = remaining // 60
-                seconds = remaining % 60
+            if warning.monitoring_end_time > now:
+                minutes, seconds = divmod(int(warning.monitoring_end_time - now), 60)
                 active_warnings.append(
                     f"• <code>{username}</code> - {minutes}m {seconds}s remaining"
                 )
@@ -562,7 +565,8 @@ class EnhancedWarningSystem:
     
     def get_monitoring_users(self) -> Set[str]:
         """Get set of users currently being monitored"""
-        return {username for username, warning in self.warnings.items() if warning.is_monitoring_active()}
+        now = time.time()
+        return {username for username, warning in self.warnings.items() if warning.monitoring_end_time > now}
     
     def is_user_being_monitored(self, username: str) -> bool:
         """Check if a user is currently being monitored"""
@@ -570,10 +574,11 @@ class EnhancedWarningSystem:
     
     async def cleanup_expired_warnings(self):
         """Clean up expired warnings"""
-        expired_users = []
-        for username, warning in self.warnings.items():
-            if not warning.is_monitoring_active():
-                expired_users.append(username)
+        now = time.time()
+        expired_users = [
+            username for username, warning in self.warnings.items()
+            if warning.monitoring_end_time <= now
+        ]
         
         for username in expired_users:
             del self.warnings[username]
@@ -590,6 +595,43 @@ class EnhancedWarningSystem:
         warning_logger.debug(f"📍 Monitoring for {username} handled through periodic checks")
         return
 
+    async def analyze_user_activity_patterns(self, username: str) -> dict:
+        """
+        Summarize the monitoring snapshots recorded for a warned user.
+        Returns an empty dict if the user has no warning.
+        """
+        warning = self.warnings.get(username)
+        if warning is None:
+            self._analysis_cache.pop(username, None)
+            return {}
+        
+        # Snapshots only ever add sightings, so the total seen count changes
+        # whenever the analysis could; reuse the last result until it does
+        key = (id(warning), sum(warning.ip_seen_count.values()))
+        now = time.monotonic()
+        cached = self._analysis_cache.get(username)
+        if cached is not None and cached[0] == key and now - cached[2] < self.ANALYSIS_CACHE_TTL:
+            return cached[1]
+        
+        history = warning.monitoring_history
+        counts = [snapshot["ip_count"] for snapshot in history]
+        changes = sum(
+            1 for prev, cur in zip(history, history[1:]) if prev["ips"] != cur["ips"]
+        )
+        
+        analysis = {
+            "consistently_active_ips": {
+                ip for ip in warning.ip_first_seen
+                if warning.get_ip_active_duration(ip) >= 240
+            },
+            "total_snapshots": len(history),
+            "ip_change_frequency": changes / (len(history) - 1) if len(history) > 1 else 0.0,
+            "peak_ip_count": max(counts, default=0),
+            "average_ip_count": sum(counts) / len(counts) if counts else 0.0,
+        }
+        self._analysis_cache[username] = (key, analysis, now)
+        return analysis
+
     async def generate_monitoring_summary(self) -> Optional[str]:
         """
         Generate a concise monitoring summary for users being monitored.